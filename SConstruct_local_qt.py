@@ -4,35 +4,31 @@ SCons 配置 - 使用本地 Qt6 安装
 """
 
 import os
+import sys
+import atexit
 import platform
 import shutil
 from pathlib import Path
 
-# 本地 Qt6 安装路径配置
-LOCAL_QT_PATHS = [
-    r"D:\Code\VS2022\Community\Qt6.5.3\6.5.3\msvc2019_64",
-    r"D:\Code\VS2022\Community\Qt6.6.2\6.6.2\msvc2019_64",
-    r"D:\Code\VS2022\Community\Qt6.7.0\6.7.0\msvc2019_64",
-    r"C:\Qt\6.5.3\msvc2019_64",
-    r"C:\Qt\6.6.2\msvc2019_64",
-    r"C:\Qt\6.7.0\msvc2019_64"
-]
+# 项目根目录下的构建辅助模块
+sys.path.insert(0, os.path.abspath("."))
+from toolchain_discovery import find_qt, find_qt_tool
+from conandeps_loader import CONANDEPS_FILE, load_conandeps
+from qt_link_set import plan_link_set
 
 def find_local_qt_installation():
-    """查找本地 Qt6 安装"""
-    for qt_path in LOCAL_QT_PATHS:
-        if os.path.exists(qt_path):
-            # 检查是否包含 WebEngine
-            webengine_path = os.path.join(qt_path, "include", "QtWebEngineWidgets")
-            if os.path.exists(webengine_path):
-                print(f"[OK] 找到本地 Qt6 安装: {qt_path}")
-                return qt_path
+    """查找本地 Qt6 安装（工具链索引中包含 WebEngine 的最高版本）"""
+    qt = find_qt(modules=['QtWebEngineWidgets'], major=6)
+    if qt:
+        print(f"[OK] 找到本地 Qt6 安装: {qt['base_path']} (Qt {qt['version']})")
+        return qt
     
     print("[WARNING] 未找到本地 Qt6 WebEngine 安装")
     return None
 
 # 查找本地 Qt6
-local_qt_path = find_local_qt_installation()
+local_qt = find_local_qt_installation()
+local_qt_path = local_qt['base_path'] if local_qt else None
 
 if local_qt_path:
     print(f"[INFO] 使用本地 Qt6: {local_qt_path}")
@@ -59,8 +55,13 @@ else:
     
     # 回退到当前 Conan 配置
     print("[INFO] 回退到当前 Conan 配置...")
-    if os.path.exists("SConscript_conandeps"):
-        exec(open("SConscript_conandeps").read())
+    if os.path.exists(CONANDEPS_FILE):
+        # 只解析字典字面量，不执行文件
+        conandeps = load_conandeps(CONANDEPS_FILE)
+        qt_package = conandeps.package('qt')
+        if qt_package:
+            print(f"[INFO] Conan 配置中的 Qt {qt_package.version}: {', '.join(qt_package.binpath)}")
+        print("[INFO] 请使用 SConstruct 构建 Conan 配置")
         exit(0)
     else:
         print("[ERROR] 无法找到 SConscript_conandeps 文件")
@@ -76,21 +77,56 @@ obj_dir = os.path.join(project_root, "obj")
 os.makedirs(bin_dir, exist_ok=True)
 os.makedirs(obj_dir, exist_ok=True)
 
-# 查找源代码文件
-sources = []
-headers = []
-
-for file in os.listdir(src_dir):
-    if file.endswith('.cpp'):
-        sources.append(os.path.join(src_dir, file))
-    elif file.endswith('.h'):
-        headers.append(os.path.join(src_dir, file))
+from moc_cache import MocCache
+from moc_batch import run_moc_batch
+from source_discovery import discover_sources
+from qt_deploy import QtDeployer
+from build_trace import BuildTrace
+from qt_pch import setup_qt_pch, is_msvc
+from include_graph import apply_pruned_cpppath
+from header_deps import enable_header_deps
+from unity_build import unity_batch_count, plan_unity_build, add_unity_objects
+from object_cache import ObjectCache
+from toolchain_env import scons_msvc_settings
+from build_daemon import BuildPlan
+
+# 分阶段计时：构建结束时写出 obj/build_trace.json 并打印汇总表
+build_trace = BuildTrace('SConstruct_local_qt')
+atexit.register(build_trace.finish, obj_dir)
+
+# 查找源代码文件（递归扫描src目录，按目录修改时间缓存在obj目录）
+with build_trace.phase('discovery'):
+    source_tree = discover_sources(src_dir, obj_dir)
+sources = source_tree.sources
+headers = source_tree.headers
 
 print(f"[INFO] 找到 {len(sources)} 个源文件: {sources}")
 print(f"[INFO] 找到 {len(headers)} 个头文件: {headers}")
 
-# 创建构建环境
-env = Environment()
+# 创建构建环境（由 test/compile.py 启动时直接使用vcvars环境快照，SCons不再自己运行vcvars）
+msvc_settings = scons_msvc_settings()
+env = Environment(MSVC_USE_SETTINGS=msvc_settings) if msvc_settings else Environment()
+# 编译输出缓存（scons objcache=1）：清理obj目录后重新编译时直接复用目标文件
+use_object_cache = ARGUMENTS.get('objcache', '0') != '0'
+spawn = env['SPAWN']
+if use_object_cache:
+    object_cache = ObjectCache()
+    spawn = object_cache.wrap_spawn(spawn)
+    atexit.register(lambda: print(f"[INFO] {object_cache.summary()}"))
+# 头文件依赖取自编译器输出（scons deps=compiler）：/showIncludes 的结果按源文件保存，
+# 之后的构建不再用C扫描器扫描Qt头文件，外部头文件整体按大小和修改时间比较
+if ARGUMENTS.get('deps') == 'compiler':
+    header_deps = enable_header_deps(env, obj_dir, project_root, is_msvc(env))
+    spawn = header_deps.wrap_spawn(spawn, object_cache if use_object_cache else None)
+    atexit.register(header_deps.save)
+# 记录实际执行的编译/链接命令（obj/build_plan.json），供常驻构建服务 build_daemon.py 增量构建
+build_plan = BuildPlan(obj_dir)
+spawn = build_plan.wrap_spawn(spawn)
+atexit.register(build_plan.save)
+# 记录每个编译/链接命令的耗时（启用编译缓存时同时记录命中情况）
+env['SPAWN'] = build_trace.wrap_spawn(spawn, object_cache.take_status if use_object_cache else None)
+build_trace.metadata['toolchain'] = ' '.join(
+    str(part) for part in (env.get('CXX'), env.get('MSVC_VERSION') or env.get('CXXVERSION')) if part)
 
 # 设置编译器选项
 env.Append(CXXFLAGS=[
@@ -128,10 +164,24 @@ env.Append(CPPPATH=include_paths)
 lib_paths = [qt_lib_path, webengine_lib_path]
 env.Append(LIBPATH=lib_paths)
 
-# 配置库文件
-qt_libs = [
+# 配置库文件：只链接 src/ 实际包含的Qt模块及其依赖
+qt_module_libs = [
     'Qt6WebEngineCore', 'Qt6WebEngineWidgets', 'Qt6WebChannel',
-    'Qt6Core', 'Qt6Gui', 'Qt6Widgets', 'Qt6Network', 'Qt6Qml', 'Qt6Quick',
+    'Qt6Core', 'Qt6Gui', 'Qt6Widgets', 'Qt6Network', 'Qt6Qml', 'Qt6Quick'
+]
+qt_defines = [
+    'QT_WEBCHANNEL_LIB', 'QT_QML_LIB', 'QT_GUI_LIB', 'QT_NETWORK_LIB',
+    'QT_WIDGETS_LIB', 'QT_CORE_LIB'
+]
+link_set = plan_link_set(src_dir, [qt_include_path], local_qt_path)
+if link_set.unresolved:
+    print(f"[WARN] 无法确定所属模块的Qt头文件: {', '.join(sorted(link_set.unresolved))}，链接全部Qt库")
+else:
+    print(f"[INFO] {link_set.summary()}")
+    qt_module_libs = link_set.libs
+    qt_defines = link_set.defines
+
+qt_libs = qt_module_libs + [
     'dwmapi', 'shell32', 'uxtheme', 'advapi32', 'gdi32', 'imm32',
     'ole32', 'oleaut32', 'setupapi', 'shlwapi', 'user32', 'winmm',
     'winspool', 'wtsapi32', 'shcore', 'comdlg32'
@@ -140,38 +190,33 @@ qt_libs = [
 env.Append(LIBS=qt_libs)
 
 # 添加预处理器定义
-env.Append(CPPDEFINES=[
-    'UNICODE', '_UNICODE', 'WIN32', '_WINDOWS',
-    'QT_WEBCHANNEL_LIB', 'QT_QML_LIB', 'QT_GUI_LIB', 'QT_NETWORK_LIB',
-    'QT_WIDGETS_LIB', 'QT_CORE_LIB', 'QT_NO_DEBUG'
-])
+env.Append(CPPDEFINES=['UNICODE', '_UNICODE', 'WIN32', '_WINDOWS'] + qt_defines + ['QT_NO_DEBUG'])
 
 # 配置MOC（Qt元对象编译器）
 print("[INFO] 配置Qt MOC支持...")
 
 # 查找moc可执行文件
-moc_exe = os.path.join(qt_bin_path, 'moc.exe')
+moc_exe = find_qt_tool('moc', local_qt) or os.path.join(qt_bin_path, 'moc.exe')
 if os.path.exists(moc_exe):
     print(f"[OK] 找到MOC: {moc_exe}")
     env['MOC'] = moc_exe
     
-    # 创建MOC构建器
+    # MOC缓存：头文件内容未变化时不再启动moc.exe
+    moc_cache = MocCache(moc_exe, obj_dir)
+    
+    # 创建MOC构建器：所有头文件作为一个批次，交给并行MOC池
     def run_moc(target, source, env):
-        """运行MOC编译器"""
-        cmd = [env['MOC'], '-o', str(target[0]), str(source[0])]
-        return env.Execute(env.Action(cmd, '生成MOC文件: $TARGET'))
+        """运行MOC编译器（优先使用缓存）"""
+        jobs = [(str(src), str(tgt)) for src, tgt in zip(source, target)]
+        with build_trace.phase('moc', files=len(jobs)):
+            return run_moc_batch(moc_cache, jobs)
     
     # 注册MOC构建器
     moc_builder = Builder(action=run_moc, suffix='.moc', src_suffix='.h')
     env['BUILDERS']['MOC'] = moc_builder
     
-    # 查找需要MOC的头文件
-    moc_headers = []
-    for header in headers:
-        with open(header, 'r', encoding='utf-8') as f:
-            content = f.read()
-            if 'Q_OBJECT' in content:
-                moc_headers.append(header)
+    # 需要MOC的头文件（扫描时已由Q_OBJECT索引给出）
+    moc_headers = source_tree.moc_headers
     
     print(f"[OK] 找到 {len(moc_headers)} 个需要MOC的头文件: {moc_headers}")
     
@@ -179,26 +224,54 @@ if os.path.exists(moc_exe):
     moc_files = []
     for header in moc_headers:
         moc_target = os.path.join(obj_dir, f"{os.path.splitext(os.path.basename(header))[0]}.moc")
-        env.MOC(moc_target, header)
         moc_files.append(moc_target)
+    if moc_headers:
+        env.MOC(moc_files, moc_headers)
+        # 下面把已生成的MOC文件复制为.cpp编译，构建服务重新生成MOC后同样复制
+        build_plan.record_moc(moc_exe, zip(moc_headers, moc_files),
+                              [(moc_file, os.path.splitext(moc_file)[0] + '.cpp')
+                               for moc_file in moc_files if os.path.exists(moc_file)])
         
     print(f"[OK] 生成 {len(moc_files)} 个MOC文件: {moc_files}")
 else:
     print("[WARNING] 未找到MOC可执行文件")
     moc_files = []
 
+# Qt预编译头：常用Qt头文件只解析一次（scons pch=0 禁用）
+# 使用 /Yu 的目标文件依赖本次生成的 .pch，无法缓存，因此启用编译缓存时默认不用预编译头
+qt_pch = setup_qt_pch(env, obj_dir, sources, source_tree.moc_headers,
+                      enabled=ARGUMENTS.get('pch', '0' if use_object_cache else '1') != '0')
+
+# scons cpppath=pruned: CPPPATH只保留实际命中 #include 的目录（按包含图分析，结果缓存在obj目录）
+if ARGUMENTS.get('cpppath') == 'pruned':
+    with build_trace.phase('include_graph'):
+        apply_pruned_cpppath(env, obj_dir, sources + source_tree.moc_headers, [qt_pch.header] if qt_pch.enabled else [])
+
+# unity构建（scons unity=1）：源文件合并为按CPU核数分组的编译单元，
+# .moc 输出直接 #include 到所属源文件的编译单元中，不再复制为 .cpp 单独编译
+unity_obj_files = []
+unity_batches = unity_batch_count(ARGUMENTS.get('unity', '0'))
+if unity_batches:
+    unity_plan = plan_unity_build(obj_dir, sources, dict(zip(source_tree.moc_headers, moc_files)), unity_batches)
+    unity_obj_files = add_unity_objects(env, unity_plan)
+    standalone = set(unity_plan.standalone)
+    sources = [source for source in sources if os.path.abspath(source) in standalone]
+    moc_files = [moc_file for moc_file in moc_files if os.path.abspath(moc_file) in standalone]
+
 # 编译源文件
 print("[INFO] 编译源文件...")
+src_obj_files = []
 for source in sources:
-    source_name = os.path.basename(source)
-    obj_name = os.path.splitext(source_name)[0] + '.obj'
-    obj_path = os.path.join(obj_dir, 'src', obj_name)
+    # 目标文件路径保持与src下的子目录结构一致，避免同名文件冲突
+    rel_source = os.path.relpath(source, src_dir)
+    obj_path = os.path.join(obj_dir, 'src', os.path.splitext(rel_source)[0] + '.obj')
     
     # 确保src子目录存在
     os.makedirs(os.path.dirname(obj_path), exist_ok=True)
     
     # 编译源文件
     env.Object(obj_path, source)
+    src_obj_files.append(obj_path)
     print(f"[OK] 编译: {source} -> {obj_path}")
 
 # 编译MOC文件成.obj文件
@@ -221,13 +294,12 @@ for moc_file in moc_files:
         env.Object(moc_obj_path, moc_cpp_path)
         print(f"[OK] 编译MOC文件: {moc_cpp_path} -> {moc_obj_path}")
 
-# 链接最终可执行文件
-all_obj_files = []
-for file in os.listdir(os.path.join(obj_dir, 'src')):
-    if file.endswith('.obj'):
-        all_obj_files.append(os.path.join(obj_dir, 'src', file))
+build_plan.record_tree(source_tree.sources, source_tree.moc_headers, 'SConstruct_local_qt.py', ARGUMENTS)
 
-all_obj_files.extend(moc_obj_files)
+# 链接最终可执行文件（MSVC还需要链接预编译头的目标文件）
+all_obj_files = unity_obj_files + src_obj_files + moc_obj_files
+qt_pch.depends(all_obj_files)
+all_obj_files += qt_pch.objects
 
 print(f"[INFO] 链接目标文件: {all_obj_files}")
 
@@ -237,42 +309,39 @@ env.Program(exe_path, all_obj_files)
 
 print(f"[OK] 生成可执行文件: {exe_path}")
 
-# 复制Qt6运行时文件
-print("[INFO] 复制Qt6运行时文件...")
-
-# 复制DLL文件
-for file in os.listdir(qt_bin_path):
-    if file.endswith('.dll') and file.startswith('Qt6'):
-        src_dll = os.path.join(qt_bin_path, file)
-        dst_dll = os.path.join(bin_dir, file)
-        if not os.path.exists(dst_dll):
-            shutil.copy2(src_dll, dst_dll)
-            print(f"[OK] 复制DLL: {file}")
-
-# 复制WebEngine特定DLL
-webengine_dlls = [
-    'Qt6WebEngineCore.dll',
-    'Qt6WebEngineWidgets.dll', 
-    'Qt6WebEngineProcess.exe'
-]
+# 复制Qt6运行时文件（scons deploy=0 时跳过：由 pipeline.py 的 deploy 阶段统一部署，
+# 两边同时写 bin 目录会互相覆盖）
+if ARGUMENTS.get('deploy', '1') != '0':
+    print("[INFO] 复制Qt6运行时文件...")
+
+    # 增量部署：按清单只复制有变化的文件（旧文件即使存在也会按内容校验）
+    deployer = QtDeployer(bin_dir, name='local_qt6')
+
+    # 复制DLL文件（能从 mkspecs 得到运行时依赖时只复制链接集合需要的Qt DLL）
+    if link_set.has_module_info and not link_set.unresolved:
+        for dll in link_set.runtime_dlls():
+            deployer.add_file(os.path.join(qt_bin_path, dll))
+    else:
+        deployer.add_glob(qt_bin_path, 'Qt6*.dll')
 
-for dll in webengine_dlls:
-    src_path = os.path.join(qt_bin_path, dll)
-    if os.path.exists(src_path):
-        dst_path = os.path.join(bin_dir, dll)
-        if not os.path.exists(dst_path):
-            shutil.copy2(src_path, dst_path)
-            print(f"[OK] 复制WebEngine DLL: {dll}")
-
-# 复制插件目录
-plugins_src = os.path.join(qt_plugins_path)
-plugins_dst = os.path.join(bin_dir, 'plugins')
-
-if os.path.exists(plugins_src):
-    if os.path.exists(plugins_dst):
-        shutil.rmtree(plugins_dst)
-    shutil.copytree(plugins_src, plugins_dst)
-    print(f"[OK] 复制插件目录: {plugins_dst}")
+    # 复制WebEngine特定DLL
+    webengine_dlls = [
+        'Qt6WebEngineCore.dll',
+        'Qt6WebEngineWidgets.dll', 
+        'Qt6WebEngineProcess.exe'
+    ]
+
+    for dll in webengine_dlls:
+        deployer.add_file(os.path.join(qt_bin_path, dll))
+
+    # 复制插件目录
+    if os.path.exists(qt_plugins_path):
+        deployer.add_tree(qt_plugins_path, 'plugins')
+
+    with build_trace.phase('deploy'):
+        deployer.deploy()
+else:
+    print("[INFO] deploy=0，跳过Qt6运行时文件部署")
 
 print("[INFO] 本地Qt6 WebEngine配置完成!")
 print(f"[INFO] 可执行文件路径: {exe_path}")
@@ -0,0 +1,579 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常驻构建服务
+每次运行 scons 都要重新执行 SConstruct：探测路径、扫描源码目录、读头文件查找 Q_OBJECT、创建MOC构建器，
+只改一个文件也要等很久。构建服务常驻内存，保存 SCons 实际执行过的MOC、编译和链接命令
+（SConstruct 记录到 obj/build_plan.json）、编译环境和每个目标文件依赖的项目文件；
+监视 src/ 目录，文件保存后只重新运行受影响的MOC、编译和链接步骤
+
+新增/删除源文件或需要MOC的头文件（构建结构变化）时，服务重新运行一次完整的 scons 并重新读取构建计划
+
+    python build_daemon.py serve [scons参数...]   启动服务（没有构建计划时先运行一次完整的 scons）
+    python build_daemon.py build                  请求一次增量构建，输出构建日志
+    python build_daemon.py status                 查看服务状态和上次构建结果
+    python build_daemon.py stop                   停止服务
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import threading
+import subprocess
+from contextlib import redirect_stdout
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from multiprocessing.connection import Listener, Client, AuthenticationError
+
+from build_trace import classify_command, command_output
+from object_cache import ObjectCache, expand_response_files
+from header_deps import HeaderDeps, command_source, has_deps_flag
+from include_graph import IncludeResolver, analyze_unit
+from source_discovery import discover_sources
+from moc_cache import MocCache
+from moc_batch import run_moc_batch, default_workers
+from conan_watch import create_watcher
+
+PLAN_FILE_NAME = 'build_plan.json'
+PLAN_VERSION = 1
+STATE_FILE_NAME = '.build_daemon.json'
+
+# 编辑器保存文件时常常连续写入几次，安静这么久之后才开始构建
+DEBOUNCE_SECONDS = 0.05
+WATCH_POLL_INTERVAL = 0.2
+# 监视线程检查退出标志的间隔
+WATCH_TIMEOUT = 1.0
+
+INCLUDE_FLAGS = (('/FI', 'forced'), ('-include', 'forced'), ('/I', 'dir'), ('-I', 'dir'))
+PCH_CREATE_FLAGS = ('/yc', '-x')
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+        return [st.st_size, st.st_mtime_ns]
+    except OSError:
+        return None
+
+
+class BuildPlan:
+    """SCons 执行过的构建步骤（obj/build_plan.json）
+
+    SConstruct 中用 wrap_spawn() 记录编译和链接命令，用 record_tree()、record_moc() 记录源码结构和MOC任务；
+    SCons 只运行过期的命令，因此新记录与已有记录合并
+    """
+
+    def __init__(self, obj_dir):
+        self.obj_dir = os.path.abspath(str(obj_dir))
+        self.path = os.path.join(self.obj_dir, PLAN_FILE_NAME)
+        self._lock = threading.Lock()
+        self._dirty = False
+        data = self._load()
+        # 目标文件 -> {'source', 'args', 'cwd'}
+        self.compiles = data.get('compiles', {})
+        # {'output', 'args', 'cwd'}
+        self.link = data.get('link')
+        # {'moc_exe', 'jobs': [[头文件, 输出], ...], 'copies': [[MOC输出, 复制的.cpp], ...]}
+        self.moc = data.get('moc')
+        # {'sources', 'moc_headers', 'sconstruct', 'arguments'}
+        self.tree = data.get('tree')
+        self.env = data.get('env', {})
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == PLAN_VERSION:
+                return data
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            # 源文件已删除的编译命令不再保留
+            self.compiles = {output: entry for output, entry in self.compiles.items()
+                             if os.path.isfile(entry['source'])}
+            data = {'version': PLAN_VERSION, 'compiles': self.compiles, 'link': self.link,
+                    'moc': self.moc, 'tree': self.tree, 'env': self.env}
+            self._dirty = False
+        os.makedirs(self.obj_dir, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def record_tree(self, sources, moc_headers, sconstruct='SConstruct', arguments=None):
+        """记录源文件和需要MOC的头文件，构建服务据此判断构建结构是否变化"""
+        with self._lock:
+            self.tree = {
+                'sources': sorted(os.path.abspath(str(s)) for s in sources),
+                'moc_headers': sorted(os.path.abspath(str(h)) for h in moc_headers),
+                'sconstruct': sconstruct,
+                'arguments': dict(arguments or {}),
+            }
+            self._dirty = True
+
+    def record_moc(self, moc_exe, jobs, copies=()):
+        """记录MOC任务 [(头文件, 输出), ...]；copies 是生成后还要复制的文件 [(MOC输出, .cpp), ...]"""
+        with self._lock:
+            self.moc = {
+                'moc_exe': os.path.abspath(str(moc_exe)),
+                'jobs': [[os.path.abspath(str(h)), os.path.abspath(str(o))] for h, o in jobs],
+                'copies': [[os.path.abspath(str(s)), os.path.abspath(str(d))] for s, d in copies],
+            }
+            self._dirty = True
+
+    def record_command(self, args, env=None, cwd=None):
+        """记录一条成功执行的编译或链接命令"""
+        cwd = cwd or os.getcwd()
+        category, _ = classify_command(args)
+        output = command_output(args)
+        if output is None or category not in ('compile', 'link'):
+            return
+        entry = {'args': list(args), 'cwd': cwd}
+        with self._lock:
+            if category == 'compile':
+                source = command_source(args)
+                if source is None:
+                    return
+                entry['source'] = os.path.join(cwd, source)
+                self.compiles[os.path.join(cwd, output)] = entry
+            else:
+                entry['output'] = os.path.join(cwd, output)
+                self.link = entry
+            if env:
+                self.env = {str(k): str(v) for k, v in env.items()}
+            self._dirty = True
+
+    def wrap_spawn(self, spawn):
+        """包装 SCons 的 SPAWN，记录成功执行的编译和链接命令
+
+        命令行过长时 SCons 使用临时的 @响应文件，记录前先展开
+        """
+        def recording_spawn(sh, escape, cmd, args, env):
+            expanded = [str(arg).strip('"') for arg in args]
+            expanded = expanded[:1] + expand_response_files(expanded[1:])
+            returncode = spawn(sh, escape, cmd, args, env)
+            if returncode == 0:
+                self.record_command(expanded, env)
+            return returncode
+        return recording_spawn
+
+
+def _command_includes(args, cwd):
+    """编译命令中的包含目录和强制包含文件"""
+    dirs = []
+    forced = []
+    i = 1
+    while i < len(args):
+        arg = args[i]
+        for flag, kind in INCLUDE_FLAGS:
+            if arg.startswith(flag):
+                value = arg[len(flag):]
+                if not value and i + 1 < len(args):
+                    i += 1
+                    value = args[i]
+                (forced if kind == 'forced' else dirs).append(os.path.join(cwd, value.strip('"')))
+                break
+        i += 1
+    return dirs, forced
+
+
+def _creates_pch(args):
+    """创建预编译头的命令（/Yc，或GCC编译 -x c++-header）要先于使用它的命令执行"""
+    return any(str(arg).lower().startswith(PCH_CREATE_FLAGS) for arg in args[1:])
+
+
+class _LogCapture(io.TextIOBase):
+    """同时写到原来的输出和缓冲区，构建日志返回给客户端"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.parts = []
+
+    def write(self, text):
+        self.stream.write(text)
+        self.parts.append(text)
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def getvalue(self):
+        return ''.join(self.parts)
+
+
+class IncrementalBuilder:
+    """按构建计划增量构建
+
+    每个步骤（MOC输出、目标文件、程序）保存上次运行时输入文件的大小和修改时间，
+    输入有变化或输出不存在时重新运行该步骤
+    """
+
+    def __init__(self, project_root, src_dir, obj_dir, scons_args=()):
+        self.project_root = os.path.abspath(str(project_root))
+        self.src_dir = os.path.abspath(str(src_dir))
+        self.obj_dir = os.path.abspath(str(obj_dir))
+        self.scons_args = list(scons_args)
+        self.lock = threading.Lock()
+        self.builds = 0
+        self.last_result = None
+        self.reload()
+
+    def reload(self):
+        """重新读取构建计划，计算依赖；输出比所有输入都新的步骤视为最新"""
+        self.plan = BuildPlan(self.obj_dir)
+        # 与 scons 构建一致：只有 scons objcache=1 时才使用编译缓存
+        # （否则每次未命中都多一次预处理，还会写入 ~/.cache 并把 /Zi 改成 /Z7）
+        objcache = self.scons_arguments().get('objcache', '0')
+        self.object_cache = ObjectCache(enabled=objcache != '0')
+        self.header_deps = HeaderDeps(self.obj_dir, self.project_root)
+        moc = self.plan.moc
+        self.moc_cache = MocCache(moc['moc_exe'], self.obj_dir) if moc and os.path.isfile(moc['moc_exe']) else None
+        self.deps = {output: self._dependencies(entry) for output, entry in self.plan.compiles.items()}
+        self.inputs = {}
+        for output, files in self._steps():
+            output_stamp = _stamp(output)
+            stamps = {path: _stamp(path) for path in files}
+            if output_stamp and all(stamp and stamp[1] <= output_stamp[1] for stamp in stamps.values()):
+                self.inputs[output] = stamps
+
+    def _steps(self):
+        """所有步骤 (输出, 输入文件列表)"""
+        moc = self.plan.moc or {}
+        for header, output in moc.get('jobs', []):
+            yield output, [header]
+        for source, target in moc.get('copies', []):
+            yield target, [source]
+        for output in self.plan.compiles:
+            yield output, self.deps[output]
+        if self.plan.link:
+            yield self.plan.link['output'], sorted(self.plan.compiles)
+
+    def _is_project_file(self, path):
+        return os.path.normcase(os.path.abspath(path)).startswith(os.path.normcase(self.project_root) + os.sep)
+
+    def _dependencies(self, entry):
+        """目标文件依赖的项目文件：优先用编译器输出的依赖（deps=compiler），否则按 #include 扫描"""
+        source = entry['source']
+        recorded = self.header_deps.dependencies(source)
+        if recorded is not None:
+            return [source] + list(recorded[0])
+        dirs, forced = _command_includes(entry['args'], entry['cwd'])
+        resolver = IncludeResolver([d for d in dirs if self._is_project_file(d)])
+        unit = analyze_unit(resolver, source, [path for path in forced if os.path.isfile(path)])
+        return [source] + sorted(path for path in unit.headers if self._is_project_file(path))
+
+    def _stale(self, output, files):
+        """过期时返回当前的输入指纹，否则返回 None"""
+        stamps = {path: _stamp(path) for path in files}
+        if _stamp(output) is None or self.inputs.get(output) != stamps:
+            return stamps
+        return None
+
+    def build(self):
+        """运行一次增量构建（同一时间只有一个构建），返回结果字典"""
+        with self.lock:
+            capture = _LogCapture(sys.stdout)
+            start = time.perf_counter()
+            with redirect_stdout(capture):
+                returncode, steps = self._build()
+                elapsed = time.perf_counter() - start
+                status = '[OK] 构建完成' if returncode == 0 else f'[ERROR] 构建失败, 返回码 {returncode}'
+                print(f"{status}: MOC {steps['moc']} 个, 编译 {steps['compile']} 个, "
+                      f"链接 {steps['link']} 次, 耗时 {elapsed:.3f}秒")
+            self.builds += 1
+            self.last_result = {'returncode': returncode, 'steps': steps, 'elapsed': round(elapsed, 3),
+                                'time': time.strftime('%Y-%m-%d %H:%M:%S')}
+            return dict(self.last_result, log=capture.getvalue())
+
+    def _build(self):
+        steps = {'moc': 0, 'compile': 0, 'link': 0}
+        tree = self.plan.tree
+        if not tree or not self.plan.link:
+            print("[INFO] 没有构建计划，运行完整的scons")
+            return self._full_build(), steps
+        source_tree = discover_sources(self.src_dir, self.obj_dir)
+        if (sorted(source_tree.sources) != tree['sources']
+                or sorted(source_tree.moc_headers) != tree['moc_headers']):
+            print("[INFO] 源文件或需要MOC的头文件有增减，运行完整的scons")
+            return self._full_build(), steps
+
+        returncode = self._build_moc(steps)
+        if returncode == 0:
+            returncode = self._build_objects(steps)
+        if returncode == 0:
+            returncode = self._link(steps)
+        return returncode, steps
+
+    def _build_moc(self, steps):
+        moc = self.plan.moc or {}
+        pending = []
+        for header, output in moc.get('jobs', []):
+            stamps = self._stale(output, [header])
+            if stamps is not None:
+                pending.append((header, output, stamps))
+        if pending:
+            if self.moc_cache is None:
+                print(f"[ERROR] MOC工具不存在: {moc.get('moc_exe')}")
+                return 1
+            returncode = run_moc_batch(self.moc_cache, [(header, output) for header, output, _ in pending])
+            self.moc_cache.save()
+            if returncode != 0:
+                return returncode
+            for _, output, stamps in pending:
+                self.inputs[output] = stamps
+            steps['moc'] = len(pending)
+
+        for source, target in moc.get('copies', []):
+            stamps = self._stale(target, [source])
+            if stamps is not None:
+                shutil.copy2(source, target)
+                self.inputs[target] = stamps
+        return 0
+
+    def _compile(self, entry):
+        args = entry['args']
+        env = self.plan.env or None
+        start = time.perf_counter()
+        if has_deps_flag(args):
+            result = self.header_deps.compile(args, self.object_cache, env=env, cwd=entry['cwd'])
+        else:
+            result = self.object_cache.compile(args, env=env, cwd=entry['cwd'])
+        return result, time.perf_counter() - start
+
+    def _build_objects(self, steps):
+        pending = []
+        for output, entry in self.plan.compiles.items():
+            stamps = self._stale(output, self.deps[output])
+            if stamps is not None:
+                pending.append((output, entry, stamps))
+        if not pending:
+            return 0
+
+        # 预编译头先编译，其余并行
+        stages = [[job for job in pending if _creates_pch(job[1]['args'])],
+                  [job for job in pending if not _creates_pch(job[1]['args'])]]
+        failed = 0
+        for stage in stages:
+            if not stage or failed:
+                continue
+            with ThreadPoolExecutor(max_workers=max(1, min(default_workers(), len(stage)))) as executor:
+                futures = {executor.submit(self._compile, entry): (output, entry, stamps)
+                           for output, entry, stamps in stage}
+                for future in as_completed(futures):
+                    output, entry, stamps = futures[future]
+                    result, elapsed = future.result()
+                    for text in (result.stdout, result.stderr):
+                        lines = [line for line in (text or '').splitlines() if line.strip()]
+                        if lines:
+                            print('\n'.join(lines))
+                    if result.returncode != 0:
+                        print(f"[ERROR] 编译失败 ({elapsed:.2f}秒): {entry['source']}")
+                        failed = failed or result.returncode
+                        continue
+                    print(f"[OK] 编译 {result.cache_status:<11} {elapsed:6.2f}秒  "
+                          f"{os.path.basename(entry['source'])} -> {output}")
+                    # 依赖可能因为新增的 #include 而变化；编译前取得的指纹保证编译期间的修改不会丢失
+                    self.deps[output] = self._dependencies(entry)
+                    self.inputs[output] = {path: stamps.get(path, _stamp(path)) for path in self.deps[output]}
+                    steps['compile'] += 1
+        self.header_deps.save()
+        return failed
+
+    def _link(self, steps):
+        link = self.plan.link
+        stamps = self._stale(link['output'], sorted(self.plan.compiles))
+        if stamps is None:
+            return 0
+        start = time.perf_counter()
+        result = subprocess.run(link['args'], capture_output=True, text=True, errors='replace',
+                                env=self.plan.env or None, cwd=link['cwd'])
+        for text in (result.stdout, result.stderr):
+            if text and text.strip():
+                print(text.rstrip())
+        if result.returncode != 0:
+            print(f"[ERROR] 链接失败: {link['output']}")
+            return result.returncode
+        print(f"[OK] 链接 {time.perf_counter() - start:6.2f}秒  {link['output']}")
+        self.inputs[link['output']] = stamps
+        steps['link'] = 1
+        return 0
+
+    def scons_arguments(self):
+        """scons 的 key=value 参数：服务启动参数，或者构建计划中记录的参数"""
+        if self.scons_args:
+            return dict(arg.split('=', 1) for arg in self.scons_args if '=' in arg)
+        return dict((self.plan.tree or {}).get('arguments', {}))
+
+    def scons_command(self):
+        """完整构建使用的scons命令：服务启动参数，或者构建计划中记录的 SConstruct 和参数"""
+        command = ['scons', f'-j{default_workers()}']
+        if self.scons_args:
+            return command + self.scons_args
+        tree = self.plan.tree or {}
+        if tree.get('sconstruct', 'SConstruct') != 'SConstruct':
+            command += ['-f', tree['sconstruct']]
+        return command + [f"{key}={value}" for key, value in sorted(self.scons_arguments().items())]
+
+    def _full_build(self):
+        command = subprocess.list2cmdline(self.scons_command())
+        print(f"[CMD] {command}")
+        proc = subprocess.Popen(command, shell=True, cwd=self.project_root, stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT, text=True, errors='replace')
+        for line in proc.stdout:
+            print(line.rstrip())
+        returncode = proc.wait()
+        self.reload()
+        return returncode
+
+
+def _state_path(obj_dir):
+    return os.path.join(str(obj_dir), STATE_FILE_NAME)
+
+
+class BuildServer:
+    """本机回环地址上的构建服务（multiprocessing.connection，连接需要 obj/.build_daemon.json 中的密钥）"""
+
+    def __init__(self, builder):
+        self.builder = builder
+        self.stopping = threading.Event()
+        self.started = time.strftime('%Y-%m-%d %H:%M:%S')
+
+    def _watch(self):
+        watcher = create_watcher([self.builder.src_dir], recursive=True, poll_interval=WATCH_POLL_INTERVAL)
+        try:
+            while not self.stopping.is_set():
+                changed = watcher.wait(timeout=WATCH_TIMEOUT)
+                if not changed:
+                    continue
+                while True:
+                    more = watcher.wait(timeout=DEBOUNCE_SECONDS)
+                    if not more:
+                        break
+                    changed.extend(more)
+                names = sorted({os.path.relpath(path, self.builder.project_root) for path in changed})
+                print(f"\n[INFO] 检测到变化: {', '.join(names)}")
+                self.builder.build()
+        finally:
+            watcher.close()
+
+    def status(self):
+        plan = self.builder.plan
+        return {
+            'pid': os.getpid(),
+            'project': self.builder.project_root,
+            'started': self.started,
+            'builds': self.builder.builds,
+            'building': self.builder.lock.locked(),
+            'compiles': len(plan.compiles),
+            'moc_jobs': len((plan.moc or {}).get('jobs', [])),
+            'last': self.builder.last_result,
+        }
+
+    def _reply_build(self, conn):
+        try:
+            conn.send(self.builder.build())
+        except Exception as e:
+            conn.send({'returncode': 1, 'log': f"[ERROR] 构建服务异常: {e}\n"})
+        finally:
+            conn.close()
+
+    def serve(self):
+        authkey = os.urandom(16)
+        listener = Listener(('127.0.0.1', 0), authkey=authkey)
+        state_path = _state_path(self.builder.obj_dir)
+        os.makedirs(self.builder.obj_dir, exist_ok=True)
+        tmp_path = state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'pid': os.getpid(), 'port': listener.address[1], 'authkey': authkey.hex()}, f)
+        os.replace(tmp_path, state_path)
+        print(f"[OK] 构建服务已启动 (端口 {listener.address[1]}), 监视 {self.builder.src_dir}")
+
+        self.builder.build()
+        threading.Thread(target=self._watch, daemon=True).start()
+        try:
+            while not self.stopping.is_set():
+                try:
+                    conn = listener.accept()
+                    request = conn.recv()
+                except (AuthenticationError, OSError, EOFError):
+                    continue
+                command = request.get('command') if isinstance(request, dict) else None
+                if command == 'build':
+                    # 构建期间仍然可以查询状态
+                    threading.Thread(target=self._reply_build, args=(conn,), daemon=True).start()
+                    continue
+                if command == 'status':
+                    conn.send(self.status())
+                elif command == 'stop':
+                    self.stopping.set()
+                    conn.send({'stopped': True})
+                else:
+                    conn.send({'error': f"未知命令: {command}"})
+                conn.close()
+        finally:
+            listener.close()
+            try:
+                os.remove(state_path)
+            except OSError:
+                pass
+            print("[INFO] 构建服务已停止")
+
+
+def request(obj_dir, command):
+    """向构建服务发送命令，服务没有运行时返回 None"""
+    try:
+        with open(_state_path(obj_dir), 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        conn = Client(('127.0.0.1', state['port']), authkey=bytes.fromhex(state['authkey']))
+    except (OSError, ValueError, KeyError):
+        return None
+    try:
+        conn.send({'command': command})
+        return conn.recv()
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    # 用法: python build_daemon.py serve [scons参数...] | build | status | stop  （在项目根目录运行）
+    project_root = os.path.abspath('.')
+    obj_dir = os.path.join(project_root, 'obj')
+    command = sys.argv[1] if len(sys.argv) > 1 else 'build'
+
+    if command == 'serve':
+        if request(obj_dir, 'status') is not None:
+            print("[ERROR] 构建服务已经在运行")
+            sys.exit(1)
+        builder = IncrementalBuilder(project_root, os.path.join(project_root, 'src'), obj_dir, sys.argv[2:])
+        try:
+            BuildServer(builder).serve()
+        except KeyboardInterrupt:
+            pass
+        sys.exit(0)
+
+    if command not in ('build', 'status', 'stop'):
+        print("用法: python build_daemon.py serve [scons参数...] | build | status | stop")
+        sys.exit(1)
+    reply = request(obj_dir, command)
+    if reply is None:
+        print("[ERROR] 构建服务没有运行，先执行: python build_daemon.py serve")
+        sys.exit(1)
+    if command == 'build':
+        sys.stdout.write(reply.get('log', ''))
+        sys.exit(reply.get('returncode', 1))
+    if command == 'status':
+        last = reply.get('last') or {}
+        print(f"[INFO] 构建服务 pid {reply['pid']}, 启动于 {reply['started']}, 已构建 {reply['builds']} 次"
+              f"{', 正在构建' if reply['building'] else ''}")
+        print(f"[INFO] 构建计划: {reply['compiles']} 个编译命令, {reply['moc_jobs']} 个MOC任务")
+        if last:
+            print(f"[INFO] 上次构建 {last['time']}: 返回码 {last['returncode']}, 耗时 {last['elapsed']}秒")
+    else:
+        print("[OK] 构建服务已停止")
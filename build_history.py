@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+构建历史数据库
+每次构建把各编译单元/链接步骤的耗时、输出文件大小和工具链版本追加到本地SQLite，
+report 命令把最近一次构建与滚动基线（之前若干次成功构建的中位数）比较，标出变慢的步骤；
+命中编译缓存的编译（cache_status=hit，只是复制目标文件）既不计入基线也不参与比较
+
+数据库放在项目根目录（obj目录会被 compile.py 清理）
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import platform
+import statistics
+import subprocess
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB_PATH = os.path.join(PROJECT_ROOT, '.build_history.sqlite3')
+
+# 基线窗口：最近几次成功构建
+BASELINE_WINDOW = 5
+# 超过基线多少比例才算变慢，并且绝对差值不少于 MIN_DELTA 秒（忽略很短步骤的抖动）
+SLOWDOWN_THRESHOLD = 0.25
+MIN_DELTA = 0.5
+
+# 只记录这些类别的耗时（phase 为扫描、MOC、部署等阶段）
+RECORDED_CATEGORIES = ('compile', 'link', 'moc', 'discovery', 'deploy', 'scons', 'clean')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started REAL NOT NULL,
+    script TEXT NOT NULL,
+    toolchain TEXT NOT NULL,
+    host TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    wall REAL,
+    cpu REAL
+);
+CREATE TABLE IF NOT EXISTS timings (
+    build_id INTEGER NOT NULL REFERENCES builds(id) ON DELETE CASCADE,
+    category TEXT NOT NULL,
+    target TEXT NOT NULL,
+    wall REAL NOT NULL,
+    cpu REAL,
+    output_size INTEGER,
+    cache_status TEXT
+);
+CREATE INDEX IF NOT EXISTS timings_target ON timings(category, target);
+"""
+
+
+def toolchain_identity(metadata=None):
+    """工具链标识：优先使用构建脚本记录的版本，否则读取vcvars环境变量或编译器版本输出"""
+    if metadata and metadata.get('toolchain'):
+        return metadata['toolchain']
+    if os.environ.get('VCToolsVersion'):
+        return f"MSVC {os.environ['VCToolsVersion']}"
+    for cmd in (['cl'], ['c++', '--version']):
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, errors='replace', timeout=10)
+        except (OSError, subprocess.SubprocessError):
+            continue
+        # cl 把版本信息输出到stderr
+        lines = (result.stderr + result.stdout).strip().splitlines()
+        if lines:
+            return lines[0].strip()
+    return 'unknown'
+
+
+class BuildHistory:
+    """构建历史数据库"""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self.conn.executescript(SCHEMA)
+        # 旧数据库没有 cache_status 列
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(timings)')]
+        if 'cache_status' not in columns:
+            self.conn.execute('ALTER TABLE timings ADD COLUMN cache_status TEXT')
+
+    def close(self):
+        self.conn.close()
+
+    def record(self, trace, script, success, toolchain=None):
+        """把一次构建的trace（build_trace.BuildTrace）写入数据库，返回构建ID"""
+        wall, cpu = trace.totals()
+        rows = []
+        for event in trace.events:
+            if event['cat'] not in RECORDED_CATEGORIES:
+                continue
+            args = event.get('args', {})
+            output = args.get('output')
+            target = os.path.relpath(output) if output else event['name']
+            size = None
+            if output:
+                try:
+                    size = os.path.getsize(output)
+                except OSError:
+                    pass
+            rows.append((event['cat'], target, event['dur'] / 1e6, args.get('cpu'), size,
+                         args.get('cache_status')))
+
+        with self.conn:
+            cursor = self.conn.execute(
+                'INSERT INTO builds (started, script, toolchain, host, success, wall, cpu) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (trace.start_wall, script, toolchain or toolchain_identity(trace.metadata),
+                 platform.node(), int(bool(success)), wall, cpu))
+            build_id = cursor.lastrowid
+            self.conn.executemany(
+                'INSERT INTO timings (build_id, category, target, wall, cpu, output_size, cache_status) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(build_id,) + row for row in rows])
+        return build_id
+
+    def builds(self, limit=20):
+        return self.conn.execute(
+            'SELECT id, started, script, toolchain, success, wall, cpu FROM builds '
+            'ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+
+    def regressions(self, build_id=None, window=BASELINE_WINDOW,
+                    threshold=SLOWDOWN_THRESHOLD, min_delta=MIN_DELTA):
+        """比较指定构建（默认最近一次）与基线，返回变慢的步骤列表
+
+        基线只取同一脚本、同一工具链的成功构建，换编译器不会被当成变慢；
+        命中编译缓存的步骤不计入基线，本次命中缓存的步骤也不比较
+        每项为 (类别, 目标, 本次耗时, 基线耗时, 本次大小, 基线大小)
+        """
+        if build_id is None:
+            row = self.conn.execute('SELECT MAX(id) FROM builds').fetchone()
+            build_id = row[0]
+            if build_id is None:
+                return []
+        build = self.conn.execute(
+            'SELECT script, toolchain FROM builds WHERE id = ?', (build_id,)).fetchone()
+        if build is None:
+            return []
+        baseline_ids = [row[0] for row in self.conn.execute(
+            'SELECT id FROM builds WHERE script = ? AND toolchain = ? AND success = 1 AND id < ? '
+            'ORDER BY id DESC LIMIT ?', (build[0], build[1], build_id, window))]
+        if not baseline_ids:
+            return []
+
+        baseline = {}
+        placeholders = ','.join('?' * len(baseline_ids))
+        for category, target, wall, size in self.conn.execute(
+                f'SELECT category, target, wall, output_size FROM timings '
+                f"WHERE build_id IN ({placeholders}) AND COALESCE(cache_status, '') != 'hit'", baseline_ids):
+            entry = baseline.setdefault((category, target), ([], []))
+            entry[0].append(wall)
+            if size is not None:
+                entry[1].append(size)
+
+        results = []
+        for category, target, wall, size in self.conn.execute(
+                "SELECT category, target, wall, output_size FROM timings "
+                "WHERE build_id = ? AND COALESCE(cache_status, '') != 'hit'", (build_id,)):
+            if (category, target) not in baseline:
+                continue
+            walls, sizes = baseline[(category, target)]
+            base_wall = statistics.median(walls)
+            if wall - base_wall >= min_delta and wall > base_wall * (1 + threshold):
+                base_size = int(statistics.median(sizes)) if sizes else None
+                results.append((category, target, wall, base_wall, size, base_size))
+        results.sort(key=lambda item: item[3] - item[2])
+        return results
+
+
+def record_build(trace, script, success, db_path=DEFAULT_DB_PATH):
+    """构建脚本调用：记录本次构建并打印变慢的步骤；记录失败不影响构建结果"""
+    try:
+        history = BuildHistory(db_path)
+        try:
+            build_id = history.record(trace, script, success)
+            print(f"[INFO] 构建历史已记录: #{build_id} ({db_path})")
+            print_report(history, build_id)
+        finally:
+            history.close()
+    except sqlite3.Error as e:
+        print(f"[WARN] 无法写入构建历史: {e}")
+
+
+def print_report(history, build_id=None, **kwargs):
+    regressions = history.regressions(build_id, **kwargs)
+    if not regressions:
+        print("[OK] 没有比基线明显变慢的步骤")
+        return 0
+    print(f"[WARN] {len(regressions)} 个步骤比基线变慢:")
+    for category, target, wall, base_wall, size, base_size in regressions:
+        line = f"  [{category}] {target}: {wall:.2f}秒 (基线 {base_wall:.2f}秒)"
+        if size is not None and base_size:
+            line += f", 输出 {size / 1024:.0f}KB (基线 {base_size / 1024:.0f}KB)"
+        print(line)
+    return len(regressions)
+
+
+if __name__ == "__main__":
+    # 用法:
+    #   python build_history.py report [构建ID] [基线次数] [阈值比例]
+    #   python build_history.py list [数量]
+    command = sys.argv[1] if len(sys.argv) > 1 else 'report'
+    if not os.path.exists(DEFAULT_DB_PATH):
+        print(f"[ERROR] 构建历史数据库不存在: {DEFAULT_DB_PATH}")
+        sys.exit(1)
+    history = BuildHistory()
+    try:
+        if command == 'list':
+            limit = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+            for build_id, started, script, toolchain, success, wall, cpu in history.builds(limit):
+                status = '成功' if success else '失败'
+                print(f"#{build_id:<5} {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(started))}  "
+                      f"{script:<16} {status}  {wall or 0:8.2f}秒  {toolchain}")
+        elif command == 'report':
+            build_id = int(sys.argv[2]) if len(sys.argv) > 2 else None
+            window = int(sys.argv[3]) if len(sys.argv) > 3 else BASELINE_WINDOW
+            threshold = float(sys.argv[4]) if len(sys.argv) > 4 else SLOWDOWN_THRESHOLD
+            # 有变慢的步骤时返回1，便于在CI中使用
+            sys.exit(1 if print_report(history, build_id, window=window, threshold=threshold) else 0)
+        else:
+            print(f"[ERROR] 未知命令: {command}（可用: report, list）")
+            sys.exit(1)
+    finally:
+        history.close()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+构建过程分阶段计时
+记录扫描、MOC、每个编译命令、链接和部署的耗时（墙钟时间和CPU时间），
+输出 Chrome trace JSON（chrome://tracing 或 https://ui.perfetto.dev 打开）和汇总表
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+from object_cache import expand_response_files
+
+TRACE_FILE_NAME = 'build_trace.json'
+
+
+def _cpu_seconds():
+    """本进程及已结束子进程的CPU时间（Windows上不含子进程）"""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def _command_args(args):
+    """命令行参数，展开 SCons 命令行过长时使用的 @响应文件"""
+    args = [str(arg) for arg in args]
+    return args[:1] + expand_response_files([arg.strip('"') for arg in args[1:]])
+
+
+def classify_command(args):
+    """根据命令行判断构建步骤类型，返回 (类别, 显示名称)"""
+    args = _command_args(args)
+    if not args:
+        return 'command', ''
+    tool = os.path.basename(args[0].strip('"')).lower()
+    sources = [arg for arg in args if arg.lower().endswith(('.cpp', '.cxx', '.cc', '.c'))]
+    if tool.startswith('moc'):
+        return 'moc', os.path.basename(args[-1])
+    if tool in ('link', 'link.exe', 'lld-link', 'lld-link.exe') or (
+            '/c' not in args and '-c' not in args and not sources):
+        for i, arg in enumerate(args):
+            if arg.lower().startswith('/out:'):
+                return 'link', arg[5:]
+            if arg == '-o' and i + 1 < len(args):
+                return 'link', args[i + 1]
+        return 'link', tool
+    if sources:
+        return 'compile', os.path.basename(sources[0])
+    return 'command', tool
+
+
+def command_output(args):
+    """命令行中的输出文件（/Fo、/OUT:、-o），找不到时返回None"""
+    args = _command_args(args)
+    for i, arg in enumerate(args):
+        lower = arg.lower()
+        if lower.startswith('/fo') and len(arg) > 3:
+            return arg[3:].strip('"')
+        if lower.startswith('/out:'):
+            return arg[5:].strip('"')
+        if arg == '-o' and i + 1 < len(args):
+            return args[i + 1]
+    return None
+
+
+class BuildTrace:
+    """构建计时记录器（线程安全，可在 scons -j 的多个工作线程中使用）"""
+
+    def __init__(self, name='build'):
+        self.name = name
+        self.events = []
+        # 附加信息（例如工具链版本），写入trace的 otherData
+        self.metadata = {}
+        self.start_wall = time.time()
+        self.start_perf = time.perf_counter()
+        self.start_cpu = _cpu_seconds()
+        self._lock = threading.Lock()
+        self._lanes = {}
+
+    def _lane(self):
+        ident = threading.get_ident()
+        with self._lock:
+            return self._lanes.setdefault(ident, len(self._lanes))
+
+    def _timestamp_us(self, perf):
+        # 使用绝对时间戳，便于合并多个进程的trace
+        return int((self.start_wall + perf - self.start_perf) * 1e6)
+
+    def add_event(self, name, category, start_perf, wall, cpu=None, **args):
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': self._timestamp_us(start_perf),
+            'dur': int(wall * 1e6),
+            'pid': os.getpid(),
+            'tid': self._lane(),
+            'args': dict(args, wall=round(wall, 4)),
+        }
+        if cpu is not None:
+            event['args']['cpu'] = round(cpu, 4)
+        with self._lock:
+            self.events.append(event)
+
+    @contextmanager
+    def phase(self, name, category=None, **args):
+        """记录一个阶段：with trace.phase('discovery'): ...（类别默认与阶段名相同）"""
+        category = category or name
+        start = time.perf_counter()
+        cpu_start = _cpu_seconds()
+        try:
+            yield
+        finally:
+            self.add_event(name, category, start, time.perf_counter() - start,
+                           _cpu_seconds() - cpu_start, **args)
+
+    def totals(self):
+        """从开始到现在的 (墙钟秒数, CPU秒数)"""
+        return time.perf_counter() - self.start_perf, _cpu_seconds() - self.start_cpu
+
+    def wrap_spawn(self, spawn, cache_status=None):
+        """包装 SCons 的 SPAWN 函数，记录每个编译/链接命令的耗时
+
+        并行构建时各命令共享本进程的子进程CPU计数，因此命令只记录墙钟时间
+        cache_status: 启用编译缓存时传入 ObjectCache.take_status，事件中记录 hit/miss
+        """
+        def timed_spawn(sh, escape, cmd, args, env):
+            category, label = classify_command(args)
+            output = command_output(args)
+            start = time.perf_counter()
+            returncode = None
+            extra = {}
+            try:
+                returncode = spawn(sh, escape, cmd, args, env)
+                return returncode
+            finally:
+                status = cache_status() if cache_status is not None else None
+                if status is not None:
+                    extra['cache_status'] = status
+                self.add_event(label or cmd, category, start, time.perf_counter() - start,
+                               returncode=returncode, output=output, **extra)
+        return timed_spawn
+
+    def load_events(self, path):
+        """合并其他进程写出的trace（例如 compile.py 合并 SCons 的trace）"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        events = data.get('traceEvents', [])
+        with self._lock:
+            self.events.extend(events)
+            for key, value in data.get('otherData', {}).get('metadata', {}).items():
+                self.metadata.setdefault(key, value)
+        return len(events)
+
+    def write_chrome_trace(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._lock:
+            events = sorted(self.events, key=lambda e: e['ts'])
+        wall, cpu = self.totals()
+        data = {
+            'traceEvents': events,
+            'displayTimeUnit': 'ms',
+            'otherData': {
+                'name': self.name,
+                'wall': round(wall, 4),
+                'cpu': round(cpu, 4),
+                'metadata': self.metadata,
+            },
+        }
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def summary_table(self, top=10):
+        """按类别汇总，并列出最慢的若干步骤"""
+        with self._lock:
+            events = list(self.events)
+        groups = {}
+        for event in events:
+            group = groups.setdefault(event['cat'], {'count': 0, 'wall': 0.0, 'cpu': 0.0, 'max': 0.0})
+            wall = event['dur'] / 1e6
+            group['count'] += 1
+            group['wall'] += wall
+            group['cpu'] += event.get('args', {}).get('cpu') or 0.0
+            group['max'] = max(group['max'], wall)
+
+        lines = [f"{'类别':<10}{'次数':>6}{'墙钟(秒)':>12}{'CPU(秒)':>12}{'最长(秒)':>12}"]
+        for category, group in sorted(groups.items(), key=lambda item: -item[1]['wall']):
+            cpu = f"{group['cpu']:.2f}" if group['cpu'] else '-'
+            lines.append(f"{category:<10}{group['count']:>6}{group['wall']:>12.2f}{cpu:>12}{group['max']:>12.2f}")
+
+        slowest = sorted(events, key=lambda e: -e['dur'])[:top]
+        if slowest:
+            lines.append(f"最慢的 {len(slowest)} 个步骤:")
+            for event in slowest:
+                lines.append(f"  {event['dur'] / 1e6:8.2f}秒  [{event['cat']}] {event['name']}")
+        wall, cpu = self.totals()
+        lines.append(f"总计: 墙钟 {wall:.2f}秒, CPU {cpu:.2f}秒")
+        return '\n'.join(lines)
+
+    def finish(self, output_dir, file_name=TRACE_FILE_NAME):
+        """写出trace文件并打印汇总表"""
+        path = os.path.join(str(output_dir), file_name)
+        self.write_chrome_trace(path)
+        print(f"\n[INFO] 构建计时汇总 ({self.name}):")
+        print(self.summary_table())
+        print(f"[INFO] Chrome trace: {path}")
+        return path
+
+
+if __name__ == "__main__":
+    # 用法: python build_trace.py [trace文件]  —— 打印已有trace的汇总表
+    trace_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join('obj', TRACE_FILE_NAME)
+    trace = BuildTrace(os.path.basename(trace_path))
+    if not trace.load_events(trace_path):
+        print(f"[ERROR] 无法读取trace文件: {trace_path}")
+        sys.exit(1)
+    print(trace.summary_table())
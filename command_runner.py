@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+子进程运行器（asyncio）
+逐行读取 stdout/stderr，实时输出并写入日志文件，内存中只保留最后若干行（环形缓冲区）；
+可以限制并发数同时运行多个命令
+
+超时按输出进度判断：idle_timeout 秒内没有任何输出才认为卡住并结束进程（连同子进程），
+因此几个小时的 conan install --build=missing 只要还在输出就不会被中断；
+timeout 是可选的总时长上限
+
+    from command_runner import run_command
+    result = run_command(['conan', 'install', '.', '--build=missing'],
+                         idle_timeout=1800, log_path='obj/logs/conan_install.log')
+    if not result.ok:
+        print(result.tail())
+"""
+
+import os
+import sys
+import time
+import signal
+import asyncio
+import locale
+import subprocess
+from collections import deque
+
+DEFAULT_TAIL_LINES = 200
+READ_CHUNK_SIZE = 64 * 1024
+# 单行长度上限，更长的输出分成多行
+MAX_LINE_LENGTH = 1024 * 1024
+# 检查超时的间隔
+WATCHDOG_INTERVAL = 1.0
+# 结束进程后等待输出读完的时间
+DRAIN_TIMEOUT = 5.0
+
+
+class CommandResult:
+    """命令执行结果
+
+    returncode:  进程返回码（因超时被结束时为 None）
+    timed_out:   None / 'idle'（长时间没有输出）/ 'timeout'（超过总时长）
+    lines:       最后若干行输出 [(流名称, 行), ...]
+    """
+
+    def __init__(self, cmd, returncode, timed_out, lines, line_count, elapsed, log_path=None):
+        self.cmd = cmd
+        self.returncode = returncode
+        self.timed_out = timed_out
+        self.lines = lines
+        self.line_count = line_count
+        self.elapsed = elapsed
+        self.log_path = log_path
+
+    @property
+    def ok(self):
+        return self.returncode == 0 and self.timed_out is None
+
+    def _text(self, stream):
+        return ''.join(line + '\n' for name, line in self.lines if name == stream)
+
+    @property
+    def stdout(self):
+        """最后若干行标准输出"""
+        return self._text('stdout')
+
+    @property
+    def stderr(self):
+        """最后若干行错误输出"""
+        return self._text('stderr')
+
+    def tail(self, count=20):
+        return '\n'.join(line for _, line in list(self.lines)[-count:])
+
+
+def _command_text(cmd):
+    return cmd if isinstance(cmd, str) else subprocess.list2cmdline([str(part) for part in cmd])
+
+
+def kill_process_tree(proc):
+    """结束进程及其子进程（shell=True 时真正的命令是shell的子进程）
+
+    proc: asyncio 或 subprocess.Popen 进程；非Windows上需要以 start_new_session=True 启动
+    """
+    if proc.returncode is not None:
+        return
+    try:
+        if os.name == 'nt':
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(proc.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        pass
+    try:
+        proc.kill()
+    except ProcessLookupError:
+        pass
+
+
+async def _read_stream(stream, name, state, encoding, echo, prefix, log_file, on_line):
+    def emit(data):
+        line = data.decode(encoding, errors='replace').rstrip('\r')
+        state['count'] += 1
+        state['lines'].append((name, line))
+        if echo:
+            target = sys.stderr if name == 'stderr' else sys.stdout
+            target.write(f"{prefix}{line}\n")
+            target.flush()
+        if log_file is not None:
+            log_file.write(line + '\n')
+            log_file.flush()
+        if on_line is not None:
+            on_line(name, line)
+
+    buffer = b''
+    while True:
+        data = await stream.read(READ_CHUNK_SIZE)
+        if not data:
+            break
+        state['last_output'] = time.monotonic()
+        buffer += data
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            emit(line)
+        # 没有换行的超长输出按 MAX_LINE_LENGTH 分段
+        while len(buffer) >= MAX_LINE_LENGTH:
+            emit(buffer[:MAX_LINE_LENGTH])
+            buffer = buffer[MAX_LINE_LENGTH:]
+    if buffer:
+        emit(buffer)
+
+
+async def run_command_async(cmd, cwd=None, env=None, shell=None, idle_timeout=None, timeout=None,
+                            log_path=None, tail_lines=DEFAULT_TAIL_LINES, echo=True, prefix='',
+                            encoding=None, on_line=None):
+    """运行一个命令，返回 CommandResult
+
+    cmd 为字符串时默认通过shell运行，为列表时直接运行；
+    encoding 默认使用系统编码（与 subprocess.run(text=True) 相同）；
+    on_line(流名称, 行) 在读到每一行时调用（例如交给 diagnostics 解析）
+    """
+    shell = isinstance(cmd, str) if shell is None else shell
+    encoding = encoding or locale.getpreferredencoding(False)
+    options = {'stdout': asyncio.subprocess.PIPE, 'stderr': asyncio.subprocess.PIPE,
+               'cwd': cwd, 'env': env}
+    if os.name != 'nt':
+        # 独立的进程组，超时时整组结束
+        options['start_new_session'] = True
+
+    log_file = None
+    if log_path:
+        os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+        log_file = open(log_path, 'w', encoding='utf-8')
+        log_file.write(f"# {_command_text(cmd)}\n")
+
+    start = time.monotonic()
+    state = {'last_output': start, 'count': 0, 'lines': deque(maxlen=tail_lines)}
+    timed_out = None
+    try:
+        if shell:
+            proc = await asyncio.create_subprocess_shell(_command_text(cmd), **options)
+        else:
+            proc = await asyncio.create_subprocess_exec(*[str(part) for part in cmd], **options)
+        readers = [asyncio.ensure_future(_read_stream(proc.stdout, 'stdout', state, encoding, echo, prefix, log_file, on_line)),
+                   asyncio.ensure_future(_read_stream(proc.stderr, 'stderr', state, encoding, echo, prefix, log_file, on_line))]
+        waiter = asyncio.ensure_future(proc.wait())
+        while True:
+            done, _ = await asyncio.wait([waiter], timeout=WATCHDOG_INTERVAL)
+            if done:
+                break
+            now = time.monotonic()
+            if idle_timeout and now - state['last_output'] > idle_timeout:
+                timed_out = 'idle'
+            elif timeout and now - start > timeout:
+                timed_out = 'timeout'
+            if timed_out:
+                kill_process_tree(proc)
+                await waiter
+                break
+        # 进程结束后读完剩余输出（孙进程仍占用管道时不无限等待）
+        done, pending = await asyncio.wait(readers, timeout=DRAIN_TIMEOUT)
+        for reader in pending:
+            reader.cancel()
+    finally:
+        if log_file is not None:
+            log_file.close()
+
+    elapsed = time.monotonic() - start
+    if timed_out:
+        reason = f"{idle_timeout}秒没有输出" if timed_out == 'idle' else f"超过{timeout}秒"
+        print(f"{prefix}[ERROR] 命令超时（{reason}），已结束: {_command_text(cmd)}")
+    returncode = None if timed_out else proc.returncode
+    return CommandResult(cmd, returncode, timed_out, list(state['lines']), state['count'], elapsed, log_path)
+
+
+async def run_commands_async(jobs, max_concurrent=None):
+    """并发运行多个命令，同时运行的数量不超过 max_concurrent（默认CPU核数）
+
+    jobs: [{'cmd': ..., 其他 run_command_async 参数}, ...]，返回与 jobs 顺序相同的结果列表
+    """
+    semaphore = asyncio.Semaphore(max_concurrent or os.cpu_count() or 1)
+
+    async def run_one(job):
+        async with semaphore:
+            return await run_command_async(**job)
+
+    return await asyncio.gather(*(run_one(dict(job)) for job in jobs))
+
+
+def run_command(cmd, **options):
+    """同步版本的 run_command_async"""
+    return asyncio.run(run_command_async(cmd, **options))
+
+
+def run_commands(jobs, max_concurrent=None):
+    """同步版本的 run_commands_async"""
+    return asyncio.run(run_commands_async(jobs, max_concurrent))
+
+
+if __name__ == "__main__":
+    # 用法: python command_runner.py [--idle 秒数] [--log 日志文件] <命令> [参数]...
+    args = sys.argv[1:]
+    options = {}
+    while args and args[0] in ('--idle', '--log'):
+        if args[0] == '--idle':
+            options['idle_timeout'] = float(args[1])
+        else:
+            options['log_path'] = args[1]
+        args = args[2:]
+    if not args:
+        print("用法: python command_runner.py [--idle 秒数] [--log 日志文件] <命令> [参数]...")
+        sys.exit(1)
+    result = run_command(args, **options)
+    print(f"[INFO] 返回码 {result.returncode}, {result.line_count} 行输出, 耗时 {result.elapsed:.2f}秒")
+    sys.exit(0 if result.ok else 1)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并行编译驱动
+把源文件列表和编译参数交给有界线程池并行编译（大小默认等于CPU核数），
+编译输出边读边解析成结构化诊断（diagnostics.py），同一条诊断只输出一次；
+遇到第一个错误后不再派发新任务，出现致命错误或头文件中的错误时还会结束正在运行的编译；
+每个文件都经过编译缓存（object_cache.py）
+
+编译缓存关闭时（OBJECT_CACHE=0），MSVC 改用 /MP 批量模式：每个输出目录一次 cl 调用，
+由 cl 自己并行编译，输出逐行转发
+"""
+
+import os
+import sys
+import time
+import subprocess
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from diagnostics import DiagnosticCollector, run_with_diagnostics
+from moc_batch import default_workers
+from object_cache import ObjectCache, is_msvc_compiler
+
+
+def compile_command(compiler, source, output, flags):
+    """单个源文件的编译命令"""
+    if is_msvc_compiler(compiler):
+        return [compiler, '/c', source, '/Fo' + output] + flags
+    return [compiler, '-c', source, '-o', output] + flags
+
+
+def _timed_compile(object_cache, cmd, parser, cancel):
+    start = time.perf_counter()
+    result = object_cache.compile(cmd, run=partial(run_with_diagnostics, parser=parser, cancel=cancel))
+    if result.cache_status == 'hit':
+        # 命中缓存时没有运行编译器，解析缓存的输出（警告）
+        for text in (result.stdout, result.stderr):
+            parser.feed(text)
+            parser.close()
+    return result, time.perf_counter() - start
+
+
+def _print_diagnostics(result):
+    # 没有解析出任何错误的失败（无法识别的输出）原样输出
+    for text in (result.stdout, result.stderr):
+        lines = [line for line in (text or '').splitlines() if line.strip()]
+        if lines:
+            print('\n'.join(lines))
+
+
+def run_compile_batch(compiler, jobs, flags, max_workers=None, object_cache=None):
+    """并行编译一批源文件
+
+    jobs: [(源文件, 目标文件), ...]
+    返回 0 表示全部成功，否则返回第一个失败任务的返回码
+    """
+    jobs = [(str(source), str(output)) for source, output in jobs]
+    flags = [str(flag) for flag in flags]
+    if not jobs:
+        return 0
+    object_cache = object_cache or ObjectCache()
+    if not object_cache.enabled and is_msvc_compiler(compiler):
+        return run_msvc_mp_batch(compiler, jobs, flags, max_workers)
+
+    workers = max(1, min(max_workers or default_workers(), len(jobs)))
+    print(f"[INFO] 并行编译: {len(jobs)} 个源文件, 并发数 {workers}")
+
+    batch_start = time.perf_counter()
+    pending_jobs = list(reversed(jobs))
+    running = {}
+    failed = None
+    counts = {'hit': 0, 'miss': 0, 'uncacheable': 0}
+    collector = DiagnosticCollector(abort_on_header_errors=True)
+
+    for _, output in jobs:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # 只保持 workers 个任务在途，失败后不再派发新任务
+        while pending_jobs or running:
+            while pending_jobs and failed is None and not collector.aborted and len(running) < workers:
+                source, output = pending_jobs.pop()
+                cmd = compile_command(compiler, source, output, flags)
+                parser = collector.parser(source)
+                future = executor.submit(_timed_compile, object_cache, cmd, parser, collector.abort_event)
+                running[future] = (source, output, parser)
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                source, output, parser = running.pop(future)
+                try:
+                    result, elapsed = future.result()
+                except Exception as e:
+                    result = subprocess.CompletedProcess([], 1, '', str(e))
+                    result.cache_status = 'uncacheable'
+                    elapsed = 0.0
+
+                if getattr(result, 'cancelled', False):
+                    print(f"[WARN] 已中止 ({elapsed:.2f}秒): {source}")
+                    if failed is None:
+                        failed = 1
+                    continue
+                if result.returncode != 0:
+                    if not any(diagnostic.is_error for diagnostic in parser.records):
+                        _print_diagnostics(result)
+                    print(f"[ERROR] 编译失败 ({elapsed:.2f}秒): {source}")
+                    if failed is None:
+                        failed = result.returncode
+                    continue
+
+                counts[result.cache_status] += 1
+                print(f"[OK] 编译 {result.cache_status:<11} {elapsed:6.2f}秒  "
+                      f"{os.path.basename(source)} -> {output}")
+
+    elapsed = time.perf_counter() - batch_start
+    if collector.diagnostics:
+        print(collector.summary())
+    if failed is not None:
+        print(f"[ERROR] 并行编译中止, 剩余 {len(pending_jobs)} 个源文件未编译")
+        return failed
+
+    print(f"[INFO] 并行编译完成: 编译 {counts['miss'] + counts['uncacheable']} 个, "
+          f"缓存命中 {counts['hit']} 个, 总耗时 {elapsed:.2f}秒")
+    return 0
+
+
+def run_msvc_mp_batch(compiler, jobs, flags, max_workers=None):
+    """MSVC /MP 批量模式：目标文件按所在目录分组，每组一次 cl 调用
+
+    目标文件名与源文件名不一致的任务单独调用 cl
+    """
+    workers = max_workers or default_workers()
+    groups = {}
+    singles = []
+    for source, output in jobs:
+        out_dir, name = os.path.split(output)
+        if os.path.splitext(name)[0] == os.path.splitext(os.path.basename(source))[0]:
+            groups.setdefault(out_dir, []).append(source)
+        else:
+            singles.append((source, output))
+
+    commands = []
+    for out_dir, sources in groups.items():
+        os.makedirs(out_dir or '.', exist_ok=True)
+        out_prefix = os.path.join(out_dir, '') if out_dir else '.\\'
+        commands.append([compiler, '/c', f'/MP{workers}', '/Fo' + out_prefix] + flags + sources)
+    for source, output in singles:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        commands.append(compile_command(compiler, source, output, flags))
+
+    print(f"[INFO] /MP批量编译: {len(jobs)} 个源文件, {len(commands)} 次cl调用, 并发数 {workers}")
+    batch_start = time.perf_counter()
+    collector = DiagnosticCollector(abort_on_header_errors=True)
+    sources_by_name = {os.path.basename(source).lower(): source for source, _ in jobs}
+    for cmd in commands:
+        # 逐行转发cl的输出，长时间编译时也能看到进度；诊断信息去重后输出，出现致命错误时结束cl
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                text=True, errors='replace')
+        parser = collector.parser()
+        for line in proc.stdout:
+            # cl 开始编译一个文件时回显文件名，之后的诊断属于这个编译单元
+            if line.strip().lower() in sources_by_name:
+                parser = collector.parser(sources_by_name[line.strip().lower()])
+            if parser.feed_line(line) is None and line.strip():
+                print(line.rstrip())
+            if collector.aborted and proc.poll() is None:
+                proc.kill()
+        returncode = proc.wait()
+        if returncode != 0:
+            if collector.diagnostics:
+                print(collector.summary())
+            print(f"[ERROR] /MP批量编译失败, 返回码 {returncode}")
+            return returncode
+    if collector.diagnostics:
+        print(collector.summary())
+    print(f"[INFO] /MP批量编译完成, 总耗时 {time.perf_counter() - batch_start:.2f}秒")
+    return 0
+
+
+if __name__ == "__main__":
+    # 用法: python compile_driver.py <编译器> <输出目录> <源文件>... -- [编译参数]...
+    args = sys.argv[1:]
+    if '--' in args:
+        split = args.index('--')
+        args, flags = args[:split], args[split + 1:]
+    else:
+        flags = []
+    if len(args) < 3:
+        print("用法: python compile_driver.py <编译器> <输出目录> <源文件>... -- [编译参数]...")
+        sys.exit(1)
+    compiler, out_dir, sources = args[0], args[1], args[2:]
+    suffix = '.obj' if is_msvc_compiler(compiler) else '.o'
+    jobs = [(source, os.path.join(out_dir, os.path.splitext(os.path.basename(source))[0] + suffix))
+            for source in sources]
+    sys.exit(run_compile_batch(compiler, jobs, flags))
@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Conan完成检测
+等待conan进程句柄退出，或在文件系统变化通知（Linux inotify / Windows 目录变更通知，
+不支持时退回到轮询）到达时查询Conan包索引（p/cache.sqlite3），
+不再定时轮询 tasklist 和遍历整个Conan缓存
+"""
+
+import os
+import sys
+import time
+import select
+import sqlite3
+import threading
+import subprocess
+
+# ---------------- 文件变化通知 ----------------
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM
+                | IN_MOVED_TO | IN_CREATE | IN_DELETE)
+
+FILE_NOTIFY_CHANGE_FILE_NAME = 0x001
+FILE_NOTIFY_CHANGE_DIR_NAME = 0x002
+FILE_NOTIFY_CHANGE_SIZE = 0x008
+FILE_NOTIFY_CHANGE_LAST_WRITE = 0x010
+WAIT_OBJECT_0 = 0
+WAIT_TIMEOUT = 0x102
+INFINITE = 0xFFFFFFFF
+SYNCHRONIZE = 0x00100000
+# 等待进程退出时检查停止事件的间隔（秒）
+STOP_POLL_INTERVAL = 0.5
+
+
+class PollingWatcher:
+    """轮询实现：比较目录中文件的 (修改时间, 大小) 快照"""
+
+    def __init__(self, paths, recursive=False, poll_interval=1.0):
+        self.paths = [os.path.abspath(str(p)) for p in paths]
+        self.recursive = recursive
+        self.poll_interval = poll_interval
+        self.snapshot = self._snapshot()
+
+    def _snapshot(self):
+        snapshot = {}
+        stack = list(self.paths)
+        while stack:
+            path = stack.pop()
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (st.st_mtime_ns, st.st_size)
+            if not os.path.isdir(path):
+                continue
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if self.recursive:
+                                stack.append(entry.path)
+                        else:
+                            st = entry.stat(follow_symlinks=False)
+                            snapshot[entry.path] = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                continue
+        return snapshot
+
+    def wait(self, timeout=None):
+        """等待变化，返回变化的路径列表（超时返回空列表）"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return []
+            time.sleep(self.poll_interval if remaining is None else min(self.poll_interval, remaining))
+            snapshot = self._snapshot()
+            changed = [p for p in set(snapshot) | set(self.snapshot)
+                       if snapshot.get(p) != self.snapshot.get(p)]
+            self.snapshot = snapshot
+            if changed:
+                return sorted(changed)
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Linux inotify实现（通过ctypes调用libc）"""
+
+    def __init__(self, paths, recursive=False):
+        import ctypes
+        import ctypes.util
+        self.ctypes = ctypes
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self.recursive = recursive
+        self.watches = {}
+        for path in paths:
+            self._add_tree(os.path.abspath(str(path)))
+
+    def _add_watch(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), INOTIFY_MASK)
+        if wd >= 0:
+            self.watches[wd] = path
+
+    def _add_tree(self, path):
+        self._add_watch(path)
+        if self.recursive and os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                for name in dirs:
+                    self._add_watch(os.path.join(root, name))
+
+    def wait(self, timeout=None):
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset + 16 <= len(data):
+                wd, mask, cookie, length = (int.from_bytes(data[offset + i:offset + i + 4], sys.byteorder)
+                                            for i in (0, 4, 8, 12))
+                name = data[offset + 16:offset + 16 + length].rstrip(b'\0')
+                offset += 16 + length
+                base = self.watches.get(wd)
+                if base is None:
+                    continue
+                path = os.path.join(base, os.fsdecode(name)) if name else base
+                changed.add(path)
+                if self.recursive and mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path)
+        return sorted(changed)
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class WindowsChangeWatcher:
+    """Windows目录变更通知实现（FindFirstChangeNotificationW）
+
+    通知不带文件名，返回发生变化的被监视目录
+    """
+
+    def __init__(self, paths, recursive=False):
+        import ctypes
+        self.kernel32 = ctypes.windll.kernel32
+        self.kernel32.FindFirstChangeNotificationW.restype = ctypes.c_void_p
+        self.handles = []
+        self.paths = []
+        flags = (FILE_NOTIFY_CHANGE_FILE_NAME | FILE_NOTIFY_CHANGE_DIR_NAME
+                 | FILE_NOTIFY_CHANGE_SIZE | FILE_NOTIFY_CHANGE_LAST_WRITE)
+        for path in paths:
+            path = os.path.abspath(str(path))
+            handle = self.kernel32.FindFirstChangeNotificationW(path, bool(recursive), flags)
+            if handle in (None, ctypes.c_void_p(-1).value):
+                raise OSError(f"无法监视目录: {path}")
+            self.handles.append(handle)
+            self.paths.append(path)
+        self.handle_array = (ctypes.c_void_p * len(self.handles))(*self.handles)
+
+    def wait(self, timeout=None):
+        if not self.handles:
+            time.sleep(1.0 if timeout is None else timeout)
+            return []
+        millis = INFINITE if timeout is None else int(timeout * 1000)
+        result = self.kernel32.WaitForMultipleObjects(len(self.handles), self.handle_array, False, millis)
+        if result == WAIT_TIMEOUT or not (WAIT_OBJECT_0 <= result < WAIT_OBJECT_0 + len(self.handles)):
+            return []
+        index = result - WAIT_OBJECT_0
+        self.kernel32.FindNextChangeNotification(self.handles[index])
+        return [self.paths[index]]
+
+    def close(self):
+        for handle in self.handles:
+            self.kernel32.FindCloseChangeNotification(handle)
+        self.handles = []
+
+
+def create_watcher(paths, recursive=False, poll_interval=1.0):
+    """创建当前平台可用的文件变化监视器，不支持时退回到轮询"""
+    paths = [p for p in paths if os.path.exists(str(p))]
+    try:
+        if sys.platform.startswith('linux'):
+            return InotifyWatcher(paths, recursive)
+        if sys.platform == 'win32':
+            return WindowsChangeWatcher(paths, recursive)
+    except (OSError, AttributeError) as e:
+        print(f"[WARN] 文件变化通知不可用，改用轮询: {e}")
+    return PollingWatcher(paths, recursive, poll_interval)
+
+
+# ---------------- 进程等待 ----------------
+
+def find_process_ids(image_name='conan.exe'):
+    """查找正在运行的进程ID（只执行一次查询）"""
+    if sys.platform == 'win32':
+        result = subprocess.run(["tasklist", "/FO", "CSV", "/NH", "/FI", f"IMAGENAME eq {image_name}"],
+                                capture_output=True, text=True)
+        pids = []
+        for line in result.stdout.splitlines():
+            fields = [field.strip('"') for field in line.split('","')]
+            if len(fields) > 1 and fields[0].lower() == image_name.lower() and fields[1].isdigit():
+                pids.append(int(fields[1]))
+        return pids
+
+    # Linux: 按命令行匹配（conan 通常是 python 脚本）
+    stem = os.path.splitext(image_name)[0]
+    pids = []
+    for entry in os.listdir('/proc') if os.path.isdir('/proc') else []:
+        if not entry.isdigit() or int(entry) == os.getpid():
+            continue
+        try:
+            with open(f'/proc/{entry}/cmdline', 'rb') as f:
+                argv = f.read().split(b'\0')
+        except OSError:
+            continue
+        if any(os.path.basename(arg.decode(errors='replace')) == stem for arg in argv[:2]):
+            pids.append(int(entry))
+    return pids
+
+
+def wait_for_processes(pids, timeout=None, stop_event=None):
+    """阻塞等待所有进程退出；返回 True 表示都已退出，False 表示超时或 stop_event 被置位
+
+    stop_event 在两次等待之间检查（间隔 STOP_POLL_INTERVAL），调用方停止等待时线程随即结束
+    """
+    pids = list(pids)
+    if not pids:
+        return True
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    def next_wait():
+        """下一次等待的秒数（None 表示无限等待），已超时或已停止时返回 False"""
+        if stop_event is not None and stop_event.is_set():
+            return False
+        remaining = None if deadline is None else deadline - time.monotonic()
+        if remaining is not None and remaining <= 0:
+            return False
+        if stop_event is not None:
+            return STOP_POLL_INTERVAL if remaining is None else min(remaining, STOP_POLL_INTERVAL)
+        return remaining
+
+    if sys.platform == 'win32':
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        kernel32.OpenProcess.restype = ctypes.c_void_p
+        handles = [h for h in (kernel32.OpenProcess(SYNCHRONIZE, False, pid) for pid in pids) if h]
+        if not handles:
+            return True
+        try:
+            array = (ctypes.c_void_p * len(handles))(*handles)
+            while True:
+                wait = next_wait()
+                if wait is False:
+                    return False
+                millis = INFINITE if wait is None else int(wait * 1000)
+                if kernel32.WaitForMultipleObjects(len(handles), array, True, millis) != WAIT_TIMEOUT:
+                    return True
+        finally:
+            for handle in handles:
+                kernel32.CloseHandle(handle)
+
+    if hasattr(os, 'pidfd_open'):
+        fds = []
+        for pid in pids:
+            try:
+                fds.append(os.pidfd_open(pid))
+            except ProcessLookupError:
+                continue
+        try:
+            while fds:
+                wait = next_wait()
+                if wait is False:
+                    return False
+                readable, _, _ = select.select(fds, [], [], wait)
+                for fd in readable:
+                    fds.remove(fd)
+                    os.close(fd)
+            return True
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+    # 其他平台：退回到轮询进程是否存在
+    while True:
+        alive = []
+        for pid in pids:
+            try:
+                os.kill(pid, 0)
+                alive.append(pid)
+            except OSError:
+                continue
+        if not alive:
+            return True
+        wait = next_wait()
+        if wait is False:
+            return False
+        pids = alive
+        if stop_event is not None:
+            stop_event.wait(min(1, wait))
+        else:
+            time.sleep(1 if wait is None else min(1, wait))
+
+
+# ---------------- Conan包索引 ----------------
+
+class ConanPackageIndex:
+    """查询Conan 2缓存数据库（p/cache.sqlite3），找到带WebEngine的Qt包"""
+
+    def __init__(self, conan_home):
+        self.conan_home = os.path.abspath(str(conan_home))
+        self.packages_dir = os.path.join(self.conan_home, 'p')
+        self.db_path = os.path.join(self.packages_dir, 'cache.sqlite3')
+
+    def _package_folders(self, name):
+        """返回指定包名的所有包目录"""
+        if os.path.exists(self.db_path):
+            try:
+                conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, timeout=5)
+                try:
+                    rows = conn.execute("SELECT path FROM packages WHERE reference LIKE ?",
+                                        (f"{name}/%",)).fetchall()
+                finally:
+                    conn.close()
+                return [row[0] if os.path.isabs(row[0]) else os.path.join(self.packages_dir, row[0])
+                        for row in rows if row[0]]
+            except sqlite3.Error as e:
+                print(f"[WARN] 读取Conan包索引失败: {e}")
+
+        # 没有数据库时只列出包目录的第一层，不遍历整个缓存
+        folders = []
+        for parent in (self.packages_dir, os.path.join(self.packages_dir, 'b')):
+            if not os.path.isdir(parent):
+                continue
+            for entry in os.scandir(parent):
+                if entry.is_dir() and entry.name.lower().startswith(name):
+                    folders.append(entry.path)
+        return folders
+
+    def find_webengine_package(self):
+        """返回启用了 qtwebengine 选项的Qt包目录，没有则返回 None"""
+        for folder in self._package_folders('qt'):
+            for candidate in (folder, os.path.join(folder, 'p')):
+                info_path = os.path.join(candidate, 'conaninfo.txt')
+                try:
+                    with open(info_path, 'r', encoding='utf-8', errors='replace') as f:
+                        content = f.read()
+                except OSError:
+                    continue
+                if 'qtwebengine=True' in content:
+                    return candidate
+        return None
+
+
+# ---------------- 完成检测 ----------------
+
+class ConanCompletionDetector:
+    """等待Conan完成：conan进程退出，或包索引中出现带WebEngine的Qt包
+
+    process: 由调用方启动的 conan subprocess.Popen 对象；为空时查找已在运行的conan进程
+    """
+
+    def __init__(self, conan_home, process=None, image_name='conan.exe'):
+        self.index = ConanPackageIndex(conan_home)
+        self.process = process
+        self.image_name = image_name
+        self.package_folder = None
+
+    def _wait_process(self, done, result):
+        # done 被置位（完成、超时或停止）时线程随即退出，不会留下阻塞的线程
+        if self.process is not None:
+            while True:
+                try:
+                    self.process.wait(STOP_POLL_INTERVAL)
+                    break
+                except subprocess.TimeoutExpired:
+                    if done.is_set():
+                        return
+        elif not wait_for_processes(find_process_ids(self.image_name), stop_event=done):
+            return
+        result.setdefault('reason', 'process_exited')
+        done.set()
+
+    def _watch_index(self, done, result):
+        watcher = create_watcher([self.index.packages_dir])
+        try:
+            while not done.is_set():
+                # 有变化通知时才查询包索引；每秒醒来一次检查是否已结束
+                if watcher.wait(1.0):
+                    self.package_folder = self.index.find_webengine_package()
+                    if self.package_folder:
+                        result.setdefault('reason', 'package_found')
+                        done.set()
+        finally:
+            watcher.close()
+
+    def wait(self, timeout=None, stop_event=None):
+        """等待完成，返回原因: 'process_exited' / 'package_found'；超时或被停止返回 None"""
+        self.package_folder = self.index.find_webengine_package()
+        if self.package_folder:
+            return 'package_found'
+
+        done = threading.Event()
+        result = {}
+        for target in (self._wait_process, self._watch_index):
+            threading.Thread(target=target, args=(done, result), daemon=True).start()
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            while not done.is_set():
+                if stop_event is not None and stop_event.is_set():
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                done.wait(0.2 if remaining is None else min(0.2, remaining))
+        finally:
+            # 让监视线程退出
+            done.set()
+        return result.get('reason')
+
+
+if __name__ == "__main__":
+    # 用法: python conan_watch.py [Conan缓存目录]
+    home = sys.argv[1] if len(sys.argv) > 1 else os.environ.get("CONAN_HOME", os.path.expanduser("~/.conan2"))
+    detector = ConanCompletionDetector(home)
+    start = time.monotonic()
+    reason = detector.wait()
+    print(f"[INFO] Conan完成 ({reason}), 等待 {time.monotonic() - start:.1f}秒")
+    if detector.package_folder:
+        print(f"[INFO] WebEngine包: {detector.package_folder}")
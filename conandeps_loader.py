@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SConscript_conandeps 读取工具
+Conan 的 SConsDeps 生成器输出的是 `conandeps = {...}` 字典字面量加一行 `Return('conandeps')`，
+这里用 ast 只解析字典字面量（不执行文件，不需要导入 SCons），
+解析结果按文件内容哈希缓存到 ~/.cache/qt_build_conandeps，同一进程内只解析一次
+
+    from conandeps_loader import load_conandeps
+    deps = load_conandeps()
+    moc_exe = deps.find_binary('moc')
+    libs = deps.aggregate.libs
+"""
+
+import os
+import ast
+import sys
+import json
+
+from moc_cache import file_sha256
+
+CONANDEPS_FILE = 'SConscript_conandeps'
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'qt_build_conandeps')
+# 所有依赖合并后的配置
+AGGREGATE_NAME = 'conandeps'
+# 每个包的配置项，对应 SCons 环境变量
+SCONS_KEYS = ('CPPPATH', 'LIBPATH', 'BINPATH', 'LIBS', 'FRAMEWORKS', 'FRAMEWORKPATH',
+              'CPPDEFINES', 'CXXFLAGS', 'CCFLAGS', 'SHLINKFLAGS', 'LINKFLAGS')
+
+# 进程内缓存 {文件内容哈希: 解析结果}
+_parsed = {}
+
+
+def parse_conandeps(text, file_name=CONANDEPS_FILE):
+    """解析 `conandeps = {...}` 赋值语句，返回字典（只接受字面量）"""
+    tree = ast.parse(text, filename=file_name)
+    for node in tree.body:
+        if (isinstance(node, ast.Assign) and len(node.targets) == 1
+                and isinstance(node.targets[0], ast.Name) and node.targets[0].id == 'conandeps'):
+            value = ast.literal_eval(node.value)
+            if not isinstance(value, dict):
+                raise ValueError(f"{file_name}: conandeps 不是字典")
+            return value
+    raise ValueError(f"{file_name}: 没有找到 conandeps = {{...}} 字典")
+
+
+class ConanPackage:
+    """一个Conan包（或合并后的 conandeps）的编译/链接配置"""
+
+    def __init__(self, name, info, version=None):
+        self.name = name
+        self.version = version
+        self.info = {key: list(info.get(key, [])) for key in SCONS_KEYS}
+
+    @property
+    def cpppath(self):
+        return self.info['CPPPATH']
+
+    @property
+    def libpath(self):
+        return self.info['LIBPATH']
+
+    @property
+    def binpath(self):
+        return self.info['BINPATH']
+
+    @property
+    def libs(self):
+        return self.info['LIBS']
+
+    @property
+    def cppdefines(self):
+        return self.info['CPPDEFINES']
+
+    @property
+    def cxxflags(self):
+        return self.info['CXXFLAGS']
+
+    @property
+    def ccflags(self):
+        return self.info['CCFLAGS']
+
+    @property
+    def linkflags(self):
+        return self.info['LINKFLAGS']
+
+    def find_binary(self, name):
+        """在 BINPATH 中查找可执行文件（Windows 下自动加 .exe）"""
+        for directory in self.binpath:
+            for candidate in (name + '.exe', name):
+                path = os.path.join(directory, candidate)
+                if os.path.isfile(path):
+                    return path
+        return None
+
+    def apply_to_scons(self, env):
+        """把非空的配置项追加到 SCons 环境"""
+        env.Append(**{key: value for key, value in self.info.items() if value})
+
+
+class ConanDeps:
+    """SConscript_conandeps 的内容：合并配置 + 每个包的配置和版本"""
+
+    def __init__(self, path, data):
+        self.path = path
+        self.aggregate = ConanPackage(AGGREGATE_NAME, data.get(AGGREGATE_NAME, {}))
+        self.packages = {}
+        for name, info in data.items():
+            if name != AGGREGATE_NAME and isinstance(info, dict):
+                self.packages[name] = ConanPackage(name, info, data.get(f"{name}_version"))
+
+    def package(self, name):
+        """指定包的配置，包不存在时返回 None"""
+        return self.packages.get(name)
+
+    def version(self, name):
+        package = self.packages.get(name)
+        return package.version if package else None
+
+    def find_binary(self, name):
+        """在所有包的 BINPATH 中查找可执行文件（例如 moc）"""
+        for package in [self.aggregate] + list(self.packages.values()):
+            path = package.find_binary(name)
+            if path:
+                return path
+        return None
+
+
+def _load_cached(cache_path):
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') == CACHE_VERSION:
+            return data['conandeps']
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+
+def _save_cached(cache_path, conandeps):
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'conandeps': conandeps}, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"[WARN] 无法保存conandeps缓存: {e}")
+
+
+def load_conandeps(path=CONANDEPS_FILE, cache_dir=None):
+    """读取 SConscript_conandeps，返回 ConanDeps
+
+    文件不存在时抛出 OSError，格式不对时抛出 ValueError / SyntaxError
+    """
+    path = os.path.abspath(str(path))
+    digest = file_sha256(path)
+    data = _parsed.get(digest)
+    if data is None:
+        cache_dir = cache_dir or os.environ.get('CONANDEPS_CACHE_DIR') or DEFAULT_CACHE_DIR
+        cache_path = os.path.join(cache_dir, digest + '.json')
+        data = _load_cached(cache_path)
+        if data is None:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = parse_conandeps(f.read(), os.path.basename(path))
+            _save_cached(cache_path, data)
+        _parsed[digest] = data
+    return ConanDeps(path, data)
+
+
+if __name__ == "__main__":
+    # 用法: python conandeps_loader.py [SConscript_conandeps]  —— 打印每个包的版本和路径
+    deps = load_conandeps(sys.argv[1] if len(sys.argv) > 1 else CONANDEPS_FILE)
+    print(f"[INFO] {deps.path}: {len(deps.packages)} 个包, {len(deps.aggregate.libs)} 个库")
+    for name, package in deps.packages.items():
+        print(f"  {name:<20} {package.version or '?':<10} {', '.join(package.binpath) or '-'}")
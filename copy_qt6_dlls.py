@@ -6,9 +6,10 @@
 """
 
 import os
-import shutil
 import glob
 
+from qt_deploy import QtDeployer
+
 def copy_qt6_dlls():
     """复制Qt6核心DLL文件到bin目录"""
     # Qt6 DLL源目录
@@ -32,42 +33,22 @@ def copy_qt6_dlls():
     ]
     
     print("🔧 开始复制Qt6 DLL文件到bin目录...")
-    copied_count = 0
+    deployer = QtDeployer(bin_dir, name='qt6_dlls')
     
     for dll_name in qt6_dlls:
         source_path = os.path.join(qt6_bin_dir, dll_name)
-        target_path = os.path.join(bin_dir, dll_name)
-        
-        if os.path.exists(source_path):
-            try:
-                shutil.copy2(source_path, target_path)
-                print(f"✅ 复制成功: {dll_name}")
-                copied_count += 1
-            except Exception as e:
-                print(f"❌ 复制失败 {dll_name}: {e}")
-        else:
+        if not deployer.add_file(source_path):
             print(f"⚠️  源文件不存在: {source_path}")
     
     # 复制所有Qt6相关的DLL文件（包含Qt6前缀的）
     print("\n📦 复制所有Qt6相关DLL文件...")
-    qt6_pattern = os.path.join(qt6_bin_dir, 'Qt6*.dll')
-    qt6_dll_files = glob.glob(qt6_pattern)
+    deployer.add_glob(qt6_bin_dir, 'Qt6*.dll')
     
-    for dll_path in qt6_dll_files:
-        dll_name = os.path.basename(dll_path)
-        target_path = os.path.join(bin_dir, dll_name)
-        
-        try:
-            if not os.path.exists(target_path):
-                shutil.copy2(dll_path, target_path)
-                print(f"✅ 复制: {dll_name}")
-                copied_count += 1
-            else:
-                print(f"ℹ️  已存在: {dll_name}")
-        except Exception as e:
-            print(f"❌ 复制失败 {dll_name}: {e}")
+    # 只复制有变化的文件（按大小、修改时间和内容哈希判断）
+    stats = deployer.deploy()
+    copied_count = stats['copied'] + stats['linked'] + stats['reflinked']
     
-    print(f"\n🎉 完成！共复制了 {copied_count} 个Qt6 DLL文件")
+    print(f"\n🎉 完成！共更新了 {copied_count} 个Qt6 DLL文件，{stats['unchanged']} 个已是最新")
     
     # 列出bin目录中的DLL文件
     print("\n📁 bin目录中的DLL文件:")
@@ -76,7 +57,7 @@ def copy_qt6_dlls():
         dll_name = os.path.basename(dll_path)
         print(f"  - {dll_name}")
     
-    return True
+    return stats['failed'] == 0
 
 if __name__ == "__main__":
     copy_qt6_dlls()
\ No newline at end of file
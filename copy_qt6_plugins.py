@@ -6,8 +6,8 @@
 """
 
 import os
-import shutil
-import glob
+
+from qt_deploy import QtDeployer
 
 def copy_qt6_plugins():
     """复制Qt6插件目录到bin目录"""
@@ -32,12 +32,16 @@ def copy_qt6_plugins():
     target_plugins_dir = os.path.join(bin_dir, 'plugins')
     
     try:
-        if os.path.exists(target_plugins_dir):
-            shutil.rmtree(target_plugins_dir)
-            print(f"🗑️  删除旧插件目录: {target_plugins_dir}")
-        
-        shutil.copytree(qt6_plugins_dir, target_plugins_dir)
-        print(f"✅ 复制插件目录成功: {target_plugins_dir}")
+        # 增量部署：只复制有变化的插件，删除源目录中已不存在的插件
+        deployer = QtDeployer(bin_dir, name='qt6_plugins')
+        deployer.add_tree(qt6_plugins_dir, 'plugins')
+        stats = deployer.deploy(verbose=False)
+        if stats['failed']:
+            print(f"❌ {stats['failed']} 个插件复制失败")
+            return False
+        print(f"✅ 同步插件目录成功: {target_plugins_dir} "
+              f"(更新 {stats['copied'] + stats['linked'] + stats['reflinked']}, "
+              f"未变化 {stats['unchanged']}, 删除 {stats['removed']})")
         
         # 列出复制的插件目录
         print("\n📦 复制的插件目录:")
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+编译诊断信息解析
+逐行解析 MSVC（cl/link）、GCC/Clang 和 moc 的输出，得到结构化记录（文件、行号、代码、严重程度），
+编译进行中就能拿到结果：
+
+- 同一条诊断（同一文件、行号、代码和内容）只输出一次，头文件中的错误不会在每个编译单元重复出现，
+  汇总中给出它出现在多少个编译单元
+- 出现致命错误（fatal error，如 C1083 找不到头文件）时置位 abort_event，
+  并行编译不再派发新任务并结束正在运行的编译；
+  abort_on_header_errors=True 时头文件中的错误也会中止（包含它的编译单元都会失败）
+
+    collector = DiagnosticCollector(abort_on_header_errors=True)
+    parser = collector.parser('src/main.cpp')
+    result = run_with_diagnostics(cmd, parser, cancel=collector.abort_event)
+    print(collector.summary())
+"""
+
+import os
+import re
+import sys
+import threading
+import subprocess
+
+from command_runner import kill_process_tree
+
+# main.cpp(12,5): error C2065: 'x': undeclared identifier
+# main.cpp(12): note: see declaration of 'x'
+# moc（Qt5）: mainwindow.h(20): Error: Class declaration lacks Q_OBJECT macro.
+MSVC_PATTERN = re.compile(
+    r'^\s*(?P<file>(?:(?!: ).)+?)\((?P<line>\d+)(?:,(?P<column>\d+))?\)\s*:\s*'
+    r'(?P<severity>(?i:fatal error|error|warning|note))\s*(?P<code>[A-Z]+\d+)?\s*:\s*(?P<message>.*)$')
+# main.obj : error LNK2019: unresolved external symbol ...
+# LINK : fatal error LNK1104: cannot open file 'Qt6Core.lib'
+# cl : Command line warning D9002 : ignoring unknown option '-O2'
+TOOL_PATTERN = re.compile(
+    r'^\s*(?P<file>[^:(]+?)\s*:\s*(?:Command line\s+)?'
+    r'(?P<severity>fatal error|error|warning)\s+(?P<code>[A-Z]+\d+)\s*:\s*(?P<message>.*)$')
+# src/main.cpp:12:5: error: 'x' was not declared in this scope
+# C:\src\main.cpp:12:5: warning: unused variable 'y' [-Wunused-variable]
+# moc（Qt6）: mainwindow.h:20:1: error: Class declaration lacks Q_OBJECT macro.
+GCC_PATTERN = re.compile(
+    r'^\s*(?P<file>(?:[A-Za-z]:)?[^:]+):(?P<line>\d+):(?:(?P<column>\d+):)?\s*'
+    r'(?P<severity>(?i:fatal error|error|warning|note)):\s*(?P<message>.*?)'
+    r'(?:\s+\[(?P<code>-W[^\]]+)\])?\s*$')
+# g++: error: missing.cpp: No such file or directory
+# cc1plus: fatal error: main.cpp: No such file or directory
+DRIVER_PATTERN = re.compile(r'^(?P<file>[\w.+-]+): (?P<severity>fatal error|error|warning): (?P<message>.*)$')
+# /usr/bin/ld: obj/main.o: in function `main': main.cpp:(.text+0x9): undefined reference to `foo()'
+LD_PATTERN = re.compile(r'^(?P<file>.*?):.*?undefined reference to (?P<message>.*)$')
+
+# 本项目脚本输出的前缀（解析 compile_driver 等的输出或构建日志时去掉）
+PRINT_PREFIX_PATTERN = re.compile(r'^\[(?:ERROR|WARN|INFO)\] ')
+
+SEVERITY_NAMES = {'fatal error': 'fatal', 'error': 'error', 'warning': 'warning', 'note': 'note'}
+PRINT_PREFIXES = {'fatal': '[ERROR]', 'error': '[ERROR]', 'warning': '[WARN]', 'note': '[INFO]'}
+SOURCE_SUFFIXES = ('.cpp', '.cc', '.cxx', '.c')
+# 被取消（致命错误后结束）的编译的返回码
+CANCELLED_RETURNCODE = -1
+
+
+class Diagnostic:
+    """一条诊断信息
+
+    severity: 'fatal' / 'error' / 'warning' / 'note'
+    tool:     'msvc' / 'link' / 'gcc' / 'ld'
+    """
+
+    def __init__(self, file, line, column, severity, code, message, tool):
+        self.file = file
+        self.line = line
+        self.column = column
+        self.severity = severity
+        self.code = code
+        self.message = message
+        self.tool = tool
+
+    @property
+    def key(self):
+        """去重用的键（不含编译单元）"""
+        path = os.path.normcase(os.path.normpath(self.file)) if self.file else ''
+        return (path, self.line, self.severity, self.code, self.message)
+
+    @property
+    def is_error(self):
+        return self.severity in ('fatal', 'error')
+
+    @property
+    def in_header(self):
+        return bool(self.file) and self.line is not None and \
+            not self.file.lower().endswith(SOURCE_SUFFIXES)
+
+    def to_dict(self):
+        return {'file': self.file, 'line': self.line, 'column': self.column, 'severity': self.severity,
+                'code': self.code, 'message': self.message, 'tool': self.tool}
+
+    def __str__(self):
+        location = self.file or ''
+        if self.line is not None:
+            location += f"({self.line}{',' + str(self.column) if self.column else ''})"
+        severity = 'fatal error' if self.severity == 'fatal' else self.severity
+        code = f" {self.code}" if self.code else ''
+        return f"{location}: {severity}{code}: {self.message}"
+
+
+def _number(text):
+    return int(text) if text else None
+
+
+def parse_line(line):
+    """解析一行输出，不是诊断信息时返回 None"""
+    line = PRINT_PREFIX_PATTERN.sub('', line.rstrip('\r\n'))
+    if not line.strip():
+        return None
+    for pattern, tool in ((MSVC_PATTERN, 'msvc'), (GCC_PATTERN, 'gcc')):
+        match = pattern.match(line)
+        if match:
+            return Diagnostic(match.group('file').strip(), _number(match.group('line')),
+                              _number(match.group('column')), SEVERITY_NAMES[match.group('severity').lower()],
+                              match.group('code'), match.group('message').strip(), tool)
+    match = TOOL_PATTERN.match(line)
+    if match:
+        code = match.group('code')
+        return Diagnostic(match.group('file'), None, None, SEVERITY_NAMES[match.group('severity')],
+                          code, match.group('message').strip(), 'link' if code.startswith('LNK') else 'msvc')
+    match = DRIVER_PATTERN.match(line)
+    if match:
+        return Diagnostic(match.group('file'), None, None, SEVERITY_NAMES[match.group('severity')],
+                          None, match.group('message').strip(), 'gcc')
+    match = LD_PATTERN.match(line)
+    if match:
+        return Diagnostic(match.group('file').strip(), None, None, 'error', None,
+                          'undefined reference to ' + match.group('message').strip(), 'ld')
+    return None
+
+
+class DiagnosticParser:
+    """逐块/逐行解析一个任务的输出（不完整的最后一行留到下一次）"""
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.records = []
+        self._partial = ''
+
+    def feed_line(self, line):
+        diagnostic = parse_line(line)
+        if diagnostic is not None:
+            self.records.append(diagnostic)
+            if self.callback is not None:
+                self.callback(diagnostic)
+        return diagnostic
+
+    def feed(self, text):
+        if not text:
+            return
+        *lines, self._partial = (self._partial + text).split('\n')
+        for line in lines:
+            self.feed_line(line)
+
+    def close(self):
+        if self._partial:
+            self.feed_line(self._partial)
+            self._partial = ''
+
+
+class DiagnosticCollector:
+    """汇总多个任务（编译单元）的诊断信息：去重、输出、判断是否需要中止"""
+
+    def __init__(self, abort_on_fatal=True, abort_on_header_errors=False, echo=True):
+        self.abort_on_fatal = abort_on_fatal
+        self.abort_on_header_errors = abort_on_header_errors
+        self.echo = echo
+        self.abort_event = threading.Event()
+        self.abort_reason = None
+        # 键 -> 第一次出现的诊断；键 -> 出现过的任务
+        self.diagnostics = {}
+        self.sources = {}
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def parser(self, source=None):
+        """为一个任务创建解析器，解析到的诊断都汇总到这里"""
+        return DiagnosticParser(lambda diagnostic: self.add(diagnostic, source))
+
+    def add(self, diagnostic, source=None):
+        """记录一条诊断，第一次出现时返回 True"""
+        key = diagnostic.key
+        with self._lock:
+            self.total += 1
+            new = key not in self.diagnostics
+            if new:
+                self.diagnostics[key] = diagnostic
+            self.sources.setdefault(key, set()).add(source)
+            abort = None
+            if not self.abort_event.is_set():
+                if self.abort_on_fatal and diagnostic.severity == 'fatal':
+                    abort = '致命错误'
+                elif self.abort_on_header_errors and diagnostic.is_error and diagnostic.in_header:
+                    abort = '头文件错误'
+            if abort:
+                self.abort_reason = f"{abort} {diagnostic}"
+                self.abort_event.set()
+        if new and self.echo:
+            print(f"{PRINT_PREFIXES[diagnostic.severity]} {diagnostic}")
+        if abort and self.echo:
+            print(f"[ERROR] 发现{abort}，中止剩余任务")
+        return new
+
+    def feed_result(self, result, source=None):
+        """解析 subprocess.CompletedProcess 的全部输出，返回解析到的诊断列表"""
+        parser = self.parser(source)
+        for text in (result.stdout, result.stderr):
+            parser.feed(text)
+            parser.close()
+        return parser.records
+
+    @property
+    def aborted(self):
+        return self.abort_event.is_set()
+
+    def unique(self, *severities):
+        return [d for d in self.diagnostics.values() if not severities or d.severity in severities]
+
+    def summary(self):
+        """汇总：去重后的错误/警告数量，以及出现在多个任务中的诊断"""
+        errors = self.unique('fatal', 'error')
+        warnings = self.unique('warning')
+        lines = [f"[INFO] 诊断汇总: 错误 {len(errors)} 个, 警告 {len(warnings)} 个"
+                 f"（去重前共 {self.total} 条）"]
+        repeated = sorted(((len(self.sources[d.key]), d) for d in errors + warnings
+                           if len(self.sources[d.key]) > 1), key=lambda item: -item[0])
+        for count, diagnostic in repeated:
+            lines.append(f"  {count} 个编译单元: {diagnostic}")
+        if self.abort_reason:
+            lines.append(f"[ERROR] 已中止: {self.abort_reason}")
+        return '\n'.join(lines)
+
+
+def run_with_diagnostics(args, parser, env=None, cwd=None, cancel=None):
+    """运行命令，stdout/stderr 边读边交给 parser；cancel（threading.Event）置位时结束进程
+
+    返回 subprocess.CompletedProcess（完整输出，与 subprocess.run(capture_output=True) 相同），
+    被取消时 returncode 为 CANCELLED_RETURNCODE，附加属性 cancelled
+    """
+    # 独立的进程组：结束时连同编译器的子进程（cc1plus 等）一起结束
+    proc = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, errors='replace',
+                            env=env, cwd=cwd, start_new_session=os.name != 'nt')
+    output = {'stdout': [], 'stderr': []}
+    lock = threading.Lock()
+
+    def pump(stream, name):
+        for line in stream:
+            output[name].append(line)
+            # 两个流的行交给同一个解析器，按行加锁
+            with lock:
+                parser.feed_line(line)
+        stream.close()
+
+    readers = [threading.Thread(target=pump, args=(proc.stdout, 'stdout'), daemon=True),
+               threading.Thread(target=pump, args=(proc.stderr, 'stderr'), daemon=True)]
+    for reader in readers:
+        reader.start()
+    cancelled = False
+    while True:
+        try:
+            proc.wait(timeout=0.1)
+            break
+        except subprocess.TimeoutExpired:
+            if cancel is not None and cancel.is_set():
+                kill_process_tree(proc)
+                cancelled = True
+    for reader in readers:
+        reader.join()
+    returncode = CANCELLED_RETURNCODE if cancelled else proc.returncode
+    result = subprocess.CompletedProcess(args, returncode, ''.join(output['stdout']), ''.join(output['stderr']))
+    result.cancelled = cancelled
+    return result
+
+
+if __name__ == "__main__":
+    # 用法: python diagnostics.py <日志文件>...  —— 解析构建日志，输出去重后的诊断和汇总
+    if len(sys.argv) < 2:
+        print("用法: python diagnostics.py <日志文件>...")
+        sys.exit(1)
+    collector = DiagnosticCollector(abort_on_fatal=False)
+    for log_path in sys.argv[1:]:
+        with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+            log_parser = collector.parser(log_path)
+            for log_line in f:
+                log_parser.feed_line(log_line)
+    print(collector.summary())
+    sys.exit(1 if collector.unique('fatal', 'error') else 0)
@@ -5,10 +5,12 @@
 """
 
 import os
-import subprocess
 import sys
 import time
 
+from command_runner import run_command
+from diagnostics import DiagnosticCollector
+
 def setup_environment_and_compile():
     """设置环境并编译"""
     print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] 开始直接编译WebEngine")
@@ -27,11 +29,8 @@ cd /d "E:\\GitHub3\\cpp\\qt_conan_test"
 echo VS2022 activated
 echo Starting compilation...
 set INCLUDE=-I"C:\\Users\\happyli\\.conan2\\p\\qt4048dd8d846aa\\s\\src\\qtwebengine\\src\\webenginewidgets\\api" -I"C:\\Users\\happyli\\.conan2\\p\\qt4048dd8d846aa\\s\\src\\qtwebengine\\src\\webenginewidgets"
-cl /nologo /c /std:c++20 /utf-8 /W3 /EHsc %INCLUDE% src\\main.cpp /Foobj\\main.obj
-if %errorlevel% neq 0 goto :error
-cl /nologo /c /std:c++20 /utf-8 /W3 /EHsc %INCLUDE% src\\mainwindow.cpp /Foobj\\mainwindow.obj
-if %errorlevel% neq 0 goto :error
-cl /nologo /c /std:c++20 /utf-8 /W3 /EHsc %INCLUDE% src\\webviewwidget.cpp /Foobj\\webviewwidget.obj
+REM Parallel compile driver: cached, concurrent, stops on first error
+"{python}" "{compile_driver}" cl obj src\\main.cpp src\\mainwindow.cpp src\\webviewwidget.cpp -- /nologo /std:c++20 /utf-8 /W3 /EHsc %INCLUDE%
 if %errorlevel% neq 0 goto :error
 link /nologo /subsystem:windows /entry:mainCRTStartup obj\\main.obj obj\\mainwindow.obj obj\\webviewwidget.obj /OUT:bin\\Qt6WebViewApp.exe
 if %errorlevel% neq 0 goto :error
@@ -42,7 +41,8 @@ echo Compilation failed!
 exit /b 1
 :end
 pause
-'''
+'''.format(python=sys.executable,
+           compile_driver=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'compile_driver.py'))
     
     # 写入脚本文件
     script_path = "compile_now.bat"
@@ -56,16 +56,16 @@ pause
     # 尝试自动执行（如果失败，手动执行）
     try:
         print("Attempting auto-compilation...")
-        result = subprocess.run([script_path], 
-                              capture_output=True, 
-                              text=True, 
-                              timeout=60)
+        # 输出逐行显示并解析诊断信息；60秒没有输出（例如停在 pause）时结束
+        collector = DiagnosticCollector(echo=False)
+        parser = collector.parser(script_path)
+        run_command([script_path], idle_timeout=60,
+                    on_line=lambda name, line: parser.feed_line(line))
         
         print("Compilation result:")
-        print(result.stdout)
-        if result.stderr:
-            print("Errors:")
-            print(result.stderr)
+        print(collector.summary())
+        for diagnostic in collector.unique('fatal', 'error'):
+            print(f"[ERROR] {diagnostic}")
         
         # 检查输出文件
         exe_path = "bin\\Qt6WebViewApp.exe"
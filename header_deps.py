@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+编译器输出的头文件依赖（scons deps=compiler）
+编译时附带 /showIncludes（MSVC）或 -H（GCC/Clang），从编译输出中取出实际包含的头文件，
+按源文件保存到 obj/.header_deps.json；之后的构建由自定义扫描器直接返回这些依赖，
+不再用SCons的C扫描器逐个正则扫描Qt头文件
+
+项目目录之外的头文件（Qt、Windows SDK、MSVC）作为一个整体：只比较它们的大小和修改时间，
+指纹写入 obj/.header_deps/<块>.stamp，指纹变化时依赖它的目标重新编译
+还没有记录的源文件（第一次构建、新增的文件）使用原来的C扫描器
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+import threading
+
+from object_cache import ObjectCache, parse_command, is_msvc_compiler, expand_response_files, SOURCE_EXTENSIONS
+from qt_pch import write_if_changed
+
+DEPS_FILE_NAME = '.header_deps.json'
+STAMP_DIR_NAME = '.header_deps'
+DEPS_VERSION = 1
+
+MSVC_DEPS_FLAG = '/showIncludes'
+GCC_DEPS_FLAG = '-H'
+# SCons 中设置 VSLANG=1033 使 cl 输出英文提示；中文版VS的提示也能识别
+SHOW_INCLUDES_PREFIXES = ('Note: including file:', '注意: 包含文件:')
+GCC_TRACE_PATTERN = re.compile(r'^\.+ (.+)$')
+GCC_GUARD_HINT = 'Multiple include guards may be useful for:'
+
+SCANNED_SUFFIXES = ('.cpp', '.cc', '.cxx', '.c')
+
+
+def parse_dependency_output(text, msvc=True):
+    """从编译输出中取出头文件列表，返回 (头文件列表, 去掉依赖信息后的输出)"""
+    headers = []
+    remaining = []
+    in_guard_hint = False
+    for line in (text or '').splitlines(keepends=True):
+        stripped = line.strip()
+        if msvc:
+            prefix = next((p for p in SHOW_INCLUDES_PREFIXES if stripped.startswith(p)), None)
+            if prefix:
+                headers.append(stripped[len(prefix):].strip())
+                continue
+        else:
+            match = GCC_TRACE_PATTERN.match(stripped)
+            if match:
+                headers.append(match.group(1).strip())
+                continue
+            if stripped == GCC_GUARD_HINT:
+                in_guard_hint = True
+                continue
+            # 提示后面是一行一个头文件路径
+            if in_guard_hint and stripped and os.path.isfile(stripped):
+                continue
+            in_guard_hint = False
+        remaining.append(line)
+    return headers, ''.join(remaining)
+
+
+def command_source(args):
+    """编译命令中的源文件（/Yc、/Yu 等不可缓存的命令也能识别）"""
+    command = parse_command(args)
+    if command is not None:
+        return command.source
+    sources = [str(arg).strip('"') for arg in args[1:]
+               if not str(arg).startswith(('/', '-')) and str(arg).lower().endswith(SOURCE_EXTENSIONS)]
+    return sources[0] if len(sources) == 1 else None
+
+
+def has_deps_flag(args):
+    """编译命令是否带有依赖参数（/showIncludes 或 -H）"""
+    if not args:
+        return False
+    flag = MSVC_DEPS_FLAG if is_msvc_compiler(str(args[0])) else GCC_DEPS_FLAG
+    return any(str(arg).lower() == flag.lower() for arg in args[1:])
+
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+        return f"{st.st_size}:{st.st_mtime_ns}"
+    except OSError:
+        return 'missing'
+
+
+class HeaderDeps:
+    """按源文件保存的头文件依赖"""
+
+    def __init__(self, obj_dir, project_root):
+        self.obj_dir = os.path.abspath(str(obj_dir))
+        self.project_root = os.path.normcase(os.path.abspath(str(project_root))) + os.sep
+        self.path = os.path.join(self.obj_dir, DEPS_FILE_NAME)
+        self.stamp_dir = os.path.join(self.obj_dir, STAMP_DIR_NAME)
+        self._lock = threading.Lock()
+        self._stamps = {}
+        self._dirty = False
+        self.records, self.blocks = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == DEPS_VERSION:
+                return data['records'], data['blocks']
+        except (OSError, ValueError, KeyError):
+            pass
+        return {}, {}
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            # 只保留仍被引用的外部头文件块
+            used = {record['block'] for record in self.records.values() if record['block']}
+            self.blocks = {block: headers for block, headers in self.blocks.items() if block in used}
+            data = {'version': DEPS_VERSION, 'records': self.records, 'blocks': self.blocks}
+            self._dirty = False
+        os.makedirs(self.obj_dir, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def _key(self, source):
+        return os.path.normcase(os.path.abspath(str(source)))
+
+    def record(self, source, headers):
+        """记录一次成功编译的头文件列表"""
+        project = set()
+        external = set()
+        for header in headers:
+            header = os.path.abspath(header)
+            if os.path.normcase(header).startswith(self.project_root):
+                project.add(header)
+            else:
+                external.add(header)
+        external = sorted(external)
+        block = hashlib.sha256('\n'.join(external).encode('utf-8')).hexdigest()[:16] if external else None
+        with self._lock:
+            if block:
+                self.blocks[block] = external
+            self.records[self._key(source)] = {'project': sorted(project), 'block': block}
+            self._dirty = True
+
+    def block_stamp(self, block):
+        """外部头文件块的指纹文件（每次构建每个块只计算一次）"""
+        with self._lock:
+            if block in self._stamps:
+                return self._stamps[block]
+            headers = self.blocks.get(block, [])
+        digest = hashlib.sha256()
+        for header in headers:
+            digest.update(f"{header}\0{_file_stamp(header)}\n".encode('utf-8'))
+        stamp_path = os.path.join(self.stamp_dir, block + '.stamp')
+        os.makedirs(self.stamp_dir, exist_ok=True)
+        write_if_changed(stamp_path, digest.hexdigest() + '\n')
+        with self._lock:
+            self._stamps[block] = stamp_path
+        return stamp_path
+
+    def dependencies(self, source):
+        """源文件的依赖 (项目头文件列表, 外部头文件指纹文件)，没有可用记录时返回 None"""
+        with self._lock:
+            record = self.records.get(self._key(source))
+        if record is None or not all(os.path.isfile(header) for header in record['project']):
+            return None
+        stamp = self.block_stamp(record['block']) if record['block'] else None
+        return record['project'], stamp
+
+    def compile(self, args, runner, env=None, cwd=None):
+        """运行带依赖参数的编译命令：记录依赖，返回去掉依赖信息后的结果（subprocess.CompletedProcess）
+
+        runner: ObjectCache（不可缓存或缓存关闭时它直接运行命令）
+        """
+        source = command_source(args[:1] + expand_response_files(args[1:]))
+        result = runner.compile(args, env=env, cwd=cwd)
+        # MSVC 输出到 stdout，GCC 的 -H 输出到 stderr
+        if is_msvc_compiler(args[0]):
+            headers, result.stdout = parse_dependency_output(result.stdout, True)
+        else:
+            headers, result.stderr = parse_dependency_output(result.stderr, False)
+        if result.returncode == 0 and source is not None:
+            self.record(os.path.join(cwd or os.getcwd(), source), headers)
+        return result
+
+    def wrap_spawn(self, spawn, object_cache=None):
+        """包装 SCons 的 SPAWN：带依赖参数的编译命令捕获输出并记录依赖，其他命令原样执行
+
+        object_cache: 启用编译缓存时传入（命中缓存时依赖信息来自缓存的输出）
+        """
+        runner = object_cache or ObjectCache(enabled=False)
+
+        def deps_spawn(sh, escape, cmd, args, env):
+            args = [str(arg).strip('"') for arg in args]
+            # 命令行过长时 SCons 使用 @响应文件，依赖参数和源文件都在文件里
+            expanded = args[:1] + expand_response_files(args[1:])
+            if not has_deps_flag(expanded) or command_source(expanded) is None:
+                return spawn(sh, escape, cmd, args, env)
+
+            env = {str(k): str(v) for k, v in (env or os.environ).items()}
+            result = self.compile(args, runner, env=env)
+            if result.stdout:
+                sys.stdout.write(result.stdout)
+            if result.stderr:
+                sys.stderr.write(result.stderr)
+            return result.returncode
+        return deps_spawn
+
+    def scanner(self):
+        """替换 .cpp/.c 等源文件的SCons扫描器（在SConstruct中调用）"""
+        import SCons.Scanner
+        from SCons.Tool import SourceFileScanner
+
+        scanner_base = getattr(SCons.Scanner, 'ScannerBase', None) or SCons.Scanner.Base
+        # 与C扫描器相同的搜索路径，回退时直接交给它
+        path_function = SCons.Scanner.FindPathDirs('CPPPATH')
+        fallback = {suffix: SourceFileScanner.function.get(suffix) for suffix in SCANNED_SUFFIXES}
+
+        def scan(node, env, path):
+            deps = self.dependencies(node.abspath)
+            if deps is None:
+                original = fallback.get(node.get_suffix())
+                if original is None:
+                    return []
+                # SCons 以 path_func(扫描器) 的方式调用，这里返回本扫描器已经算好的 CPPPATH
+                return node.get_implicit_deps(env, original, lambda scanner: path)
+            project, stamp = deps
+            nodes = [env.File(header) for header in project]
+            if stamp:
+                nodes.append(env.File(stamp))
+            return nodes
+
+        scanner = scanner_base(scan, name='HeaderDepsScanner', skeys=list(SCANNED_SUFFIXES),
+                               path_function=path_function, recursive=False)
+        for suffix in SCANNED_SUFFIXES:
+            SourceFileScanner.add_scanner(suffix, scanner)
+        return scanner
+
+
+def enable_header_deps(env, obj_dir, project_root, msvc):
+    """SConstruct 使用：添加依赖参数并替换源文件扫描器，返回 HeaderDeps
+
+    调用方还需要用 header_deps.wrap_spawn() 包装 env['SPAWN']，并在退出时调用 save()
+    """
+    header_deps = HeaderDeps(obj_dir, project_root)
+    if msvc:
+        env.Append(CCFLAGS=[MSVC_DEPS_FLAG])
+        env['ENV']['VSLANG'] = '1033'
+    else:
+        env.Append(CCFLAGS=[GCC_DEPS_FLAG])
+    header_deps.scanner()
+    return header_deps
+
+
+if __name__ == "__main__":
+    # 用法: python header_deps.py [obj目录]  —— 打印每个源文件记录的依赖数量
+    deps = HeaderDeps(sys.argv[1] if len(sys.argv) > 1 else 'obj', os.getcwd())
+    if not deps.records:
+        print(f"[INFO] {deps.path} 中没有依赖记录")
+        sys.exit(0)
+    for source, record in sorted(deps.records.items()):
+        external = len(deps.blocks.get(record['block'], [])) if record['block'] else 0
+        print(f"{os.path.basename(source):<30} 项目头文件 {len(record['project']):>4}  外部头文件 {external:>5}")
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+头文件包含图分析
+按编译器的查找规则（"..." 先查当前文件所在目录，再按 CPPPATH 顺序查找；<...> 只查 CPPPATH）
+解析每个编译单元实际包含的头文件，统计每个编译单元的头文件数量、字节数和目录探测次数，
+并给出精简后的 CPPPATH：去掉没有命中任何 #include 的目录，命中多的目录排在前面
+（只有在所有头文件仍然解析到同一个文件时才调整顺序）
+
+不展开宏和条件编译：所有 #include 行都算（得到的是实际包含集合的超集，精简结果不会漏掉目录）
+找不到的头文件（<iostream>、<windows.h> 等编译器自带目录中的头文件）只计入探测次数
+
+结果缓存到 obj/include_graph.json，源文件、头文件和包含目录都未变化时直接复用
+"""
+
+import os
+import sys
+import json
+import hashlib
+
+from qt_pch import INCLUDE_PATTERN
+
+GRAPH_VERSION = 1
+GRAPH_FILE_NAME = 'include_graph.json'
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+        return [st.st_size, st.st_mtime_ns]
+    except OSError:
+        return None
+
+
+class IncludeResolver:
+    """带缓存的 #include 查找"""
+
+    def __init__(self, search_path):
+        self.search_path = [os.path.abspath(str(path)) for path in search_path]
+        self._isfile = {}
+        self._includes = {}
+        self._resolved = {}
+
+    def isfile(self, path):
+        if path not in self._isfile:
+            self._isfile[path] = os.path.isfile(path)
+        return self._isfile[path]
+
+    def includes(self, path):
+        """文件中的 #include 列表 [(kind, name), ...]"""
+        if path not in self._includes:
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except OSError:
+                data = b''
+            self._includes[path] = [(kind.decode(), name.decode('utf-8', errors='replace').strip())
+                                    for kind, name in INCLUDE_PATTERN.findall(data)]
+        return self._includes[path]
+
+    def resolve(self, kind, name, current_dir, search_path=None):
+        """返回 (文件路径, 命中的CPPPATH下标, 探测次数)
+
+        下标为 -1 表示在当前文件目录（或绝对路径）找到，文件路径为 None 表示没有找到
+        """
+        search_path = self.search_path if search_path is None else search_path
+        key = (kind, name, current_dir if kind == '"' else None, tuple(search_path))
+        if key in self._resolved:
+            return self._resolved[key]
+
+        probes = 0
+        result = None
+        if os.path.isabs(name):
+            probes = 1
+            if self.isfile(name):
+                result = (os.path.normpath(name), -1, probes)
+        elif kind == '"':
+            probes = 1
+            candidate = os.path.normpath(os.path.join(current_dir, name))
+            if self.isfile(candidate):
+                result = (candidate, -1, probes)
+        if result is None:
+            for index, directory in enumerate(search_path):
+                probes += 1
+                candidate = os.path.normpath(os.path.join(directory, name))
+                if self.isfile(candidate):
+                    result = (candidate, index, probes)
+                    break
+        if result is None:
+            result = (None, None, probes)
+        self._resolved[key] = result
+        return result
+
+
+class TranslationUnit:
+    """一个编译单元的包含统计"""
+
+    def __init__(self, source):
+        self.source = source
+        self.headers = {}
+        self.unresolved = set()
+        self.probes = 0
+        # CPPPATH 下标 -> 命中次数
+        self.dir_hits = {}
+        # (kind, name, 当前目录) -> 解析到的文件，用于验证重新排序后的 CPPPATH
+        self.resolutions = {}
+        # 遍历到的每条 #include（重复的也算），用于统计探测次数
+        self.directives = []
+
+    @property
+    def header_bytes(self):
+        return sum(self.headers.values())
+
+    def to_dict(self, search_path):
+        return {
+            'source': self.source,
+            'headers': len(self.headers),
+            'header_bytes': self.header_bytes,
+            'probes': self.probes,
+            'unresolved': sorted(self.unresolved),
+            'dirs': sorted({search_path[i] for i in self.dir_hits}),
+        }
+
+
+def analyze_unit(resolver, source, forced_includes=()):
+    """沿包含图遍历一个编译单元（每个头文件只展开一次，相当于都有include guard）"""
+    unit = TranslationUnit(os.path.abspath(str(source)))
+    stack = [unit.source] + [os.path.abspath(str(path)) for path in forced_includes]
+    seen = set(stack)
+    for path in stack[1:]:
+        unit.headers[path] = os.path.getsize(path) if resolver.isfile(path) else 0
+    while stack:
+        current = stack.pop()
+        current_dir = os.path.dirname(current)
+        for kind, name in resolver.includes(current):
+            path, index, probes = resolver.resolve(kind, name, current_dir)
+            unit.probes += probes
+            unit.directives.append((kind, name, current_dir))
+            if path is None:
+                unit.unresolved.add(name)
+                continue
+            unit.resolutions[(kind, name, current_dir)] = path
+            if index is not None and index >= 0:
+                unit.dir_hits[index] = unit.dir_hits.get(index, 0) + 1
+            if path not in seen:
+                seen.add(path)
+                unit.headers[path] = os.path.getsize(path)
+                stack.append(path)
+    return unit
+
+
+def _count_probes(resolver, units, search_path):
+    return sum(resolver.resolve(kind, name, current_dir, search_path)[2]
+               for unit in units for kind, name, current_dir in unit.directives)
+
+
+def prune_search_path(resolver, units):
+    """精简后的 CPPPATH：去掉没有命中的目录；命中多的目录在前（前提是解析结果不变）"""
+    search_path = resolver.search_path
+    hits = {}
+    for unit in units:
+        for index, count in unit.dir_hits.items():
+            hits[index] = hits.get(index, 0) + count
+    used = [search_path[index] for index in sorted(hits)]
+    ordered = [search_path[index] for index in sorted(hits, key=lambda index: (-hits[index], index))]
+
+    def same_resolution(candidate):
+        return all(resolver.resolve(kind, name, current_dir, candidate)[0] == path
+                   for unit in units
+                   for (kind, name, current_dir), path in unit.resolutions.items())
+
+    return ordered if ordered != used and same_resolution(ordered) else used
+
+
+class IncludeGraph:
+    """分析结果"""
+
+    def __init__(self, search_path, units, pruned_path, probes_before, probes_after):
+        self.search_path = search_path
+        self.units = units
+        self.pruned_path = pruned_path
+        self.probes_before = probes_before
+        self.probes_after = probes_after
+
+    def report(self, top=10):
+        lines = [f"{'编译单元':<40} {'头文件':>8} {'字节数':>12} {'探测次数':>10}"]
+        for unit in sorted(self.units, key=lambda unit: -unit['header_bytes'])[:top]:
+            lines.append(f"{os.path.basename(unit['source']):<40} {unit['headers']:>8} "
+                         f"{unit['header_bytes']:>12,} {unit['probes']:>10}")
+        lines.append(f"CPPPATH: {len(self.search_path)} -> {len(self.pruned_path)} 个目录, "
+                     f"目录探测 {self.probes_before} -> {self.probes_after} 次")
+        return '\n'.join(lines)
+
+    def to_dict(self):
+        return {'search_path': self.search_path, 'pruned_path': self.pruned_path,
+                'probes_before': self.probes_before, 'probes_after': self.probes_after,
+                'units': self.units}
+
+
+def build_include_graph(sources, search_path, forced_includes=()):
+    resolver = IncludeResolver(search_path)
+    units = [analyze_unit(resolver, source, forced_includes) for source in sources]
+    pruned = prune_search_path(resolver, units)
+    graph = IncludeGraph(resolver.search_path,
+                         [unit.to_dict(resolver.search_path) for unit in units], pruned,
+                         _count_probes(resolver, units, resolver.search_path),
+                         _count_probes(resolver, units, pruned))
+    # 缓存校验用：所有参与解析的文件和目录
+    files = {source for unit in units for source in [unit.source] + list(unit.headers)}
+    return graph, files
+
+
+def _cache_key(sources, search_path, forced_includes):
+    payload = json.dumps([GRAPH_VERSION, sorted(os.path.abspath(str(s)) for s in sources),
+                          [os.path.abspath(str(p)) for p in search_path],
+                          [os.path.abspath(str(p)) for p in forced_includes]])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def load_include_graph(obj_dir, sources, search_path, forced_includes=()):
+    """读取或重新计算包含图（缓存在 obj/include_graph.json）
+
+    任何源文件、头文件或包含目录（新增头文件会改变目录的修改时间）变化时重新计算
+    """
+    cache_path = os.path.join(str(obj_dir), GRAPH_FILE_NAME)
+    key = _cache_key(sources, search_path, forced_includes)
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get('key') == key and all(_stamp(path) == stamp for path, stamp in cached['stamps'].items()):
+            data = cached['graph']
+            return IncludeGraph(data['search_path'], data['units'], data['pruned_path'],
+                                data['probes_before'], data['probes_after'])
+    except (OSError, ValueError, KeyError):
+        pass
+
+    graph, files = build_include_graph(sources, search_path, forced_includes)
+    watched = set(files) | set(graph.search_path) | {os.path.dirname(path) for path in files}
+    stamps = {path: _stamp(path) for path in sorted(watched)}
+    os.makedirs(str(obj_dir), exist_ok=True)
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'key': key, 'stamps': stamps, 'graph': graph.to_dict()}, f, indent=1)
+    os.replace(tmp_path, cache_path)
+    return graph
+
+
+def apply_pruned_cpppath(env, obj_dir, sources, forced_includes=()):
+    """SConstruct 使用：把 env['CPPPATH'] 换成精简后的列表，返回 IncludeGraph
+
+    sources 中应包含需要MOC的头文件（MOC输出在分析时可能还不存在，它会包含这些头文件）
+    """
+    search_path = [env.Dir(path).abspath for path in env.get('CPPPATH', [])]
+    graph = load_include_graph(obj_dir, sources, search_path, forced_includes)
+    env['CPPPATH'] = list(graph.pruned_path)
+    print(f"[INFO] 包含图分析: CPPPATH {len(graph.search_path)} -> {len(graph.pruned_path)} 个目录, "
+          f"目录探测 {graph.probes_before} -> {graph.probes_after} 次")
+    return graph
+
+
+if __name__ == "__main__":
+    # 用法: python include_graph.py <源码目录> [包含目录]...
+    #       没有给出包含目录时使用 SConscript_conandeps 中的 CPPPATH
+    if len(sys.argv) < 2:
+        print("用法: python include_graph.py <源码目录> [包含目录]...")
+        sys.exit(1)
+    src_dir = sys.argv[1]
+    search_path = sys.argv[2:]
+    if not search_path:
+        from conandeps_loader import load_conandeps
+        search_path = load_conandeps().aggregate.cpppath
+    search_path = [src_dir] + list(search_path)
+    sources = [os.path.join(src_dir, name) for name in sorted(os.listdir(src_dir))
+               if name.endswith(('.cpp', '.cc', '.cxx'))]
+    graph, _ = build_include_graph(sources, search_path)
+    print(graph.report())
+    print("[INFO] 精简后的CPPPATH:")
+    for path in graph.pruned_path:
+        print(f"  {path}")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量并行MOC生成
+把所有需要MOC的头文件一次性交给有界线程池（大小默认等于CPU核数），
+每个工作线程负责启动一个moc进程；逐个报告耗时，遇到第一个错误立即停止派发
+moc 的错误输出解析成结构化诊断（diagnostics.py）后输出
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from diagnostics import DiagnosticCollector
+
+
+def default_workers():
+    """默认并发数：CPU核数"""
+    return os.cpu_count() or 1
+
+
+def _timed_generate(moc_cache, header, output):
+    start = time.perf_counter()
+    returncode, status, stderr = moc_cache.generate(header, output)
+    return returncode, status, stderr, time.perf_counter() - start
+
+
+def run_moc_batch(moc_cache, jobs, max_workers=None):
+    """并行生成一批MOC文件
+
+    jobs: [(头文件, 输出文件), ...]
+    返回 0 表示全部成功，否则返回第一个失败任务的返回码
+    """
+    jobs = [(str(header), str(output)) for header, output in jobs]
+    if not jobs:
+        return 0
+
+    workers = max(1, min(max_workers or default_workers(), len(jobs)))
+    print(f"[INFO] 批量MOC: {len(jobs)} 个头文件, 并发数 {workers}")
+
+    batch_start = time.perf_counter()
+    pending_jobs = list(reversed(jobs))
+    running = {}
+    failed = None
+    counts = {'fresh': 0, 'restored': 0, 'moc': 0}
+    collector = DiagnosticCollector()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # 只保持 workers 个任务在途，失败后不再派发新任务
+        while pending_jobs or running:
+            while pending_jobs and failed is None and len(running) < workers:
+                header, output = pending_jobs.pop()
+                future = executor.submit(_timed_generate, moc_cache, header, output)
+                running[future] = (header, output)
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                header, output = running.pop(future)
+                try:
+                    returncode, status, stderr, elapsed = future.result()
+                except Exception as e:
+                    returncode, status, stderr, elapsed = 1, 'moc', str(e), 0.0
+
+                if returncode != 0:
+                    print(f"[ERROR] MOC失败 ({elapsed:.2f}秒): {header}")
+                    parser = collector.parser(header)
+                    parser.feed(stderr)
+                    parser.close()
+                    # 无法识别的输出原样输出
+                    if stderr and not parser.records:
+                        print(stderr.rstrip())
+                    if failed is None:
+                        failed = returncode
+                    continue
+
+                counts[status] += 1
+                print(f"[OK] MOC {status:<8} {elapsed:6.2f}秒  {os.path.basename(header)} -> {output}")
+
+    moc_cache.save()
+    elapsed = time.perf_counter() - batch_start
+    if failed is not None:
+        print(f"[ERROR] 批量MOC中止, 剩余 {len(pending_jobs)} 个头文件未处理")
+        return failed
+
+    print(f"[INFO] 批量MOC完成: 运行moc {counts['moc']} 个, 缓存恢复 {counts['restored']} 个, "
+          f"无需更新 {counts['fresh']} 个, 总耗时 {elapsed:.2f}秒")
+    return 0
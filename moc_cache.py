@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MOC内容哈希缓存
+以 头文件内容哈希 + moc版本 + moc参数 作为键，缓存到 obj/.moc_cache 目录，
+头文件未变化时直接复用上次的输出，不再启动 moc.exe
+供 SConstruct、SConstruct_local_qt.py 和 test/fix_moc_linking.py 共用
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import threading
+import subprocess
+
+CACHE_DIR_NAME = '.moc_cache'
+INDEX_FILE_NAME = 'index.json'
+INDEX_VERSION = 1
+
+
+def file_sha256(path):
+    """计算文件内容的SHA256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MocCache:
+    """基于内容哈希的MOC输出缓存"""
+
+    def __init__(self, moc_exe, obj_dir, flags=None):
+        self.moc_exe = os.path.abspath(str(moc_exe))
+        self.flags = [str(flag) for flag in (flags or [])]
+        self.cache_dir = os.path.join(str(obj_dir), CACHE_DIR_NAME)
+        self.index_path = os.path.join(self.cache_dir, INDEX_FILE_NAME)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.index = self._load_index()
+        self._moc_version = None
+        # 并行生成MOC时（见 moc_batch.py）保护索引
+        self._lock = threading.Lock()
+
+    def _load_index(self):
+        """读取缓存索引，格式不对时视为空缓存"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('version') == INDEX_VERSION:
+                return index
+        except (OSError, ValueError):
+            pass
+        return {'version': INDEX_VERSION, 'moc': {}, 'outputs': {}}
+
+    def save(self):
+        """写回缓存索引（先写临时文件再替换，避免中断时损坏）"""
+        tmp_path = self.index_path + '.tmp'
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.index_path)
+
+    def moc_version(self):
+        """获取moc版本，按moc.exe的大小和修改时间缓存，避免每次执行 moc -v"""
+        with self._lock:
+            if self._moc_version is None:
+                self._moc_version = self._query_moc_version()
+        return self._moc_version
+
+    def _query_moc_version(self):
+        st = os.stat(self.moc_exe)
+        stamp = [st.st_size, st.st_mtime_ns]
+        record = self.index['moc'].get(self.moc_exe)
+        if record and record.get('stamp') == stamp:
+            return record['version']
+
+        result = subprocess.run([self.moc_exe, '-v'], capture_output=True, text=True)
+        version = (result.stdout or result.stderr).strip() or f"unknown-{st.st_size}-{st.st_mtime_ns}"
+        self.index['moc'][self.moc_exe] = {'stamp': stamp, 'version': version}
+        return version
+
+    def cache_key(self, header, output):
+        """计算缓存键
+
+        moc生成的 #include 路径相对于输出文件所在目录，
+        因此头文件路径和输出目录也要参与哈希
+        """
+        digest = hashlib.sha256()
+        digest.update(file_sha256(header).encode('ascii'))
+        digest.update(b'\0' + self.moc_version().encode('utf-8'))
+        digest.update(b'\0' + '\0'.join(self.flags).encode('utf-8'))
+        digest.update(b'\0' + os.path.abspath(header).encode('utf-8'))
+        digest.update(b'\0' + os.path.dirname(os.path.abspath(output)).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _blob_path(self, key):
+        return os.path.join(self.cache_dir, key + '.cpp')
+
+    def _remember(self, output, key):
+        st = os.stat(output)
+        with self._lock:
+            self.index['outputs'][os.path.abspath(output)] = {
+                'key': key,
+                'stamp': [st.st_size, st.st_mtime_ns],
+            }
+
+    def is_fresh(self, output, key):
+        """输出文件存在且与缓存记录一致"""
+        record = self.index['outputs'].get(os.path.abspath(output))
+        if not record or record.get('key') != key:
+            return False
+        try:
+            st = os.stat(output)
+        except OSError:
+            return False
+        return record.get('stamp') == [st.st_size, st.st_mtime_ns]
+
+    def generate(self, header, output):
+        """生成MOC文件，返回 (返回码, 状态, 错误输出)
+
+        状态: 'fresh'    - 输出已是最新，什么都没做
+              'restored' - 从缓存中恢复输出
+              'moc'      - 实际运行了moc
+        """
+        header = str(header)
+        output = str(output)
+        key = self.cache_key(header, output)
+
+        if self.is_fresh(output, key):
+            return 0, 'fresh', ''
+
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        blob = self._blob_path(key)
+        if os.path.exists(blob):
+            shutil.copyfile(blob, output)
+            self._remember(output, key)
+            return 0, 'restored', ''
+
+        cmd = [self.moc_exe] + self.flags + ['-o', output, header]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            return result.returncode, 'moc', result.stderr
+
+        tmp_blob = f"{blob}.{threading.get_ident()}.tmp"
+        shutil.copyfile(output, tmp_blob)
+        os.replace(tmp_blob, blob)
+        self._remember(output, key)
+        return 0, 'moc', result.stderr
@@ -3,60 +3,158 @@
 """
 Conan构建进度监控脚本
 监控Qt WebEngine依赖的下载和编译进度
+
+缓存目录大小按目录增量统计：只重新列出修改时间变化过的目录，
+监控在后台线程中运行，输出增长速度（MB/s）和预计剩余时间
 """
 
 import os
+import sys
 import time
-import subprocess
-import json
+import threading
 from datetime import datetime
 
-def monitor_conan_progress():
+# 目录修改后继续逐个stat其中文件的轮数；只要两次统计之间大小还在变化就重新计数，
+# 连续这么多轮没有变化才停止（正在下载的文件原地变大时，所在目录的修改时间不会变化）
+HOT_REFRESHES = 5
+
+
+class DirectorySizeIndex:
+    """按目录缓存的大小索引"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        # 目录 -> {'mtime', 'size', 'subdirs', 'hot'}
+        self.entries = {}
+        self.total = 0
+        self.last_rescanned = 0
+
+    def _scan_dir(self, path, mtime, hot):
+        size = 0
+        subdirs = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            size += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return {'mtime': mtime, 'size': size, 'subdirs': subdirs, 'hot': hot}
+
+    def refresh(self):
+        """重新统计，返回缓存目录总大小（字节）"""
+        entries = {}
+        total = 0
+        rescanned = 0
+        stack = [self.root]
+        while stack:
+            path = stack.pop()
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+
+            entry = self.entries.get(path)
+            if entry is None or entry['mtime'] != mtime:
+                entry = self._scan_dir(path, mtime, HOT_REFRESHES)
+                rescanned += 1
+            elif entry['hot'] > 0:
+                previous_size = entry['size']
+                entry = self._scan_dir(path, mtime, entry['hot'] - 1)
+                if entry['size'] != previous_size:
+                    entry['hot'] = HOT_REFRESHES
+                rescanned += 1
+
+            entries[path] = entry
+            total += entry['size']
+            stack.extend(entry['subdirs'])
+
+        self.entries = entries
+        self.total = total
+        self.last_rescanned = rescanned
+        return total
+
+
+class ConanCacheMonitor(threading.Thread):
+    """后台监控线程：定时增量统计缓存大小并报告速度和预计剩余时间
+
+    expected_growth: 预计总增长字节数（例如Qt WebEngine约20GB），为空时不计算ETA
+    """
+
+    def __init__(self, cache_dir, interval=30, expected_growth=None, report=print):
+        super().__init__(daemon=True)
+        self.index = DirectorySizeIndex(cache_dir)
+        self.interval = interval
+        self.expected_growth = expected_growth
+        self.report = report
+        self.stop_event = threading.Event()
+        self.initial_size = None
+        self.rate = 0.0
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        start = time.monotonic()
+        self.initial_size = self.index.refresh()
+        self.report(f"📊 初始缓存大小: {format_size(self.initial_size)} "
+                    f"({len(self.index.entries)} 个目录, 统计耗时 {time.monotonic() - start:.1f}秒)")
+
+        last_size = self.initial_size
+        last_time = time.monotonic()
+        while not self.stop_event.wait(self.interval):
+            current_size = self.index.refresh()
+            now = time.monotonic()
+            instant_rate = (current_size - last_size) / max(now - last_time, 1e-6)
+            # 指数平滑，避免解压/编译间歇导致速度跳动
+            self.rate = instant_rate if self.rate == 0 else 0.3 * instant_rate + 0.7 * self.rate
+            last_size, last_time = current_size, now
+
+            grown = current_size - self.initial_size
+            message = (f"⏱️  {datetime.now().strftime('%H:%M:%S')} - 增长 {format_size(max(grown, 0))}, "
+                       f"速度 {self.rate / 1024 / 1024:.2f} MB/s")
+            if self.expected_growth:
+                remaining = self.expected_growth - grown
+                if remaining <= 0:
+                    message += ", 已达到预计大小"
+                elif self.rate > 0:
+                    message += f", 预计剩余 {format_duration(remaining / self.rate)}"
+            message += f" (重新统计 {self.index.last_rescanned}/{len(self.index.entries)} 个目录)"
+            self.report(message)
+
+
+def monitor_conan_progress(expected_growth=None, checks=10, interval=30):
     """监控Conan构建进度"""
     print("🔄 开始监控Conan构建进度...")
     print(f"⏰ 开始时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    
+
     # 检查Conan缓存目录大小变化
-    cache_dir = "C:/Users/happyli/.conan2"
-    
+    cache_dir = os.environ.get("CONAN_HOME", "C:/Users/happyli/.conan2")
+
     if os.path.exists(cache_dir):
         print(f"📁 Conan缓存目录: {cache_dir}")
-        
-        # 记录初始状态
-        initial_size = get_directory_size(cache_dir)
-        print(f"📊 初始缓存大小: {format_size(initial_size)}")
-        
-        # 监控循环
-        for i in range(10):  # 监控10次，每次间隔30秒
-            time.sleep(30)
-            
-            current_size = get_directory_size(cache_dir)
-            size_diff = current_size - initial_size
-            
-            print(f"⏱️  {datetime.now().strftime('%H:%M:%S')} - 缓存大小: {format_size(current_size)} (增长: {format_size(size_diff)})")
-            
-            if size_diff > 1024 * 1024 * 100:  # 如果增长超过100MB，说明在下载
-                print("📥 正在下载依赖...")
-            elif i > 2:  # 3分钟后检查构建状态
-                print("🔨 可能正在进行编译...")
-                
+
+        monitor = ConanCacheMonitor(cache_dir, interval=interval, expected_growth=expected_growth)
+        monitor.start()
+        try:
+            # 监控 checks 次后结束（后台线程统计，主线程只负责等待）
+            monitor.join(timeout=interval * checks + interval / 2)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            monitor.stop()
+
     else:
         print("❌ Conan缓存目录不存在")
 
 def get_directory_size(path):
     """获取目录大小"""
-    total_size = 0
-    try:
-        for dirpath, dirnames, filenames in os.walk(path):
-            for filename in filenames:
-                filepath = os.path.join(dirpath, filename)
-                try:
-                    total_size += os.path.getsize(filepath)
-                except (OSError, IOError):
-                    continue
-    except (OSError, IOError):
-        pass
-    return total_size
+    return DirectorySizeIndex(path).refresh()
 
 def format_size(size_bytes):
     """格式化文件大小"""
@@ -69,5 +167,16 @@ def format_size(size_bytes):
         i += 1
     return f"{size_bytes:.1f} {size_names[i]}"
 
+def format_duration(seconds):
+    """格式化时长"""
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}小时{seconds % 3600 // 60}分"
+    if seconds >= 60:
+        return f"{seconds // 60}分{seconds % 60}秒"
+    return f"{seconds}秒"
+
 if __name__ == "__main__":
-    monitor_conan_progress()
\ No newline at end of file
+    # 可选参数: 预计增长大小（GB），用于计算预计剩余时间
+    expected = float(sys.argv[1]) * 1024 ** 3 if len(sys.argv) > 1 else None
+    monitor_conan_progress(expected_growth=expected)
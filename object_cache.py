@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+编译输出缓存（类似 ccache/sccache）
+以 预处理后的源码 + 编译器标识 + 编译参数 作为键缓存目标文件，
+清理obj目录后重新编译、切换分支后再切回来时直接复用目标文件
+
+缓存目录在项目之外（默认 ~/.cache/qt_build_objects，可用 OBJECT_CACHE_DIR 指定），
+按 256 个子目录分桶，总大小由 OBJECT_CACHE_SIZE（GB）限制：超过限额时扫描全部桶，
+按最近使用时间（LRU）从旧到新淘汰，直到降到限额的 90%
+
+三种用法:
+  SCons:      env['SPAWN'] = ObjectCache().wrap_spawn(env['SPAWN'])
+  Python脚本: ObjectCache().compile([cl_exe, '/c', ...])，返回 subprocess.CompletedProcess
+  命令行:     python object_cache.py cl /c src/main.cpp /Foobj/main.obj（支持 @响应文件）
+"""
+
+import os
+import sys
+import json
+import shutil
+import ntpath
+import hashlib
+import threading
+import subprocess
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'qt_build_objects')
+DEFAULT_MAX_SIZE = 5 * 1024 ** 3
+# 超过限额后淘汰到限额的这个比例，避免每次写入都扫描整个缓存目录
+EVICT_TARGET_RATIO = 0.9
+
+SOURCE_EXTENSIONS = ('.cpp', '.cxx', '.cc', '.c')
+MSVC_COMPILERS = ('cl', 'clang-cl')
+
+# 无法缓存的参数：预编译头（目标文件引用 .pch 的类型信息签名）、依赖文件输出、多文件编译
+MSVC_UNCACHEABLE_PREFIXES = ('/yc', '/yu', '/mp')
+MSVC_UNCACHEABLE = ('/e', '/ep', '/p')
+GCC_UNCACHEABLE = ('-M', '-MM', '-MD', '-MMD', '-MF', '-MT', '-MQ', '-MG', '-MP', '-E', '-S', '-save-temps')
+
+
+def split_command_line(text):
+    """按Windows命令行规则拆分响应文件内容（双引号分组，反斜杠转义引号）"""
+    args = []
+    current = []
+    in_quotes = False
+    has_arg = False
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if ch == '\\':
+            backslashes = 0
+            while i < len(text) and text[i] == '\\':
+                backslashes += 1
+                i += 1
+            if i < len(text) and text[i] == '"':
+                current.append('\\' * (backslashes // 2))
+                if backslashes % 2:
+                    current.append('"')
+                    i += 1
+            else:
+                current.append('\\' * backslashes)
+            has_arg = True
+            continue
+        if ch == '"':
+            in_quotes = not in_quotes
+            has_arg = True
+        elif ch in ' \t\r\n' and not in_quotes:
+            if has_arg:
+                args.append(''.join(current))
+                current = []
+                has_arg = False
+        else:
+            current.append(ch)
+            has_arg = True
+        i += 1
+    if has_arg:
+        args.append(''.join(current))
+    return args
+
+
+def _read_response_file(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return data.decode('utf-16')
+    try:
+        return data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return data.decode('mbcs' if os.name == 'nt' else 'latin-1')
+
+
+def expand_response_files(args):
+    """展开 @响应文件（SCons 的 TEMPFILE 在命令行过长时使用）"""
+    expanded = []
+    for arg in args:
+        if arg.startswith('@') and os.path.isfile(arg[1:]):
+            expanded.extend(split_command_line(_read_response_file(arg[1:])))
+        else:
+            expanded.append(arg)
+    return expanded
+
+
+class CompileCommand:
+    """一条可缓存的单文件编译命令"""
+
+    def __init__(self, compiler, args, source, output, preprocess_args, key_args):
+        self.compiler = compiler
+        self.args = args
+        self.source = source
+        self.output = output
+        self.preprocess_args = preprocess_args
+        self.key_args = key_args
+
+
+def is_msvc_compiler(compiler):
+    name = os.path.splitext(os.path.basename(compiler))[0].lower()
+    return name in MSVC_COMPILERS
+
+
+def parse_command(args):
+    """解析编译命令，不可缓存时返回None"""
+    args = [str(arg).strip('"') for arg in args]
+    if len(args) < 2:
+        return None
+    args = [args[0]] + expand_response_files(args[1:])
+    compiler = args[0]
+    if is_msvc_compiler(compiler):
+        return _parse_msvc(compiler, args)
+    return _parse_gcc(compiler, args)
+
+
+def _parse_msvc(compiler, args):
+    sources = []
+    output = None
+    compile_only = False
+    rest = []
+    for arg in args[1:]:
+        # MSVC参数可以用 / 或 - 开头
+        lower = '/' + arg[1:].lower() if arg.startswith('-') else arg.lower()
+        if lower == '/c':
+            compile_only = True
+            continue
+        if lower.startswith('/fo'):
+            output = arg[3:]
+            continue
+        if lower.startswith('/fd') or lower == '/fs':
+            # 改用 /Z7 后不再需要PDB
+            continue
+        if lower.startswith(MSVC_UNCACHEABLE_PREFIXES) or lower in MSVC_UNCACHEABLE:
+            return None
+        if lower == '/zi':
+            # /Zi 把调试信息写到共享的PDB中，目标文件无法单独缓存；改为嵌入目标文件的 /Z7
+            rest.append('/Z7')
+            continue
+        if not arg.startswith(('/', '-')) and lower.endswith(SOURCE_EXTENSIONS):
+            sources.append(arg)
+            continue
+        rest.append(arg)
+    if not compile_only or len(sources) != 1:
+        return None
+    source = sources[0]
+    # MSVC路径可能混用 \ 和 /
+    stem = ntpath.splitext(ntpath.basename(source))[0] + '.obj'
+    if not output:
+        output = stem
+    elif output.endswith(('\\', '/')):
+        output += stem
+    elif os.path.isdir(output):
+        output = os.path.join(output, stem)
+    return CompileCommand(
+        compiler,
+        [compiler, '/c', source, '/Fo' + output] + rest,
+        source, output,
+        [compiler, '/E', source] + rest,
+        rest)
+
+
+def _parse_gcc(compiler, args):
+    sources = []
+    output = None
+    compile_only = False
+    rest = []
+    i = 1
+    while i < len(args):
+        arg = args[i]
+        if arg == '-c':
+            compile_only = True
+        elif arg == '-o' and i + 1 < len(args):
+            output = args[i + 1]
+            i += 1
+        elif arg.startswith('-o') and len(arg) > 2:
+            output = arg[2:]
+        elif arg in GCC_UNCACHEABLE:
+            return None
+        elif not arg.startswith('-') and arg.lower().endswith(SOURCE_EXTENSIONS):
+            sources.append(arg)
+        else:
+            rest.append(arg)
+        i += 1
+    if not compile_only or len(sources) != 1:
+        return None
+    source = sources[0]
+    output = output or os.path.splitext(os.path.basename(source))[0] + '.o'
+    return CompileCommand(
+        compiler,
+        [compiler, '-c', source, '-o', output] + rest,
+        source, output,
+        [compiler, '-E', source] + rest,
+        rest)
+
+
+def _run_compiler(args, env=None, cwd=None):
+    return subprocess.run(args, capture_output=True, text=True, errors='replace', env=env, cwd=cwd)
+
+
+class ObjectCache:
+    """内容寻址的目标文件缓存"""
+
+    def __init__(self, cache_dir=None, max_size=None, enabled=None):
+        self.cache_dir = cache_dir or os.environ.get('OBJECT_CACHE_DIR') or DEFAULT_CACHE_DIR
+        if max_size is None:
+            max_size = float(os.environ.get('OBJECT_CACHE_SIZE', 0)) * 1024 ** 3 or DEFAULT_MAX_SIZE
+        self.max_size = int(max_size)
+        if enabled is None:
+            enabled = os.environ.get('OBJECT_CACHE', '1') != '0'
+        self.enabled = enabled
+        self.stats = {'hit': 0, 'miss': 0, 'uncacheable': 0}
+        # 编译器路径 -> 标识（同一进程内只stat一次）
+        self._compiler_ids = {}
+        # 每个线程最近一次编译的缓存状态（build_trace 记录到trace事件中）
+        self._local = threading.local()
+        # 缓存总大小的估计值（第一次写入时扫描得到，之后累加本进程写入的大小）
+        self._total_size = None
+        self._evict_lock = threading.Lock()
+
+    def _compiler_identity(self, compiler, env):
+        path = shutil.which(compiler, path=(env or os.environ).get('PATH')) or compiler
+        if path not in self._compiler_ids:
+            try:
+                st = os.stat(path)
+                identity = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+            except OSError:
+                identity = compiler
+            self._compiler_ids[path] = identity
+        return self._compiler_ids[path]
+
+    def cache_key(self, command, env=None, cwd=None):
+        """计算缓存键：预处理输出按块读取并哈希，不在内存中保存整个输出
+
+        预处理失败时返回None（交给编译器报告错误）
+        """
+        digest = hashlib.sha256()
+        digest.update(f"v{CACHE_VERSION}\0".encode())
+        digest.update(self._compiler_identity(command.compiler, env).encode('utf-8'))
+        digest.update(b'\0' + '\0'.join(command.key_args).encode('utf-8'))
+        # cl 还会从 CL / _CL_ 环境变量读取额外参数
+        for var in ('CL', '_CL_'):
+            digest.update(b'\0' + (env or os.environ).get(var, '').encode('utf-8'))
+        try:
+            proc = subprocess.Popen(command.preprocess_args, stdout=subprocess.PIPE,
+                                    stderr=subprocess.DEVNULL, env=env, cwd=cwd)
+        except OSError:
+            return None
+        for chunk in iter(lambda: proc.stdout.read(1024 * 1024), b''):
+            digest.update(chunk)
+        proc.stdout.close()
+        if proc.wait() != 0:
+            return None
+        return digest.hexdigest()
+
+    def _entry_paths(self, key):
+        bucket = os.path.join(self.cache_dir, key[:2])
+        return os.path.join(bucket, key + '.obj'), os.path.join(bucket, key + '.json')
+
+    def _lookup(self, key, output):
+        obj_path, meta_path = self._entry_paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+            tmp_path = output + '.tmp'
+            shutil.copyfile(obj_path, tmp_path)
+            os.replace(tmp_path, output)
+            # 更新使用时间（LRU）
+            os.utime(meta_path)
+            return meta
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, key, output, stdout, stderr):
+        obj_path, meta_path = self._entry_paths(key)
+        bucket = os.path.dirname(obj_path)
+        try:
+            os.makedirs(bucket, exist_ok=True)
+            # 先写目标文件，最后写元数据（元数据存在即表示条目完整）
+            tmp_path = f"{obj_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            shutil.copyfile(output, tmp_path)
+            os.replace(tmp_path, obj_path)
+            size = os.path.getsize(obj_path)
+            tmp_path = f"{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'stdout': stdout, 'stderr': stderr, 'size': size}, f)
+            os.replace(tmp_path, meta_path)
+        except OSError as e:
+            print(f"[WARN] 无法写入编译缓存: {e}")
+            return
+        self._account(key, size)
+
+    def _scan_entries(self):
+        """全部缓存条目 [(使用时间, 键, 大小), ...]"""
+        entries = []
+        try:
+            buckets = [entry.path for entry in os.scandir(self.cache_dir) if entry.is_dir()]
+        except OSError:
+            return entries
+        for bucket in buckets:
+            try:
+                with os.scandir(bucket) as it:
+                    for entry in it:
+                        if not entry.name.endswith('.json'):
+                            continue
+                        key = entry.name[:-5]
+                        try:
+                            size = os.path.getsize(os.path.join(bucket, key + '.obj'))
+                            entries.append((entry.stat().st_mtime, key, size))
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+        return entries
+
+    def _account(self, key, size):
+        """记录新写入的条目；估计的总大小超过限额时扫描全部桶，按使用时间从旧到新淘汰
+
+        刚写入的条目不会被淘汰（即使它本身超过限额）
+        """
+        with self._evict_lock:
+            if self._total_size is None:
+                self._total_size = sum(size for _, _, size in self._scan_entries())
+            else:
+                self._total_size += size
+            if self._total_size <= self.max_size:
+                return
+            # 其他进程也可能写入或淘汰，重新扫描得到实际大小
+            entries = sorted(self._scan_entries())
+            total = sum(size for _, _, size in entries)
+            target = int(self.max_size * EVICT_TARGET_RATIO)
+            for _, entry_key, entry_size in entries:
+                if total <= target:
+                    break
+                if entry_key == key:
+                    continue
+                # 先删元数据（条目随即失效），再删目标文件
+                for path in reversed(self._entry_paths(entry_key)):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                total -= entry_size
+            self._total_size = total
+
+    def compile(self, args, env=None, cwd=None, run=None):
+        """编译单个源文件（优先使用缓存）
+
+        run: 实际运行编译器的函数 run(args, env=..., cwd=...)，返回 subprocess.CompletedProcess，
+             默认 subprocess.run 捕获输出（并行编译驱动用它边编译边解析诊断信息）
+        返回 subprocess.CompletedProcess，附加属性 cache_status: 'hit' / 'miss' / 'uncacheable'
+        """
+        args = [str(arg) for arg in args]
+        run = run or _run_compiler
+        command = parse_command(args) if self.enabled else None
+        key = self.cache_key(command, env, cwd) if command else None
+        if key is None:
+            self.stats['uncacheable'] += 1
+            result = run(args, env=env, cwd=cwd)
+            result.cache_status = self._local.status = 'uncacheable'
+            return result
+
+        output = command.output if cwd is None else os.path.join(cwd, command.output)
+        meta = self._lookup(key, output)
+        if meta is not None:
+            self.stats['hit'] += 1
+            result = subprocess.CompletedProcess(command.args, 0, meta['stdout'], meta['stderr'])
+            result.cache_status = self._local.status = 'hit'
+            return result
+
+        self.stats['miss'] += 1
+        result = run(command.args, env=env, cwd=cwd)
+        if result.returncode == 0 and os.path.exists(output):
+            self._store(key, output, result.stdout, result.stderr)
+        result.cache_status = self._local.status = 'miss'
+        return result
+
+    def take_status(self):
+        """当前线程最近一次编译的缓存状态（取出后清空），没有经过缓存时返回 None"""
+        status = getattr(self._local, 'status', None)
+        self._local.status = None
+        return status
+
+    def wrap_spawn(self, spawn):
+        """包装 SCons 的 SPAWN 函数：可缓存的编译命令走缓存，其他命令原样执行"""
+        def cached_spawn(sh, escape, cmd, args, env):
+            if not self.enabled or parse_command(args) is None:
+                return spawn(sh, escape, cmd, args, env)
+            env = {str(k): str(v) for k, v in (env or os.environ).items()}
+            result = self.compile([str(arg).strip('"') for arg in args], env=env)
+            if result.stdout:
+                sys.stdout.write(result.stdout)
+            if result.stderr:
+                sys.stderr.write(result.stderr)
+            return result.returncode
+        return cached_spawn
+
+    def summary(self):
+        size = 0
+        entries = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.obj'):
+                    entries += 1
+                    size += os.path.getsize(os.path.join(root, name))
+        return (f"编译缓存 {self.cache_dir}: {entries} 个目标文件, "
+                f"{size / 1024 / 1024:.1f}MB / {self.max_size / 1024 ** 3:.1f}GB, "
+                f"本次命中 {self.stats['hit']}, 未命中 {self.stats['miss']}, "
+                f"不可缓存 {self.stats['uncacheable']}")
+
+
+if __name__ == "__main__":
+    # 用法:
+    #   python object_cache.py <编译器> [参数...]   —— 作为编译器启动器使用
+    #   python object_cache.py --stats             —— 显示缓存大小
+    if len(sys.argv) < 2:
+        print("用法: python object_cache.py <编译器> [参数...] | --stats")
+        sys.exit(1)
+    cache = ObjectCache()
+    if sys.argv[1] == '--stats':
+        print(cache.summary())
+        sys.exit(0)
+    result = cache.compile(sys.argv[1:])
+    sys.stdout.write(result.stdout)
+    sys.stderr.write(result.stderr)
+    sys.exit(result.returncode)
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PE导入表解析
+纯Python读取 EXE/DLL 的导入表和延迟导入表（mmap映射，不依赖 dumpbin），
+并计算可执行文件的DLL传递闭包；Windows 和 Linux 构建机上都可以运行
+"""
+
+import os
+import sys
+import mmap
+import struct
+from collections import deque
+
+MACHINE_NAMES = {
+    0x014c: "32位 (x86)",
+    0x8664: "64位 (x64)",
+    0xaa64: "64位 (ARM64)",
+}
+
+PE32_MAGIC = 0x10b
+PE32_PLUS_MAGIC = 0x20b
+
+IMPORT_DIRECTORY = 1
+DELAY_IMPORT_DIRECTORY = 13
+
+# API Set 虚拟DLL由系统加载器解析，不是真实文件
+API_SET_PREFIXES = ('api-ms-win-', 'ext-ms-')
+
+# 防止损坏文件导致死循环
+MAX_DESCRIPTORS = 4096
+MAX_THUNKS = 65536
+
+
+class PEFormatError(ValueError):
+    """不是有效的PE文件或导入表已损坏"""
+
+
+class PEFile:
+    """PE文件（只解析导入相关的结构）
+
+    data 可以是 bytes 或 mmap，便于用合成数据测试
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self._parse_headers()
+
+    @classmethod
+    def open(cls, path):
+        """mmap方式打开文件，返回 (PEFile, 需要关闭的对象)"""
+        f = open(path, 'rb')
+        try:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise PEFormatError(f"空文件: {path}")
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            f.close()
+            raise
+        try:
+            return cls(data), (data, f)
+        except Exception:
+            data.close()
+            f.close()
+            raise
+
+    def _unpack(self, fmt, offset):
+        size = struct.calcsize(fmt)
+        if offset < 0 or offset + size > len(self.data):
+            raise PEFormatError(f"读取越界: 偏移 0x{offset:x}")
+        return struct.unpack_from(fmt, self.data, offset)
+
+    def _parse_headers(self):
+        if len(self.data) < 64 or self.data[:2] != b'MZ':
+            raise PEFormatError("无效的EXE文件（缺少MZ头）")
+        pe_offset = self._unpack('<I', 0x3c)[0]
+        if self._unpack('<4s', pe_offset)[0] != b'PE\x00\x00':
+            raise PEFormatError("无效的PE文件（缺少PE签名）")
+
+        file_header = pe_offset + 4
+        (self.machine, section_count, _, _, _,
+         optional_size, self.characteristics) = self._unpack('<HHIIIHH', file_header)
+
+        optional = file_header + 20
+        self.magic = self._unpack('<H', optional)[0]
+        if self.magic == PE32_MAGIC:
+            self.image_base = self._unpack('<I', optional + 28)[0]
+            self.size_of_headers = self._unpack('<I', optional + 60)[0]
+            dir_count_offset = optional + 92
+        elif self.magic == PE32_PLUS_MAGIC:
+            self.image_base = self._unpack('<Q', optional + 24)[0]
+            self.size_of_headers = self._unpack('<I', optional + 60)[0]
+            dir_count_offset = optional + 108
+        else:
+            raise PEFormatError(f"未知的可选头类型: 0x{self.magic:x}")
+
+        dir_count = min(self._unpack('<I', dir_count_offset)[0], 16)
+        self.data_directories = [
+            self._unpack('<II', dir_count_offset + 4 + i * 8) for i in range(dir_count)
+        ]
+
+        self.sections = []
+        section_offset = optional + optional_size
+        for i in range(section_count):
+            name, virtual_size, virtual_address, raw_size, raw_pointer = \
+                self._unpack('<8sIIII', section_offset + i * 40)
+            self.sections.append((virtual_address, max(virtual_size, raw_size), raw_pointer, raw_size))
+
+    @property
+    def is_64bit(self):
+        return self.magic == PE32_PLUS_MAGIC
+
+    @property
+    def machine_name(self):
+        return MACHINE_NAMES.get(self.machine, f"未知架构: 0x{self.machine:04x}")
+
+    def rva_to_offset(self, rva):
+        """相对虚拟地址转换为文件偏移"""
+        if rva < self.size_of_headers:
+            return rva
+        for virtual_address, virtual_size, raw_pointer, raw_size in self.sections:
+            if virtual_address <= rva < virtual_address + virtual_size:
+                delta = rva - virtual_address
+                if delta >= raw_size:
+                    raise PEFormatError(f"RVA 0x{rva:x} 位于未初始化数据中")
+                return raw_pointer + delta
+        raise PEFormatError(f"RVA 0x{rva:x} 不属于任何节")
+
+    def _read_cstring(self, rva, limit=512):
+        offset = self.rva_to_offset(rva)
+        end = self.data.find(b'\x00', offset, offset + limit)
+        if end < 0:
+            raise PEFormatError(f"字符串未结束: RVA 0x{rva:x}")
+        return bytes(self.data[offset:end]).decode('ascii', errors='replace')
+
+    def _directory(self, index):
+        if index >= len(self.data_directories):
+            return 0, 0
+        return self.data_directories[index]
+
+    def _read_thunks(self, rva):
+        """读取导入名称表，返回函数名列表（按序号导入时为 '#序号'）"""
+        if not rva:
+            return []
+        fmt, flag = ('<Q', 1 << 63) if self.is_64bit else ('<I', 1 << 31)
+        step = struct.calcsize(fmt)
+        offset = self.rva_to_offset(rva)
+        names = []
+        for _ in range(MAX_THUNKS):
+            value = self._unpack(fmt, offset)[0]
+            if value == 0:
+                break
+            if value & flag:
+                names.append(f"#{value & 0xffff}")
+            else:
+                names.append(self._read_cstring((value & 0x7fffffff) + 2))
+            offset += step
+        return names
+
+    def imports(self, with_functions=False):
+        """普通导入表：返回 {DLL名: [函数名...]}，with_functions=False 时列表为空"""
+        rva, size = self._directory(IMPORT_DIRECTORY)
+        result = {}
+        if not rva:
+            return result
+        offset = self.rva_to_offset(rva)
+        for i in range(MAX_DESCRIPTORS):
+            original_thunk, _, _, name_rva, first_thunk = self._unpack('<IIIII', offset + i * 20)
+            if name_rva == 0 and first_thunk == 0:
+                break
+            dll = self._read_cstring(name_rva)
+            functions = self._read_thunks(original_thunk or first_thunk) if with_functions else []
+            result.setdefault(dll, []).extend(functions)
+        return result
+
+    def delay_imports(self, with_functions=False):
+        """延迟导入表：返回 {DLL名: [函数名...]}"""
+        rva, size = self._directory(DELAY_IMPORT_DIRECTORY)
+        result = {}
+        if not rva:
+            return result
+        offset = self.rva_to_offset(rva)
+        for i in range(MAX_DESCRIPTORS):
+            (attributes, name_rva, _, iat_rva, int_rva,
+             _, _, _) = self._unpack('<IIIIIIII', offset + i * 32)
+            if name_rva == 0:
+                break
+            # 老式（VC6）描述符中存放的是VA而不是RVA
+            if not attributes & 1:
+                name_rva -= self.image_base
+                int_rva = int_rva - self.image_base if int_rva else 0
+            dll = self._read_cstring(name_rva)
+            functions = self._read_thunks(int_rva) if with_functions else []
+            result.setdefault(dll, []).extend(functions)
+        return result
+
+    def dependencies(self, include_delay=True):
+        """直接依赖的DLL名列表（保持导入表顺序，去重）"""
+        names = list(self.imports())
+        if include_delay:
+            names += [dll for dll in self.delay_imports() if dll not in names]
+        return names
+
+
+def read_dependencies(path, include_delay=True):
+    """读取文件的直接依赖DLL列表"""
+    pe, handles = PEFile.open(path)
+    try:
+        return pe.dependencies(include_delay)
+    finally:
+        for handle in handles:
+            handle.close()
+
+
+def is_api_set(dll_name):
+    return dll_name.lower().startswith(API_SET_PREFIXES)
+
+
+def index_directories(dirs):
+    """列出目录中的文件，返回 {小写文件名: 路径}（前面的目录优先）"""
+    available = {}
+    for directory in dirs:
+        if not os.path.isdir(directory):
+            continue
+        for entry in os.scandir(directory):
+            if entry.is_file():
+                available.setdefault(entry.name.lower(), entry.path)
+    return available
+
+
+def dependency_closure(path, search_dirs=None, include_delay=True, search_exe_dir=True):
+    """计算DLL传递闭包
+
+    path 可以是单个文件，也可以是多个文件（例如程序加上它的插件）
+    查找顺序：第一个文件所在目录（search_exe_dir=False 时跳过），然后是 search_dirs
+    返回 (已找到 {小写DLL名: 路径}, 未找到的DLL名集合, 依赖图 {路径: [DLL名...]})
+    未找到的通常是系统DLL（KERNEL32.dll 等）
+    """
+    roots = [path] if isinstance(path, (str, os.PathLike)) else list(path)
+    roots = [os.path.abspath(str(root)) for root in roots]
+    dirs = [os.path.dirname(roots[0])] if search_exe_dir and roots else []
+    dirs += [str(d) for d in (search_dirs or [])]
+
+    # 每个目录只列一次，之后按小写文件名O(1)查找
+    available = index_directories(dirs)
+
+    resolved = {}
+    unresolved = set()
+    graph = {}
+    queue = deque(roots)
+    while queue:
+        current = queue.popleft()
+        try:
+            deps = read_dependencies(current, include_delay)
+        except (OSError, PEFormatError) as e:
+            print(f"[WARN] 无法解析 {current}: {e}")
+            deps = []
+        graph[current] = deps
+        for dll in deps:
+            key = dll.lower()
+            if key in resolved or is_api_set(key):
+                continue
+            if key in available:
+                resolved[key] = available[key]
+                queue.append(available[key])
+            else:
+                unresolved.add(dll)
+    return resolved, unresolved, graph
+
+
+if __name__ == "__main__":
+    # 用法: python pe_imports.py <exe或dll> [DLL搜索目录]...
+    if len(sys.argv) < 2:
+        print("用法: python pe_imports.py <exe或dll> [DLL搜索目录]...")
+        sys.exit(1)
+    resolved, unresolved, graph = dependency_closure(sys.argv[1], sys.argv[2:])
+    print(f"[INFO] 直接依赖: {', '.join(graph[os.path.abspath(sys.argv[1])]) or '无'}")
+    print(f"[INFO] 传递闭包中找到 {len(resolved)} 个DLL:")
+    for name in sorted(resolved):
+        print(f"  {resolved[name]}")
+    print(f"[INFO] 未找到（系统DLL）{len(unresolved)} 个: {', '.join(sorted(unresolved, key=str.lower))}")
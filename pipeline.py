@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+构建流水线
+把原来依次手动运行的脚本（Qt检测、Conan安装、SConstruct、复制Qt DLL/插件、部署、项目检查）
+组织成一个依赖图，在一个进程中共享工具链索引、conandeps、源码扫描结果和编译环境；
+没有依赖关系的阶段并行执行，例如编译的同时部署Qt运行时，MOC生成的同时检查源文件编码，
+总耗时接近关键路径的耗时
+
+    toolchain ─┬─ msvc_env ──────────────┐
+    conan ─────┼─ moc ───────────────── compile ─┐
+    sources ───┼─ verify                         ├─ check_runtime
+               └─ deploy ────────────────────────┘
+
+某个阶段失败时，依赖它的阶段跳过，其他阶段继续执行
+"""
+
+import os
+import sys
+import time
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from build_trace import BuildTrace, TRACE_FILE_NAME
+from build_history import record_build
+from toolchain_discovery import load_index
+from toolchain_env import capture_environment
+from conandeps_loader import CONANDEPS_FILE, load_conandeps
+from source_discovery import discover_sources
+from moc_cache import MocCache
+from moc_batch import run_moc_batch, default_workers
+from qt_link_set import plan_link_set
+from qt_deploy import QtDeployer, plan_module_deployment
+from pe_imports import dependency_closure, is_api_set
+from command_runner import run_command
+
+PIPELINE_TRACE_FILE = 'pipeline_trace.json'
+DEFAULT_VCVARS = r"D:\Code\VS2022\Community\VC\Auxiliary\Build\vcvars64.bat"
+CONANFILE = 'conanfile.txt'
+# conan install --build=missing 可能编译几个小时，只在这么长时间没有输出时才认为卡住
+CONAN_IDLE_TIMEOUT = 1800
+REQUIRED_FILES = ('conanfile.txt', 'SConstruct', 'src/main.cpp')
+# 固定使用某个Qt版本的构建脚本（SConstruct 中写死了 Qt5.14.2），MOC和部署必须使用同一个Qt
+SCONSTRUCT_QT_VERSIONS = {'SConstruct': '5.14'}
+
+
+class Stage:
+    """流水线中的一个阶段：func(context) 返回 False 或抛出异常表示失败"""
+
+    def __init__(self, name, func, deps=(), description=''):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.description = description
+
+
+class StageResult:
+    def __init__(self, status, start=0.0, elapsed=0.0, error=None):
+        # 'ok' / 'failed' / 'skipped'
+        self.status = status
+        self.start = start
+        self.elapsed = elapsed
+        self.error = error
+
+
+class Pipeline:
+    """按依赖关系并行执行的阶段集合"""
+
+    def __init__(self, trace=None):
+        self.stages = {}
+        self.trace = trace or BuildTrace('pipeline')
+
+    def add(self, name, func, deps=(), description=''):
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"阶段 {name} 依赖的阶段 {dep} 还没有定义")
+        self.stages[name] = Stage(name, func, deps, description)
+
+    def closure(self, targets=None):
+        """目标阶段及其全部依赖（按定义顺序）"""
+        if not targets:
+            return list(self.stages)
+        needed = set()
+        stack = list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in self.stages:
+                raise ValueError(f"未知阶段: {name}")
+            if name not in needed:
+                needed.add(name)
+                stack.extend(self.stages[name].deps)
+        return [name for name in self.stages if name in needed]
+
+    def _run_stage(self, stage, context):
+        start = time.perf_counter()
+        with self.trace.phase(stage.name, category='stage'):
+            try:
+                ok = stage.func(context) is not False
+                error = None if ok else '返回失败'
+            except Exception as e:
+                ok = False
+                error = f"{type(e).__name__}: {e}"
+        return StageResult('ok' if ok else 'failed', start, time.perf_counter() - start, error)
+
+    def run(self, context, targets=None, max_workers=None):
+        """执行目标阶段（默认全部），返回 {阶段名: StageResult}"""
+        names = self.closure(targets)
+        results = {}
+        running = {}
+        pending = list(names)
+        workers = max_workers or len(names) or 1
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while pending or running:
+                for name in list(pending):
+                    deps = [results.get(dep) for dep in self.stages[name].deps]
+                    if any(dep is not None and dep.status != 'ok' for dep in deps):
+                        pending.remove(name)
+                        results[name] = StageResult('skipped')
+                        print(f"[WARN] 跳过阶段 {name}: 依赖的阶段没有成功")
+                    elif all(dep is not None for dep in deps):
+                        pending.remove(name)
+                        print(f"[INFO] 开始阶段 {name}")
+                        running[executor.submit(self._run_stage, self.stages[name], context)] = name
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    results[name] = future.result()
+                    result = results[name]
+                    if result.status == 'ok':
+                        print(f"[OK] 阶段 {name} 完成 ({result.elapsed:.2f}秒)")
+                    else:
+                        print(f"[ERROR] 阶段 {name} 失败 ({result.elapsed:.2f}秒): {result.error}")
+        return results
+
+    def critical_path(self, results):
+        """按各阶段耗时计算的最长依赖链，返回 (阶段列表, 秒数)"""
+        finish = {}
+        previous = {}
+        for name in self.stages:
+            result = results.get(name)
+            if result is None or result.status == 'skipped':
+                continue
+            best = max((dep for dep in self.stages[name].deps if dep in finish),
+                       key=lambda dep: finish[dep], default=None)
+            finish[name] = (finish[best] if best else 0.0) + result.elapsed
+            previous[name] = best
+        if not finish:
+            return [], 0.0
+        name = max(finish, key=finish.get)
+        total = finish[name]
+        path = []
+        while name:
+            path.append(name)
+            name = previous[name]
+        return list(reversed(path)), total
+
+    def summary(self, results, wall):
+        lines = [f"{'阶段':<16}{'状态':<10}{'耗时(秒)':>10}"]
+        for name in self.stages:
+            if name in results:
+                result = results[name]
+                lines.append(f"{name:<16}{result.status:<10}{result.elapsed:>10.2f}")
+        path, total = self.critical_path(results)
+        lines.append(f"关键路径: {' -> '.join(path)} ({total:.2f}秒), 实际总耗时 {wall:.2f}秒, "
+                     f"各阶段合计 {sum(r.elapsed for r in results.values()):.2f}秒")
+        return '\n'.join(lines)
+
+
+class PipelineContext:
+    """各阶段共享的状态：前面的阶段写入，后面的阶段读取（依赖关系保证顺序）"""
+
+    def __init__(self, project_root, sconstruct='SConstruct', scons_args=(), conan=True, trace=None):
+        self.project_root = os.path.abspath(str(project_root))
+        self.src_dir = os.path.join(self.project_root, 'src')
+        self.obj_dir = os.path.join(self.project_root, 'obj')
+        self.bin_dir = os.path.join(self.project_root, 'bin')
+        self.sconstruct = sconstruct
+        self.scons_args = list(scons_args)
+        self.run_conan = conan
+        self.trace = trace
+        self.index = None
+        self.vs_env = None
+        self.conandeps = None
+        self.qt = None
+        self.source_tree = None
+        # 由 deploy 阶段部署运行时（此时 SConstruct 中的部署关闭，避免两边同时写 bin 目录）
+        self.owns_deploy = False
+
+    @property
+    def qt_root(self):
+        return self.qt['base_path'] if self.qt else None
+
+    @property
+    def qt_major(self):
+        return self.qt['major'] if self.qt else 6
+
+
+# ---- 阶段 ----
+
+def stage_toolchain(ctx):
+    """读取工具链索引（Qt安装和MSVC工具集，目录未变化时直接使用缓存）"""
+    ctx.index = load_index()
+    print(f"[INFO] 工具链索引: {len(ctx.index.qt_installations)} 个Qt安装, "
+          f"{len(ctx.index.msvc_toolsets)} 个MSVC工具集")
+
+
+def stage_msvc_env(ctx):
+    """vcvars64 环境快照"""
+    toolset = ctx.index.find_msvc()
+    vcvars = toolset['vcvars'] if toolset and toolset['vcvars'] else DEFAULT_VCVARS
+    if not os.path.exists(vcvars):
+        print(f"[WARN] 找不到vcvars64.bat，使用当前环境: {vcvars}")
+        ctx.vs_env = dict(os.environ)
+        return
+    ctx.vs_env = capture_environment(vcvars).environ()
+
+
+def _conan_is_current(ctx):
+    conanfile = os.path.join(ctx.project_root, CONANFILE)
+    conandeps = os.path.join(ctx.project_root, CONANDEPS_FILE)
+    if not os.path.exists(conandeps):
+        return False
+    return not os.path.exists(conanfile) or os.path.getmtime(conandeps) >= os.path.getmtime(conanfile)
+
+
+def stage_conan(ctx):
+    """conanfile.txt 比 SConscript_conandeps 新时运行 conan install，然后读取 conandeps"""
+    if ctx.run_conan and not _conan_is_current(ctx):
+        cmd = ['conan', 'install', '.', '--build=missing']
+        log_path = os.path.join(ctx.obj_dir, 'logs', 'conan_install.log')
+        print(f"[CMD] {' '.join(cmd)}  (日志: {log_path})")
+        result = run_command(cmd, cwd=ctx.project_root, idle_timeout=CONAN_IDLE_TIMEOUT, log_path=log_path)
+        if not result.ok:
+            print(f"[ERROR] conan install 失败, 返回码 {result.returncode}")
+            return False
+    ctx.conandeps = load_conandeps(os.path.join(ctx.project_root, CONANDEPS_FILE))
+    print(f"[INFO] conandeps: {len(ctx.conandeps.packages)} 个包, Qt {ctx.conandeps.version('qt') or '?'}")
+
+
+def stage_sources(ctx):
+    ctx.source_tree = discover_sources(ctx.src_dir, ctx.obj_dir)
+    print(f"[INFO] 源文件 {len(ctx.source_tree.sources)} 个, 头文件 {len(ctx.source_tree.headers)} 个, "
+          f"需要MOC {len(ctx.source_tree.moc_headers)} 个")
+
+
+def stage_verify(ctx):
+    """项目结构和源文件编码检查（test/verify_project.py 中的检查）"""
+    ok = True
+    for name in REQUIRED_FILES:
+        if not os.path.exists(os.path.join(ctx.project_root, name)):
+            print(f"[ERROR] 文件缺失: {name}")
+            ok = False
+    for path in ctx.source_tree.sources + ctx.source_tree.headers:
+        try:
+            with open(path, 'r', encoding='utf-8-sig') as f:
+                f.read()
+        except UnicodeDecodeError:
+            print(f"[ERROR] 文件编码不是UTF-8: {os.path.relpath(path, ctx.project_root)}")
+            ok = False
+    if ok:
+        print(f"[OK] 项目结构和 {len(ctx.source_tree.sources) + len(ctx.source_tree.headers)} 个源文件编码正确")
+    return ok
+
+
+def _select_qt(ctx):
+    """构建脚本使用的Qt：固定版本的脚本取索引中该版本的安装（没有时返回None），
+    否则conandeps 中的Qt包优先，其次是工具链索引中带 WebEngine 的Qt安装
+    """
+    version = SCONSTRUCT_QT_VERSIONS.get(os.path.basename(ctx.sconstruct))
+    if version:
+        qt = ctx.index.find_qt(version=version)
+        if qt is None:
+            print(f"[WARN] 工具链索引中没有 {ctx.sconstruct} 使用的 Qt {version}")
+        return qt
+    package = ctx.conandeps.package('qt') if ctx.conandeps else None
+    if package and package.binpath:
+        base_path = os.path.dirname(package.binpath[0])
+        for qt in ctx.index.qt_installations:
+            if os.path.normcase(qt['base_path']) == os.path.normcase(base_path):
+                return qt
+    return ctx.index.find_qt(('QtWebEngineWidgets',)) or ctx.index.find_qt()
+
+
+def moc_output(ctx, header):
+    """与 SConstruct 相同的MOC输出文件名（SConstruct: moc_<名>.cpp，SConstruct_local_qt.py: <名>.moc）"""
+    base_name = os.path.splitext(os.path.basename(header))[0]
+    if ctx.sconstruct == 'SConstruct':
+        return os.path.join(ctx.obj_dir, f'moc_{base_name}.cpp')
+    return os.path.join(ctx.obj_dir, f'{base_name}.moc')
+
+
+def stage_moc(ctx):
+    """预先生成MOC文件（SCons 中的MOC步骤随后直接命中MOC缓存）"""
+    ctx.qt = _select_qt(ctx)
+    # 没有找到构建脚本使用的Qt时不能用其他版本的moc（生成的文件与头文件的moc版本不符）
+    moc_exe = ctx.qt and ctx.qt['tools'].get('moc')
+    if not moc_exe:
+        print("[WARN] 没有找到moc，由SCons生成MOC文件")
+        return
+    moc_cache = MocCache(moc_exe, ctx.obj_dir)
+    jobs = [(header, moc_output(ctx, header)) for header in ctx.source_tree.moc_headers]
+    returncode = run_moc_batch(moc_cache, jobs)
+    moc_cache.save()
+    return returncode == 0
+
+
+def stage_compile(ctx):
+    """在vcvars环境快照中运行scons，合并SCons的分阶段计时"""
+    cmd = ['scons', f'-j{default_workers()}']
+    if ctx.sconstruct != 'SConstruct':
+        cmd += ['-f', ctx.sconstruct]
+    cmd += ctx.scons_args
+    if ctx.owns_deploy and not any(arg.startswith('deploy=') for arg in ctx.scons_args):
+        cmd.append('deploy=0')
+    command = subprocess.list2cmdline(cmd)
+    print(f"[CMD] {command}")
+    result = subprocess.run(command, shell=True, cwd=ctx.project_root, env=ctx.vs_env)
+    if ctx.trace is not None:
+        ctx.trace.load_events(os.path.join(ctx.obj_dir, TRACE_FILE_NAME))
+    return result.returncode == 0
+
+
+def stage_deploy(ctx):
+    """按源码推算的Qt模块部署运行时DLL和插件（不需要等待编译完成）
+
+    流水线包含本阶段时 scons 以 deploy=0 运行，部署只在这里进行
+    """
+    ctx.qt = ctx.qt or _select_qt(ctx)
+    if ctx.qt is None:
+        print("[ERROR] 没有找到Qt安装，无法部署运行时")
+        return False
+    # 与 SConstruct_local_qt.py 使用同一个部署名称：bin 目录中的Qt运行时始终是两者中最后一次部署的计划
+    deployer = QtDeployer(ctx.bin_dir, name='local_qt6')
+    link_set = plan_link_set(ctx.source_tree.sources + ctx.source_tree.headers,
+                             [ctx.qt['include_path']], ctx.qt_root, ctx.qt_major)
+    if link_set.unresolved:
+        # 有无法确定模块的头文件时部署全部Qt DLL（copy_qt6_dlls.py 的做法）
+        print(f"[WARN] 无法确定所属模块的头文件: {', '.join(sorted(link_set.unresolved))}，部署全部Qt DLL")
+        dll_names = sorted(name for name in os.listdir(ctx.qt['bin_path'])
+                           if name.startswith(f"Qt{ctx.qt_major}") and name.endswith('.dll'))
+    else:
+        print(f"[INFO] {link_set.summary()}")
+        dll_names = link_set.runtime_dlls()
+    missing = plan_module_deployment(deployer, ctx.qt_root, dll_names)
+    for name in missing:
+        print(f"[WARN] Qt bin目录中没有 {name}")
+    stats = deployer.deploy()
+    return stats['failed'] == 0
+
+
+def stage_check_runtime(ctx):
+    """程序的DLL依赖闭包在 bin 目录中都能找到（系统DLL除外）"""
+    programs = sorted(name for name in os.listdir(ctx.bin_dir) if name.lower().endswith('.exe'))
+    if not programs:
+        print(f"[ERROR] {ctx.bin_dir} 中没有可执行文件")
+        return False
+    system_dir = os.path.join(os.environ.get('SystemRoot', r'C:\Windows'), 'System32')
+    ok = True
+    for name in programs:
+        resolved, unresolved, _ = dependency_closure(os.path.join(ctx.bin_dir, name))
+        missing = sorted(dll for dll in unresolved
+                         if not is_api_set(dll) and not os.path.isfile(os.path.join(system_dir, dll)))
+        if missing:
+            print(f"[ERROR] {name} 缺少DLL: {', '.join(missing)}")
+            ok = False
+        else:
+            print(f"[OK] {name}: {len(resolved)} 个DLL都已部署")
+    return ok
+
+
+def create_pipeline(trace=None):
+    pipeline = Pipeline(trace)
+    pipeline.add('toolchain', stage_toolchain, description='Qt/MSVC工具链索引')
+    pipeline.add('msvc_env', stage_msvc_env, ['toolchain'], 'vcvars环境快照')
+    pipeline.add('conan', stage_conan, description='conan install（需要时）并读取conandeps')
+    pipeline.add('sources', stage_sources, description='扫描源码目录')
+    pipeline.add('verify', stage_verify, ['sources'], '项目结构和文件编码检查')
+    pipeline.add('moc', stage_moc, ['toolchain', 'conan', 'sources'], '生成MOC文件')
+    pipeline.add('compile', stage_compile, ['msvc_env', 'conan', 'moc'], 'scons编译')
+    pipeline.add('deploy', stage_deploy, ['toolchain', 'conan', 'sources'], '部署Qt运行时DLL和插件')
+    pipeline.add('check_runtime', stage_check_runtime, ['compile', 'deploy'], '检查程序的DLL依赖')
+    return pipeline
+
+
+def run_pipeline(project_root, targets=None, sconstruct='SConstruct', scons_args=(), conan=True):
+    """运行流水线，返回是否全部成功"""
+    trace = BuildTrace('pipeline.py')
+    pipeline = create_pipeline(trace)
+    context = PipelineContext(project_root, sconstruct, scons_args, conan, trace)
+    context.owns_deploy = 'deploy' in pipeline.closure(targets)
+    start = time.perf_counter()
+    print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] 开始构建流水线")
+    results = pipeline.run(context, targets)
+    success = all(result.status == 'ok' for result in results.values())
+
+    print(f"\n[INFO] 流水线汇总:")
+    print(pipeline.summary(results, time.perf_counter() - start))
+    trace.finish(context.obj_dir, PIPELINE_TRACE_FILE)
+    record_build(trace, 'pipeline.py', success)
+    return success
+
+
+if __name__ == "__main__":
+    # 用法: python pipeline.py [阶段...] [-f SConstruct文件] [--no-conan] [scons参数 key=value...]
+    #       python pipeline.py --list   —— 列出所有阶段和依赖
+    args = sys.argv[1:]
+    if '--list' in args:
+        for stage in create_pipeline().stages.values():
+            print(f"{stage.name:<16}{stage.description:<28}依赖: {', '.join(stage.deps) or '-'}")
+        sys.exit(0)
+    sconstruct = 'SConstruct'
+    if '-f' in args:
+        i = args.index('-f')
+        sconstruct = args[i + 1]
+        del args[i:i + 2]
+    conan = '--no-conan' not in args
+    args = [arg for arg in args if arg != '--no-conan']
+    targets = [arg for arg in args if '=' not in arg]
+    scons_args = [arg for arg in args if '=' in arg]
+    success = run_pipeline(os.path.abspath('.'), targets, sconstruct, scons_args, conan)
+    sys.exit(0 if success else 1)
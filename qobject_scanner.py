@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Q_OBJECT 头文件快速扫描
+用 mmap 映射头文件，找到第一个 Q_OBJECT / Q_GADGET / Q_NAMESPACE 即停止；
+结果按 (修改时间, 大小, 内容哈希) 持久化到索引文件，
+文件未变化时不再读取内容，MOC发现几乎零开销
+"""
+
+import os
+import re
+import sys
+import json
+import mmap
+import hashlib
+
+INDEX_FILE_NAME = '.qobject_index.json'
+INDEX_VERSION = 1
+
+# 需要MOC处理的宏（*_EXPORT 变体归并为基本宏名）
+MOC_MACRO_PATTERN = re.compile(rb'\b(Q_OBJECT|Q_GADGET|Q_NAMESPACE)(?:_EXPORT)?\b')
+
+
+def scan_header(path):
+    """扫描单个头文件，返回找到的第一个MOC宏名，没有则返回 None"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            match = MOC_MACRO_PATTERN.search(data)
+            return match.group(1).decode('ascii') if match else None
+
+
+def _hash_file(path):
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha256(b'').hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return hashlib.sha256(data).hexdigest()
+
+
+class QObjectScanner:
+    """带持久化索引的MOC宏扫描器"""
+
+    def __init__(self, index_dir):
+        self.index_path = os.path.join(str(index_dir), INDEX_FILE_NAME)
+        self.entries = self._load_index()
+        self.dirty = False
+        self.stats = {'cached': 0, 'rehashed': 0, 'scanned': 0}
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('version') == INDEX_VERSION:
+                return index['entries']
+        except (OSError, ValueError, KeyError):
+            pass
+        return {}
+
+    def save(self):
+        """写回索引，同时清理已删除文件的记录"""
+        stale = [path for path in self.entries if not os.path.exists(path)]
+        for path in stale:
+            del self.entries[path]
+        if not (self.dirty or stale):
+            return
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'entries': self.entries}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+        self.dirty = False
+
+    def macro(self, path):
+        """返回头文件中的MOC宏名（Q_OBJECT / Q_GADGET / Q_NAMESPACE），没有则返回 None"""
+        path = os.path.abspath(str(path))
+        st = os.stat(path)
+        entry = self.entries.get(path)
+
+        # 修改时间和大小都没变：直接使用索引结果
+        if entry and entry['mtime'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            self.stats['cached'] += 1
+            return entry['macro']
+
+        # 只有修改时间变了（例如切换分支后内容相同）：比较内容哈希
+        digest = _hash_file(path)
+        if entry and entry['size'] == st.st_size and entry['hash'] == digest:
+            self.stats['rehashed'] += 1
+            macro = entry['macro']
+        else:
+            self.stats['scanned'] += 1
+            macro = scan_header(path)
+
+        self.entries[path] = {
+            'mtime': st.st_mtime_ns,
+            'size': st.st_size,
+            'hash': digest,
+            'macro': macro,
+        }
+        self.dirty = True
+        return macro
+
+    def needs_moc(self, path):
+        """头文件是否需要MOC处理"""
+        return self.macro(path) is not None
+
+    def moc_headers(self, headers):
+        """从头文件列表中筛选需要MOC处理的头文件"""
+        return [header for header in headers if self.needs_moc(header)]
+
+
+if __name__ == "__main__":
+    # 用法: python qobject_scanner.py <索引目录> <头文件>...
+    if len(sys.argv) < 3:
+        print("用法: python qobject_scanner.py <索引目录> <头文件>...")
+        sys.exit(1)
+    scanner = QObjectScanner(sys.argv[1])
+    for header in sys.argv[2:]:
+        print(f"{scanner.macro(header) or '-':<12} {header}")
+    scanner.save()
+    print(f"[INFO] 索引命中 {scanner.stats['cached']}, 哈希复用 {scanner.stats['rehashed']}, "
+          f"重新扫描 {scanner.stats['scanned']}")
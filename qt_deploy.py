@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Qt运行时增量部署
+为每次部署记录清单（大小、修改时间、内容哈希），只复制有变化的文件，
+复制过程并行执行；源和目标在同一文件系统时优先使用reflink或硬链接，
+并删除上次部署过、本次已不需要的文件
+
+同一目标目录中的所有部署脚本共用一份清单（<目标目录>/.deploy_manifest.json），
+每个文件记录部署它的脚本名称：不同Qt目录中内容相同的文件不会被两边来回复制，
+一个脚本不再需要的文件只有在没有其他脚本需要时才删除
+"""
+
+import os
+import re
+import sys
+import json
+import glob
+import shutil
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+MANIFEST_VERSION = 2
+MANIFEST_FILE_NAME = '.deploy_manifest.json'
+# 改为共用清单之前每个部署名称单独的清单文件，第一次加载时合并
+LEGACY_MANIFEST_PATTERN = '.deploy_*.json'
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Qt模块（去掉Qt5/Qt6前缀的小写名）需要的插件目录
+QT_MODULE_PLUGINS = {
+    'gui': ['platforms', 'imageformats', 'iconengines', 'generic', 'platforminputcontexts'],
+    'widgets': ['styles'],
+    'network': ['tls', 'networkinformation', 'bearer'],
+    'printsupport': ['printsupport'],
+    'sql': ['sqldrivers'],
+    'multimedia': ['multimedia', 'mediaservice', 'audio'],
+    'positioning': ['position'],
+    'qml': ['qmltooling'],
+    'quick': ['scenegraph'],
+}
+
+QT_MODULE_PATTERN = re.compile(r'^qt[56]([a-z0-9]+)\.dll$')
+
+# Linux 上的 FICLONE ioctl（btrfs / xfs 等支持写时复制的文件系统）
+FICLONE = 0x40049409
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _copy_with_hash(src, dst):
+    """复制文件并同时计算哈希，只读一遍源文件"""
+    digest = hashlib.sha256()
+    with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+        for chunk in iter(lambda: fin.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+            fout.write(chunk)
+    shutil.copystat(src, dst)
+    return digest.hexdigest()
+
+
+def _try_reflink(src, dst):
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        import fcntl
+        with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+            fcntl.ioctl(fout.fileno(), FICLONE, fin.fileno())
+        shutil.copystat(src, dst)
+        return True
+    except (ImportError, OSError):
+        if os.path.exists(dst):
+            os.remove(dst)
+        return False
+
+
+def _try_hardlink(src, dst):
+    try:
+        os.link(src, dst)
+        return True
+    except OSError:
+        return False
+
+
+class QtDeployer:
+    """增量部署器
+
+    target_dir: 部署目标目录（通常是bin）
+    name:       部署名称，不同脚本使用不同名称，互不删除对方还需要的文件
+    use_links:  同一文件系统时是否使用reflink/硬链接代替复制
+    """
+
+    def __init__(self, target_dir, name='qt_runtime', use_links=True, workers=None):
+        self.target_dir = os.path.abspath(str(target_dir))
+        self.name = name
+        self.manifest_path = os.path.join(self.target_dir, MANIFEST_FILE_NAME)
+        self.use_links = use_links
+        self.workers = workers or min(32, (os.cpu_count() or 1) * 4)
+        self.plan = {}
+        self.manifest = self._load_manifest()
+        # 本次部署改动过的清单条目（保存时只写回这些条目，其他脚本同时写入的条目保留）
+        self._touched = set()
+        self._lock = threading.Lock()
+
+    def _legacy_manifest_paths(self):
+        return [path for path in glob.glob(os.path.join(self.target_dir, LEGACY_MANIFEST_PATTERN))
+                if os.path.basename(path) != MANIFEST_FILE_NAME]
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == MANIFEST_VERSION:
+                return manifest['files']
+        except (OSError, ValueError, KeyError):
+            pass
+        # 合并旧的按名称分开的清单；同一文件出现在多份清单中时保留任意一条记录，部署时按内容校验
+        files = {}
+        for path in sorted(self._legacy_manifest_paths()):
+            owner = os.path.basename(path)[len('.deploy_'):-len('.json')]
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                if manifest.get('version') != 1:
+                    continue
+                for rel, record in manifest['files'].items():
+                    owners = set(files.get(rel, {}).get('owners', [])) | {owner}
+                    files[rel] = dict(record, owners=sorted(owners))
+            except (OSError, ValueError, KeyError):
+                continue
+        return files
+
+    def _save_manifest(self):
+        os.makedirs(self.target_dir, exist_ok=True)
+        # 重新读取清单，只写回本次改动过的条目
+        files = self._load_manifest()
+        with self._lock:
+            for rel in self._touched:
+                if rel not in self.manifest:
+                    files.pop(rel, None)
+                    continue
+                # 使用者以清单文件中的为准，只改动本部署名称
+                record = dict(self.manifest[rel])
+                owners = set(files.get(rel, {}).get('owners', [])) - {self.name}
+                if self.name in record['owners']:
+                    owners.add(self.name)
+                record['owners'] = sorted(owners)
+                files[rel] = record
+            self._touched = set()
+            self.manifest = files
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'files': files}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+        for path in self._legacy_manifest_paths():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # ---- 部署计划 ----
+
+    def add_file(self, source, rel_target=None):
+        """加入单个文件；rel_target 为相对目标目录的路径，默认使用源文件名"""
+        source = os.path.abspath(str(source))
+        if not os.path.isfile(source):
+            return False
+        rel_target = rel_target or os.path.basename(source)
+        self.plan[os.path.normpath(rel_target)] = source
+        return True
+
+    def add_glob(self, source_dir, pattern, rel_dir=''):
+        """加入源目录中匹配通配符的文件，返回加入的文件数"""
+        count = 0
+        for source in sorted(glob.glob(os.path.join(str(source_dir), pattern))):
+            if self.add_file(source, os.path.join(rel_dir, os.path.basename(source))):
+                count += 1
+        return count
+
+    def add_tree(self, source_dir, rel_dir=''):
+        """递归加入整个目录，返回加入的文件数"""
+        source_dir = os.path.abspath(str(source_dir))
+        count = 0
+        for root, dirs, files in os.walk(source_dir):
+            for file in files:
+                source = os.path.join(root, file)
+                rel = os.path.join(rel_dir, os.path.relpath(source, source_dir))
+                if self.add_file(source, rel):
+                    count += 1
+        return count
+
+    # ---- 执行部署 ----
+
+    def _is_unchanged(self, rel, source, src_stat):
+        """根据清单判断目标文件是否已是最新"""
+        record = self.manifest.get(rel)
+        if not record:
+            return False
+        try:
+            dst_stat = os.stat(os.path.join(self.target_dir, rel))
+        except OSError:
+            return False
+        # 目标文件被改动过，不能相信清单中的哈希
+        if [dst_stat.st_size, dst_stat.st_mtime_ns] != record['target']:
+            return False
+        if record['source'] == source and record['size'] == src_stat.st_size \
+                and record['mtime'] == src_stat.st_mtime_ns:
+            with self._lock:
+                self._own(rel)
+            return True
+        # 源文件只是时间变了（例如重新安装了相同版本）：比较内容哈希
+        if record['size'] == src_stat.st_size and record['hash'] == _hash_file(source):
+            with self._lock:
+                record['source'] = source
+                record['mtime'] = src_stat.st_mtime_ns
+                self._own(rel)
+            return True
+        return False
+
+    def _deploy_one(self, rel, source):
+        src_stat = os.stat(source)
+        if self._is_unchanged(rel, source, src_stat):
+            return 'unchanged', 0
+
+        target = os.path.join(self.target_dir, rel)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # 目标本身就是源文件的硬链接：内容必然一致，只需更新清单
+        if os.path.exists(target) and os.path.samefile(source, target):
+            self._record(rel, source, src_stat, _hash_file(source), target)
+            return 'unchanged', 0
+
+        # 先写临时文件再替换：目标若是硬链接，也不会改写到源文件
+        tmp_target = f"{target}.deploy-{threading.get_ident()}.tmp"
+        if os.path.exists(tmp_target):
+            os.remove(tmp_target)
+
+        method = 'copied'
+        digest = None
+        same_device = self.use_links and src_stat.st_dev == os.stat(os.path.dirname(target)).st_dev
+        if same_device and _try_reflink(source, tmp_target):
+            method = 'reflinked'
+        elif same_device and _try_hardlink(source, tmp_target):
+            method = 'linked'
+        else:
+            digest = _copy_with_hash(source, tmp_target)
+        if digest is None:
+            digest = _hash_file(source)
+        os.replace(tmp_target, target)
+
+        self._record(rel, source, src_stat, digest, target)
+        return method, src_stat.st_size
+
+    def _own(self, rel):
+        """把本部署名称加入条目的使用者（调用方持有锁）"""
+        record = self.manifest[rel]
+        if self.name not in record.get('owners', []):
+            record['owners'] = sorted(set(record.get('owners', [])) | {self.name})
+        self._touched.add(rel)
+
+    def _record(self, rel, source, src_stat, digest, target):
+        dst_stat = os.stat(target)
+        with self._lock:
+            owners = self.manifest.get(rel, {}).get('owners', [])
+            self.manifest[rel] = {
+                'source': source,
+                'size': src_stat.st_size,
+                'mtime': src_stat.st_mtime_ns,
+                'hash': digest,
+                'target': [dst_stat.st_size, dst_stat.st_mtime_ns],
+                'owners': owners,
+            }
+            self._own(rel)
+
+    def _remove_orphans(self):
+        """删除上次由本部署名称部署过、本次计划中已没有、也没有其他部署名称需要的文件"""
+        removed = []
+        for rel in sorted(set(self.manifest) - set(self.plan)):
+            owners = self.manifest[rel].get('owners', [])
+            if self.name not in owners:
+                continue
+            self._touched.add(rel)
+            if len(owners) > 1:
+                self.manifest[rel]['owners'] = [owner for owner in owners if owner != self.name]
+                continue
+            target = os.path.join(self.target_dir, rel)
+            if os.path.isfile(target):
+                os.remove(target)
+                removed.append(rel)
+            del self.manifest[rel]
+            # 清理因此变空的目录
+            parent = os.path.dirname(target)
+            while parent != self.target_dir and os.path.isdir(parent) and not os.listdir(parent):
+                os.rmdir(parent)
+                parent = os.path.dirname(parent)
+        return removed
+
+    def deploy(self, remove_orphans=True, verbose=True):
+        """执行部署，返回统计信息"""
+        stats = {'unchanged': 0, 'copied': 0, 'linked': 0, 'reflinked': 0,
+                 'failed': 0, 'removed': 0, 'bytes': 0}
+        os.makedirs(self.target_dir, exist_ok=True)
+        # 其他脚本可能在本对象创建后部署过
+        self.manifest = self._load_manifest()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self._deploy_one, rel, source): rel
+                       for rel, source in self.plan.items()}
+            for future, rel in futures.items():
+                try:
+                    method, size = future.result()
+                except Exception as e:
+                    stats['failed'] += 1
+                    print(f"[ERROR] 部署失败 {rel}: {e}")
+                    continue
+                stats[method] += 1
+                stats['bytes'] += size
+                if verbose and method != 'unchanged':
+                    print(f"[OK] {method}: {rel}")
+
+        if remove_orphans:
+            for rel in self._remove_orphans():
+                stats['removed'] += 1
+                if verbose:
+                    print(f"[OK] 删除多余文件: {rel}")
+
+        self._save_manifest()
+        if verbose:
+            print(f"[INFO] 部署完成: 未变化 {stats['unchanged']}, 复制 {stats['copied']}, "
+                  f"链接 {stats['linked'] + stats['reflinked']}, 删除 {stats['removed']}, "
+                  f"失败 {stats['failed']}, 传输 {stats['bytes'] / 1024 / 1024:.1f} MB")
+        return stats
+
+
+def qt_module_name(dll_name):
+    """Qt6WebEngineCore.dll -> 'webenginecore'，不是Qt模块时返回 None"""
+    match = QT_MODULE_PATTERN.match(dll_name.lower())
+    return match.group(1) if match else None
+
+
+def _release_plugins(category_dir):
+    """插件目录中的Release版插件（同时存在 xxx.dll 和 xxxd.dll 时跳过后者）"""
+    plugins = sorted(glob.glob(os.path.join(category_dir, '*.dll')))
+    names = {os.path.basename(p).lower() for p in plugins}
+    return [p for p in plugins
+            if not (os.path.basename(p).lower().endswith('d.dll')
+                    and os.path.basename(p).lower()[:-5] + '.dll' in names)]
+
+
+def plan_minimal_deployment(deployer, exe_path, qt_root, extra_search_dirs=None):
+    """按可执行文件的PE导入闭包生成最小部署计划
+
+    只加入程序实际会加载的DLL，再根据闭包中的Qt模块加入对应的插件目录；
+    插件和 QtWebEngineProcess.exe 自身的依赖也会继续计算闭包
+    返回闭包中的Qt模块名集合
+    """
+    from pe_imports import dependency_closure
+
+    qt_bin = os.path.join(str(qt_root), 'bin')
+    search_dirs = [qt_bin] + [str(d) for d in (extra_search_dirs or [])]
+
+    roots = [os.path.abspath(str(exe_path))]
+    modules = set()
+    while True:
+        resolved, unresolved, graph = dependency_closure(roots, search_dirs, search_exe_dir=False)
+        new_roots = []
+        for name, path in resolved.items():
+            deployer.add_file(path, os.path.basename(path))
+            module = qt_module_name(name)
+            if module is None or module in modules:
+                continue
+            modules.add(module)
+            new_roots.extend(_plan_module_runtime(deployer, qt_root, module))
+
+        if not new_roots:
+            break
+        roots.extend(new_roots)
+
+    return modules
+
+
+def plan_module_deployment(deployer, qt_root, dll_names):
+    """按Qt DLL名称列表生成部署计划（不需要可执行文件，例如根据源码推算的链接集合）
+
+    加入 Qt 安装 bin 目录中的这些DLL，以及对应模块的插件和WebEngine运行时；
+    返回没有找到的DLL名称列表
+    """
+    qt_bin = os.path.join(str(qt_root), 'bin')
+    missing = []
+    for dll_name in dll_names:
+        if not deployer.add_file(os.path.join(qt_bin, dll_name)):
+            missing.append(dll_name)
+            continue
+        module = qt_module_name(dll_name)
+        if module:
+            _plan_module_runtime(deployer, qt_root, module)
+    return missing
+
+
+def _plan_module_runtime(deployer, qt_root, module):
+    """模块的插件目录和附带的运行时文件，返回需要继续计算闭包的文件"""
+    roots = []
+    qt_plugins = os.path.join(str(qt_root), 'plugins')
+    for category in QT_MODULE_PLUGINS.get(module, []):
+        for plugin in _release_plugins(os.path.join(qt_plugins, category)):
+            deployer.add_file(plugin, os.path.join('plugins', category, os.path.basename(plugin)))
+            roots.append(plugin)
+    if module == 'webenginecore':
+        roots.extend(_plan_webengine_runtime(deployer, qt_root))
+    return roots
+
+
+def _plan_webengine_runtime(deployer, qt_root):
+    """WebEngine运行时：进程程序、资源包和locale文件，返回需要继续计算闭包的程序"""
+    qt_root = str(qt_root)
+    roots = []
+    for exe_name in ('QtWebEngineProcess.exe',):
+        exe = os.path.join(qt_root, 'bin', exe_name)
+        if deployer.add_file(exe):
+            roots.append(exe)
+    deployer.add_glob(os.path.join(qt_root, 'resources'), '*', 'resources')
+    deployer.add_glob(os.path.join(qt_root, 'translations', 'qtwebengine_locales'), '*.pak',
+                      os.path.join('translations', 'qtwebengine_locales'))
+    return roots
+
+
+if __name__ == "__main__":
+    # 用法: python qt_deploy.py <源目录> <目标目录> [清单名称]
+    #       python qt_deploy.py --minimal <exe> <Qt安装目录>
+    if len(sys.argv) == 4 and sys.argv[1] == '--minimal':
+        deployer = QtDeployer(os.path.dirname(os.path.abspath(sys.argv[2])), name='minimal')
+        modules = plan_minimal_deployment(deployer, sys.argv[2], sys.argv[3])
+        print(f"[INFO] 程序使用的Qt模块: {', '.join(sorted(modules))}")
+        result = deployer.deploy()
+        sys.exit(1 if result['failed'] else 0)
+
+    if len(sys.argv) < 3:
+        print("用法: python qt_deploy.py <源目录> <目标目录> [清单名称]")
+        print("      python qt_deploy.py --minimal <exe> <Qt安装目录>")
+        sys.exit(1)
+    deployer = QtDeployer(sys.argv[2], name=sys.argv[3] if len(sys.argv) > 3 else 'tree')
+    deployer.add_tree(sys.argv[1])
+    result = deployer.deploy()
+    sys.exit(1 if result['failed'] else 0)
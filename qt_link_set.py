@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Qt链接集合
+根据 src/ 中实际包含的Qt头文件（跟随本地头文件）推算需要的Qt模块，加上它们的传递依赖，
+只链接这些模块的库，而不是把 conandeps 的全部 LIBS（Qt6Test、Qt6Sql、d3d12、odbc32 ...）都加上
+
+模块依赖读取 Qt 安装中的 mkspecs/modules/qt_lib_<模块>.pri（QT.<模块>.depends / run_depends），
+读不到时使用内置的常用模块依赖表；头文件属于哪个模块通过列出 include/Qt<模块>/ 目录确定
+"""
+
+import os
+import re
+import sys
+
+from qt_pch import translation_unit_qt_headers
+
+SOURCE_EXTENSIONS = ('.cpp', '.cc', '.cxx', '.h', '.hpp')
+
+# mkspecs 不可用时使用的Qt6公开依赖（只列常用模块）
+QT_MODULE_DEPENDS = {
+    'Core': [],
+    'Gui': ['Core'],
+    'Widgets': ['Core', 'Gui'],
+    'Network': ['Core'],
+    'Xml': ['Core'],
+    'Sql': ['Core'],
+    'Concurrent': ['Core'],
+    'Test': ['Core'],
+    'PrintSupport': ['Core', 'Gui', 'Widgets'],
+    'OpenGL': ['Core', 'Gui'],
+    'OpenGLWidgets': ['Core', 'Gui', 'Widgets', 'OpenGL'],
+    'Svg': ['Core', 'Gui'],
+    'Qml': ['Core', 'Network'],
+    'QmlModels': ['Core', 'Qml'],
+    'Quick': ['Core', 'Gui', 'Qml', 'QmlModels', 'Network'],
+    'WebChannel': ['Core'],
+    'Positioning': ['Core'],
+    'WebEngineCore': ['Core', 'Gui', 'Network', 'WebChannel'],
+    'WebEngineWidgets': ['Core', 'Gui', 'Widgets', 'Network', 'WebEngineCore'],
+}
+
+# 只有静态链接Qt时才需要的系统库（按Qt模块），动态链接Qt时全部不需要
+QT_MODULE_SYSTEM_LIBS = {
+    'Core': ['advapi32', 'authz', 'netapi32', 'ole32', 'shell32', 'user32', 'uuid',
+             'version', 'winmm', 'ws2_32', 'mpr', 'userenv', 'synchronization', 'runtimeobject'],
+    'Gui': ['d3d9', 'd3d11', 'd3d12', 'dxgi', 'dxguid', 'd2d1', 'dwrite', 'dwmapi', 'gdi32',
+            'imm32', 'oleaut32', 'setupapi', 'shcore', 'shlwapi', 'uxtheme', 'wtsapi32'],
+    'Widgets': ['comdlg32', 'dwmapi', 'uxtheme'],
+    'PrintSupport': ['winspool', 'comdlg32'],
+    'Network': ['crypt32', 'dnsapi', 'iphlpapi', 'secur32', 'winhttp'],
+    'Sql': ['odbc32'],
+}
+
+# 应用代码自己也常用的基础系统库，不会被去掉
+BASE_SYSTEM_LIBS = ('kernel32', 'user32', 'gdi32', 'shell32', 'ole32', 'oleaut32', 'advapi32',
+                    'uuid', 'comdlg32')
+
+# 链接所有GUI程序都需要的Qt库（提供 WinMain）
+ALWAYS_LINKED = ('EntryPoint',)
+
+PRI_PATTERN = re.compile(r'^QT\.(\w+)\.(name|depends|run_depends)[ \t]*=[ \t]*(.*)$', re.M)
+
+
+def load_module_info(qt_root):
+    """读取 mkspecs/modules/qt_lib_*.pri，返回 {模块名: {'depends': [...], 'run_depends': [...]}}
+
+    模块名为 Core、WebEngineWidgets 这样的形式，私有模块（xxx_private）并入对应的公开模块
+    """
+    modules_dir = os.path.join(str(qt_root), 'mkspecs', 'modules')
+    try:
+        names = sorted(os.listdir(modules_dir))
+    except OSError:
+        return {}
+
+    raw = {}
+    for file_name in names:
+        if not (file_name.startswith('qt_lib_') and file_name.endswith('.pri')):
+            continue
+        try:
+            with open(os.path.join(modules_dir, file_name), 'r', encoding='utf-8', errors='replace') as f:
+                text = f.read()
+        except OSError:
+            continue
+        for key, field, value in PRI_PATTERN.findall(text):
+            raw.setdefault(key, {})[field] = value.split()
+
+    # QT.webenginewidgets.name = QtWebEngineWidgets -> WebEngineWidgets
+    display = {}
+    for key, fields in raw.items():
+        name = (fields.get('name') or [''])[0]
+        if name.startswith('Qt') and not key.endswith('_private'):
+            display[key] = name[2:]
+
+    def public_name(key):
+        return display.get(key[:-len('_private')] if key.endswith('_private') else key)
+
+    info = {}
+    for key, name in display.items():
+        fields = raw[key]
+        private = raw.get(key + '_private', {})
+        depends = {public_name(dep) for dep in fields.get('depends', []) + private.get('depends', [])}
+        run_depends = {public_name(dep) for dep in fields.get('run_depends', []) + private.get('run_depends', [])}
+        info[name] = {
+            'depends': sorted(dep for dep in depends if dep and dep != name),
+            'run_depends': sorted(dep for dep in run_depends if dep and dep != name),
+        }
+    return info
+
+
+def header_module_index(include_dirs):
+    """{头文件名: 模块名}，来自 include/Qt<模块>/ 目录的内容"""
+    index = {}
+    for include_dir in include_dirs:
+        include_dir = str(include_dir)
+        # CPPPATH 中既可能是 include 也可能直接是 include/QtWidgets
+        candidates = [include_dir]
+        if not os.path.basename(include_dir).startswith('Qt'):
+            try:
+                candidates = [os.path.join(include_dir, name) for name in sorted(os.listdir(include_dir))]
+            except OSError:
+                continue
+        for module_dir in candidates:
+            module_name = os.path.basename(module_dir)
+            if not module_name.startswith('Qt') or not os.path.isdir(module_dir):
+                continue
+            for header in os.listdir(module_dir):
+                index.setdefault(header, module_name[2:])
+    return index
+
+
+def source_files(src_dir):
+    result = []
+    for root, _, files in os.walk(str(src_dir)):
+        result.extend(os.path.join(root, name) for name in sorted(files)
+                      if name.endswith(SOURCE_EXTENSIONS))
+    return result
+
+
+def used_qt_headers(sources):
+    """所有源文件用到的Qt头文件（跟随本地头文件）"""
+    cache = {}
+    headers = set()
+    for source in sources:
+        headers |= translation_unit_qt_headers(source, cache)
+    return headers
+
+
+def _module_closure(modules, info, fields):
+    closure = set()
+    stack = list(modules)
+    while stack:
+        module = stack.pop()
+        if module in closure:
+            continue
+        closure.add(module)
+        if module in info:
+            deps = [dep for field in fields for dep in info[module].get(field, [])]
+        else:
+            deps = QT_MODULE_DEPENDS.get(module, [])
+        stack.extend(deps)
+    return closure
+
+
+class LinkSet:
+    """需要链接的Qt模块"""
+
+    def __init__(self, direct_modules, modules, runtime_modules, unresolved, major=6, has_module_info=False):
+        self.direct_modules = direct_modules
+        self.modules = modules
+        self.runtime_modules = runtime_modules
+        # 在Qt头文件目录中找不到的头文件；非空时调用方应保留完整的库列表
+        self.unresolved = unresolved
+        self.major = major
+        # 依赖来自 mkspecs（包含运行时依赖），而不是内置的依赖表
+        self.has_module_info = has_module_info
+
+    def lib_name(self, module):
+        return f"Qt{self.major}{module}"
+
+    @property
+    def libs(self):
+        """需要链接的Qt库（按模块名排序，最后是 EntryPoint）"""
+        return [self.lib_name(module) for module in sorted(self.modules)] + \
+               [self.lib_name(module) for module in ALWAYS_LINKED]
+
+    @property
+    def defines(self):
+        return [f"QT_{module.upper()}_LIB" for module in sorted(self.modules)]
+
+    def runtime_dlls(self):
+        """运行时需要部署的Qt DLL（包含 run_depends 引入的私有依赖）"""
+        return [f"{self.lib_name(module)}.dll" for module in sorted(self.runtime_modules)]
+
+    def filter_libs(self, libs, qt_is_static=False):
+        """从完整的 LIBS 列表中去掉不需要的Qt库，以及只有静态链接Qt时才需要的系统库"""
+        qt_prefix = f"Qt{self.major}"
+        keep_qt = set(self.libs)
+        needed_system = {lib for module in self.modules for lib in QT_MODULE_SYSTEM_LIBS.get(module, [])}
+        static_only = {lib for module_libs in QT_MODULE_SYSTEM_LIBS.values() for lib in module_libs}
+        static_only -= set(BASE_SYSTEM_LIBS)
+        result = []
+        for lib in libs:
+            if lib.startswith(qt_prefix):
+                if lib in keep_qt:
+                    result.append(lib)
+            elif lib.lower() in static_only:
+                if qt_is_static and lib.lower() in needed_system:
+                    result.append(lib)
+            else:
+                result.append(lib)
+        return result
+
+    def summary(self):
+        return (f"Qt模块 {len(self.modules)} 个 (直接使用: {', '.join(sorted(self.direct_modules))}; "
+                f"链接: {', '.join(sorted(self.modules))})")
+
+
+def plan_link_set(sources, include_dirs, qt_root=None, major=6):
+    """根据源文件的 #include 计算需要链接的Qt模块
+
+    sources: 源文件列表，或源码目录
+    include_dirs: Qt 头文件目录（<qt>/include 或 CPPPATH 中的 include/Qt<模块>）
+    qt_root: Qt 安装目录，用于读取 mkspecs 中的模块依赖
+    """
+    if isinstance(sources, (str, os.PathLike)):
+        sources = source_files(sources)
+    info = load_module_info(qt_root) if qt_root else {}
+    index = header_module_index(include_dirs)
+
+    direct = set()
+    unresolved = set()
+    for header in used_qt_headers(sources):
+        if '/' in header:
+            # <QtWidgets/QWidget>
+            direct.add(header.split('/', 1)[0][2:])
+        elif header in index:
+            direct.add(index[header])
+        else:
+            unresolved.add(header)
+    # 至少需要 Core
+    direct.add('Core')
+
+    modules = _module_closure(direct, info, ('depends',))
+    runtime_modules = _module_closure(direct, info, ('depends', 'run_depends'))
+    return LinkSet(direct, modules, runtime_modules, unresolved, major, bool(info))
+
+
+def qt_is_static(bin_dirs, major=6):
+    """BINPATH 中没有 Qt<major>Core.dll 时认为是静态链接的Qt"""
+    return not any(os.path.isfile(os.path.join(str(d), f"Qt{major}Core.dll")) for d in bin_dirs)
+
+
+if __name__ == "__main__":
+    # 用法: python qt_link_set.py <Qt安装目录> [源码目录]
+    if len(sys.argv) < 2:
+        print("用法: python qt_link_set.py <Qt安装目录> [源码目录]")
+        sys.exit(1)
+    qt_root = sys.argv[1]
+    src_dir = sys.argv[2] if len(sys.argv) > 2 else 'src'
+    link_set = plan_link_set(src_dir, [os.path.join(qt_root, 'include')], qt_root)
+    print(f"[INFO] {link_set.summary()}")
+    print(f"[INFO] LIBS: {' '.join(link_set.libs)}")
+    print(f"[INFO] 运行时DLL: {' '.join(link_set.runtime_dlls())}")
+    if link_set.unresolved:
+        print(f"[WARN] 无法确定所属模块的头文件: {', '.join(sorted(link_set.unresolved))}")
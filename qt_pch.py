@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Qt预编译头
+统计源文件（包括通过本地头文件间接包含）最常用的Qt头文件，生成 obj/qt_pch.h，
+并在SCons环境中启用预编译头：
+  MSVC:      /Yc 生成 qt_pch.pch，其余编译单元 /Yu + /FI 强制包含
+  GCC/Clang: 生成 qt_pch.h.gch，其余编译单元 -include qt_pch.h
+源文件本身不需要修改；生成的头文件内容不变时不重写，避免整个项目重新编译
+"""
+
+import os
+import re
+import sys
+from collections import Counter
+
+PCH_NAME = 'qt_pch'
+
+# 被至少这个比例的编译单元使用的Qt头文件才放入预编译头
+MIN_SHARE = 0.5
+MAX_HEADERS = 40
+
+INCLUDE_PATTERN = re.compile(rb'^[ \t]*#[ \t]*include[ \t]*([<"])([^>"\r\n]+)[>"]', re.M)
+# <QString>、<QtCore/QString>、<QtWebEngineWidgets/qwebengineview.h>
+QT_HEADER_PATTERN = re.compile(r'^(Q[A-Z]\w*|Qt\w+/\w+(\.h)?)$')
+
+
+def is_qt_header(name):
+    return bool(QT_HEADER_PATTERN.match(name))
+
+
+def _read_includes(path, cache):
+    if path not in cache:
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            data = b''
+        cache[path] = [(kind.decode(), name.decode('utf-8', errors='replace').strip())
+                       for kind, name in INCLUDE_PATTERN.findall(data)]
+    return cache[path]
+
+
+def translation_unit_qt_headers(path, cache=None):
+    """一个编译单元用到的Qt头文件集合（跟随 "本地头文件" 递归查找）"""
+    cache = {} if cache is None else cache
+    qt_headers = set()
+    seen = {os.path.abspath(path)}
+    stack = [os.path.abspath(path)]
+    while stack:
+        current = stack.pop()
+        for kind, name in _read_includes(current, cache):
+            if kind == '"':
+                local = os.path.abspath(os.path.join(os.path.dirname(current), name))
+                if local not in seen and os.path.isfile(local):
+                    seen.add(local)
+                    stack.append(local)
+            elif is_qt_header(name):
+                qt_headers.add(name)
+    return qt_headers
+
+
+def select_pch_headers(sources, moc_headers=(), min_share=MIN_SHARE, max_headers=MAX_HEADERS):
+    """选出放入预编译头的Qt头文件（按使用次数排序）
+
+    每个需要MOC的头文件也算一个编译单元（moc_*.cpp 会包含它）
+    """
+    cache = {}
+    units = list(sources) + list(moc_headers)
+    counts = Counter()
+    for unit in units:
+        counts.update(translation_unit_qt_headers(unit, cache))
+    required = max(1, int(len(units) * min_share + 0.999))
+    selected = [name for name, count in counts.items() if count >= required]
+    selected.sort(key=lambda name: (-counts[name], name))
+    return selected[:max_headers]
+
+
+def write_if_changed(path, content):
+    """内容不变时不重写（保持修改时间和SCons签名不变）"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == content:
+                return False
+    except OSError:
+        pass
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return True
+
+
+def write_pch_files(obj_dir, headers):
+    """生成 qt_pch.h 和 qt_pch.cpp，返回 (头文件路径, 源文件路径)"""
+    header_path = os.path.join(obj_dir, PCH_NAME + '.h')
+    source_path = os.path.join(obj_dir, PCH_NAME + '.cpp')
+    lines = [
+        '// 自动生成的Qt预编译头（qt_pch.py），请勿手动修改',
+        '#ifndef QT_PCH_H',
+        '#define QT_PCH_H',
+        '#ifdef __cplusplus',
+    ]
+    lines += [f'#include <{name}>' for name in headers]
+    lines += ['#endif', '#endif', '']
+    write_if_changed(header_path, '\n'.join(lines))
+    # 通过 /FI 强制包含头文件，源文件本身为空
+    write_if_changed(source_path, '// 自动生成：用于 /Yc 生成预编译头\n')
+    return header_path, source_path
+
+
+def is_msvc(env):
+    compiler = os.path.basename(env.subst('$CXX')).lower()
+    return compiler in ('cl', 'cl.exe', 'clang-cl', 'clang-cl.exe')
+
+
+class QtPch:
+    """已配置的预编译头
+
+    objects: 需要一起链接的目标文件（MSVC的 qt_pch.obj）
+    """
+
+    def __init__(self, env, header=None, node=None, objects=None, headers=None):
+        self.env = env
+        self.header = header
+        self.node = node
+        self.objects = objects or []
+        self.headers = headers or []
+
+    @property
+    def enabled(self):
+        return self.node is not None
+
+    def depends(self, objects):
+        """目标文件依赖预编译头（头文件列表变化时重新编译）"""
+        if self.enabled:
+            self.env.Depends(objects, self.node)
+
+
+def setup_qt_pch(env, obj_dir, sources, moc_headers=(), enabled=True):
+    """在SCons环境中启用Qt预编译头，返回 QtPch"""
+    if not enabled:
+        print("[INFO] 预编译头已禁用")
+        return QtPch(env)
+
+    headers = select_pch_headers(sources, moc_headers)
+    if not headers:
+        print("[INFO] 没有足够常用的Qt头文件，不使用预编译头")
+        return QtPch(env)
+
+    header_path, source_path = write_pch_files(obj_dir, headers)
+    print(f"[OK] 预编译头包含 {len(headers)} 个Qt头文件: {header_path}")
+
+    if is_msvc(env):
+        env['PCHSTOP'] = header_path
+        env.Append(CXXFLAGS=[f'/FI{header_path}'])
+        pch, pch_obj = env.PCH(os.path.join(obj_dir, PCH_NAME + '.pch'), source_path)
+        env['PCH'] = pch
+        return QtPch(env, header_path, pch, [pch_obj], headers)
+
+    # GCC/Clang: 与 qt_pch.h 同目录的 qt_pch.h.gch 会被 -include 自动使用
+    env['QT_PCH_FLAGS'] = ['-include', header_path]
+    env.Append(CXXFLAGS=['$QT_PCH_FLAGS'])
+    gch = env.Command(
+        header_path + '.gch', header_path,
+        '$CXX -x c++-header $CXXFLAGS $CCFLAGS $_CCCOMCOM -o $TARGET $SOURCE',
+        QT_PCH_FLAGS=[])
+    return QtPch(env, header_path, gch, [], headers)
+
+
+if __name__ == "__main__":
+    # 用法: python qt_pch.py [src目录]  —— 打印将放入预编译头的Qt头文件
+    from source_discovery import discover_sources
+    src = sys.argv[1] if len(sys.argv) > 1 else 'src'
+    tree = discover_sources(src, 'obj')
+    for name in select_pch_headers(tree.sources, tree.moc_headers):
+        print(name)
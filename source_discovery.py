@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+源码目录统一扫描
+一次 os.scandir 遍历同时得到源文件、头文件和需要MOC的头文件；
+每个目录按修改时间缓存其文件列表，目录没有变化时不再重新列目录
+"""
+
+import os
+import sys
+import json
+
+from qobject_scanner import QObjectScanner
+
+INDEX_FILE_NAME = '.source_index.json'
+INDEX_VERSION = 1
+
+SOURCE_EXTENSIONS = ('.cpp', '.cxx', '.cc')
+HEADER_EXTENSIONS = ('.h', '.hpp')
+
+
+class SourceTree:
+    """一次扫描的结果"""
+
+    def __init__(self, root, sources, headers, moc_headers, rescanned_dirs):
+        self.root = root
+        self.sources = sources
+        self.headers = headers
+        self.moc_headers = moc_headers
+        self.rescanned_dirs = rescanned_dirs
+
+
+def _load_index(index_path, root):
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version') == INDEX_VERSION and index.get('root') == root:
+            return index['dirs']
+    except (OSError, ValueError, KeyError):
+        pass
+    return {}
+
+
+def _save_index(index_path, root, dirs):
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': INDEX_VERSION, 'root': root, 'dirs': dirs}, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, index_path)
+
+
+def _list_dir(path):
+    """列出单个目录：返回 (文件名列表, 子目录名列表)"""
+    files = []
+    subdirs = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.name)
+            elif entry.name.endswith(SOURCE_EXTENSIONS + HEADER_EXTENSIONS):
+                files.append(entry.name)
+    return sorted(files), sorted(subdirs)
+
+
+def discover_sources(src_dir, cache_dir):
+    """扫描源码目录
+
+    src_dir:   源码根目录（递归扫描）
+    cache_dir: 存放目录索引和Q_OBJECT索引的目录（通常是obj目录）
+    """
+    root = os.path.abspath(str(src_dir))
+    cache_dir = str(cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    index_path = os.path.join(cache_dir, INDEX_FILE_NAME)
+    cached_dirs = _load_index(index_path, root)
+
+    dirs = {}
+    sources = []
+    headers = []
+    rescanned = []
+
+    # 每个目录只stat一次；修改时间没变就复用上次的列表
+    stack = [root]
+    while stack:
+        path = stack.pop()
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+
+        rel = os.path.relpath(path, root)
+        entry = cached_dirs.get(rel)
+        if entry is None or entry['mtime'] != mtime:
+            files, subdirs = _list_dir(path)
+            entry = {'mtime': mtime, 'files': files, 'subdirs': subdirs}
+            rescanned.append(rel)
+        dirs[rel] = entry
+
+        for name in entry['files']:
+            full_path = os.path.join(path, name)
+            if name.endswith(SOURCE_EXTENSIONS):
+                sources.append(full_path)
+            else:
+                headers.append(full_path)
+        stack.extend(os.path.join(path, name) for name in reversed(entry['subdirs']))
+
+    if rescanned or set(dirs) != set(cached_dirs):
+        _save_index(index_path, root, dirs)
+
+    sources.sort()
+    headers.sort()
+
+    scanner = QObjectScanner(cache_dir)
+    moc_headers = scanner.moc_headers(headers)
+    scanner.save()
+
+    return SourceTree(root, sources, headers, moc_headers, rescanned)
+
+
+if __name__ == "__main__":
+    # 用法: python source_discovery.py [源码目录] [缓存目录]
+    src = sys.argv[1] if len(sys.argv) > 1 else 'src'
+    cache = sys.argv[2] if len(sys.argv) > 2 else 'obj'
+    tree = discover_sources(src, cache)
+    print(f"[INFO] 源文件 {len(tree.sources)} 个, 头文件 {len(tree.headers)} 个, "
+          f"需要MOC {len(tree.moc_headers)} 个, 重新扫描目录 {len(tree.rescanned_dirs)} 个")
+    for header in tree.moc_headers:
+        print(f"  MOC: {header}")
@@ -7,30 +7,31 @@ Qt6 WebView项目编译脚本
 
 import os
 import sys
-import subprocess
 import time
 import platform
 
+# 项目根目录下的构建辅助模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from build_trace import BuildTrace, TRACE_FILE_NAME
+from build_history import record_build
+import command_runner
+
 def print_header(title):
     """打印标题"""
     print(f"\n{'='*60}")
     print(f"  {title}")
     print(f"{'='*60}")
 
-def run_command(cmd, description, check=True):
-    """运行命令并显示结果"""
+def run_command(cmd, description, check_error=True):
+    """运行命令并显示结果（输出逐行实时显示）"""
     print(f"\n=== {description} ===")
     print(f"执行命令: {cmd}")
     try:
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+        result = command_runner.run_command(cmd)
         print(f"返回码: {result.returncode}")
-        if result.stdout:
-            print(f"输出:\n{result.stdout}")
-        if result.stderr:
-            print(f"错误:\n{result.stderr}")
-        if check and result.returncode != 0:
+        if check_error and not result.ok:
             print(f"命令执行失败，返回码: {result.returncode}")
-        return result.returncode == 0
+        return result.ok
     except Exception as e:
         print(f"执行命令失败: {e}")
         return False
@@ -210,6 +211,7 @@ endif()
 def main():
     """主函数"""
     start_time = time.time()
+    trace = BuildTrace('build_project.py')
     
     print(f"Qt6 WebView项目编译工具")
     print(f"开始时间: {time.strftime('%Y-%m-%d %H:%M:%S')}")
@@ -229,7 +231,11 @@ def main():
     check_build_tools()
     
     # 尝试scons编译
-    scons_success = try_scons_compile()
+    with trace.phase('scons'):
+        scons_success = try_scons_compile()
+    # 合并SCons记录的各编译单元耗时，追加到构建历史
+    trace.load_events(os.path.join("obj", TRACE_FILE_NAME))
+    record_build(trace, "build_project.py", scons_success)
     
     # 如果scons失败，创建替代方案
     if not scons_success:
@@ -1,58 +1,60 @@
 # -*- coding: utf-8 -*-
 """
 检查EXE文件的依赖关系
-使用dumpbin工具检查DLL依赖
+使用纯Python的PE导入表解析（pe_imports.py），不再依赖dumpbin工具
 """
 
-import subprocess
 import os
 import sys
 
-def check_dependencies(exe_path):
-    """检查EXE文件的DLL依赖"""
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pe_imports import PEFile, PEFormatError, dependency_closure
+
+def check_dependencies(exe_path, search_dirs=None):
+    """检查EXE文件的DLL依赖（直接依赖、延迟加载依赖和传递闭包）"""
     
     print("=" * 60)
     print("检查EXE文件依赖关系")
     print("=" * 60)
     
-    # 查找dumpbin工具
-    dumpbin_path = r'D:\Code\VS2022\Community\VC\Tools\MSVC\14.29.30133\bin\HostX64\x64\dumpbin.exe'
+    if not os.path.exists(exe_path):
+        print(f"[ERROR] EXE文件不存在: {exe_path}")
+        return
     
-    if not os.path.exists(dumpbin_path):
-        print(f"[ERROR] dumpbin工具不存在: {dumpbin_path}")
+    try:
+        pe, handles = PEFile.open(exe_path)
+        try:
+            print(f"[INFO] 架构: {pe.machine_name}")
+            imports = pe.imports()
+            delay_imports = pe.delay_imports()
+        finally:
+            for handle in handles:
+                handle.close()
+    except (OSError, PEFormatError) as e:
+        print(f"[ERROR] 检查依赖失败: {e}")
         return
     
-    print(f"[INFO] 使用dumpbin工具: {dumpbin_path}")
+    print("\n" + "=" * 60)
+    print("依赖的DLL文件:")
+    print("=" * 60)
+    for dll in imports:
+        print(f"  {dll}")
+    
+    if delay_imports:
+        print("\n延迟加载的DLL文件:")
+        for dll in delay_imports:
+            print(f"  {dll}")
     
-    # 运行dumpbin命令
-    cmd = f'"{dumpbin_path}" /DEPENDENTS "{exe_path}"'
-    print(f"\n[INFO] 执行命令: {cmd}")
+    resolved, unresolved, graph = dependency_closure(exe_path, search_dirs)
     
-    try:
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True, encoding='utf-8')
-        
-        if result.returncode == 0:
-            print("\n" + "=" * 60)
-            print("依赖的DLL文件:")
-            print("=" * 60)
-            
-            lines = result.stdout.split('\n')
-            in_summary = False
-            
-            for line in lines:
-                line = line.strip()
-                if 'Summary' in line or '依赖项' in line or 'DLL Name' in line:
-                    in_summary = True
-                    continue
-                
-                if in_summary and line:
-                    if '.dll' in line.lower():
-                        print(f"  {line}")
-        else:
-            print(f"[ERROR] dumpbin执行失败: {result.stderr}")
-    except Exception as e:
-        print(f"[ERROR] 检查依赖失败: {e}")
+    print("\n" + "=" * 60)
+    print(f"传递依赖闭包（共 {len(resolved)} 个DLL）:")
+    print("=" * 60)
+    for name in sorted(resolved):
+        print(f"  {resolved[name]}")
+    
+    print(f"\n[INFO] 未在程序目录中找到（系统DLL或缺失）: {', '.join(sorted(unresolved, key=str.lower))}")
 
 if __name__ == '__main__':
-    exe_path = r'E:\GitHub3\cpp\qt_conan_test\bin\QtWebViewApp.exe'
-    check_dependencies(exe_path)
+    exe_path = sys.argv[1] if len(sys.argv) > 1 else r'E:\GitHub3\cpp\qt_conan_test\bin\QtWebViewApp.exe'
+    check_dependencies(exe_path, sys.argv[2:])
@@ -2,42 +2,25 @@
 """
 检查exe文件的位数
 """
-import struct
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pe_imports import PEFile, PEFormatError
 
 def check_exe_architecture(exe_path):
     """
     检查exe文件的位数
     """
     try:
-        with open(exe_path, 'rb') as f:
-            # 读取DOS头
-            dos_header = f.read(64)
-            if dos_header[:2] != b'MZ':
-                return "无效的EXE文件"
-            
-            # 读取PE头偏移
-            pe_offset = struct.unpack('<I', dos_header[60:64])[0]
-            
-            # 跳转到PE头
-            f.seek(pe_offset)
-            
-            # 读取PE签名
-            pe_signature = f.read(4)
-            if pe_signature != b'PE\x00\x00':
-                return "无效的PE文件"
-            
-            # 读取文件头
-            file_header = f.read(20)
-            
-            # 读取机器类型
-            machine = struct.unpack('<H', file_header[0:2])[0]
-            
-            if machine == 0x014c:
-                return "32位 (x86)"
-            elif machine == 0x8664:
-                return "64位 (x64)"
-            else:
-                return f"未知架构: 0x{machine:04x}"
+        pe, handles = PEFile.open(exe_path)
+        try:
+            return pe.machine_name
+        finally:
+            for handle in handles:
+                handle.close()
+    except PEFormatError as e:
+        return str(e)
     except Exception as e:
         return f"错误: {e}"
 
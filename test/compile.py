@@ -8,6 +8,12 @@ import time
 import sys
 import os
 
+# 项目根目录下的构建辅助模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from build_trace import BuildTrace, TRACE_FILE_NAME
+from build_history import record_build
+from toolchain_env import capture_environment
+
 def speak(text):
     """使用TTS播放语音提示"""
     try:
@@ -35,6 +41,7 @@ def main():
     print("=" * 60)
     
     start_time = time.time()
+    trace = BuildTrace('compile.py')
     print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] 开始编译")
     
     # 设置VS2022环境
@@ -44,21 +51,32 @@ def main():
         print(f"[ERROR] VS2022路径不存在: {vs_path}")
         return False
     
+    # vcvars64.bat 只在第一次（或脚本变化时）运行，之后直接使用保存的环境快照
+    try:
+        with trace.phase('toolchain_env'):
+            vs_env = capture_environment(vs_path).environ()
+    except RuntimeError as e:
+        print(f"[ERROR] {e}")
+        return False
+    
     # 清理旧的编译文件
     print("\n[INFO] 清理旧的编译文件...")
     if os.path.exists("obj"):
         import shutil
-        shutil.rmtree("obj")
+        with trace.phase('clean'):
+            shutil.rmtree("obj")
         print("[OK] 已清理obj目录")
     
     # 使用SCons编译
     print("\n[INFO] 使用SCons编译项目...")
     
-    # 先调用vcvars64.bat设置环境，然后运行scons
-    cmd = f'"{vs_path}" && scons -j4'
+    # 在vcvars环境快照中运行scons
+    # objcache=1: 清理obj目录后从编译缓存恢复未变化的目标文件
+    cmd = 'scons -j4 objcache=1'
     print(f"[CMD] {cmd}")
     
-    result = subprocess.run(cmd, shell=True, capture_output=False)
+    with trace.phase('scons'):
+        result = subprocess.run(cmd, shell=True, capture_output=False, env=vs_env)
     
     end_time = time.time()
     elapsed_time = end_time - start_time
@@ -66,6 +84,12 @@ def main():
     print(f"\n[{time.strftime('%Y-%m-%d %H:%M:%S')}] 编译完成")
     print(f"[INFO] 耗时: {elapsed_time:.2f}秒")
     
+    # 合并SCons写出的分阶段计时，输出完整的trace和汇总表
+    trace.load_events(os.path.join("obj", TRACE_FILE_NAME))
+    trace.finish("obj", "compile_trace.json")
+    # 追加到构建历史并与之前的构建比较
+    record_build(trace, "compile.py", result.returncode == 0)
+    
     if result.returncode == 0:
         print("[OK] 编译成功!")
         speak("任务运行完毕，过来看看！")
@@ -10,6 +10,15 @@ import subprocess
 import shutil
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from object_cache import ObjectCache
+from compile_driver import run_compile_batch
+from diagnostics import DiagnosticCollector
+from toolchain_env import capture_environment
+from toolchain_discovery import find_cl
+from conandeps_loader import CONANDEPS_FILE, load_conandeps
+from qt_link_set import plan_link_set, qt_is_static
+
 def setup_vs2022_environment():
     """设置VS2022编译环境"""
     print("🌟 设置VS2022编译环境...")
@@ -34,6 +43,20 @@ def setup_vs2022_environment():
         print("❌ 未找到VS2022安装目录!")
         return False
     
+    # 优先使用vcvars64.bat的环境快照（只在第一次或脚本变化时运行vcvars）
+    vcvars_script = Path(vs_install_dir) / "VC" / "Auxiliary" / "Build" / "vcvars64.bat"
+    if vcvars_script.exists():
+        try:
+            snapshot = capture_environment(vcvars_script)
+            snapshot.apply()
+            print(f"✅ 使用MSVC版本: {snapshot.variables.get('VCToolsVersion', '未知')} (环境快照: {snapshot.path})")
+            os.environ["_CL_"] = "/permissive- /Zc:__cplusplus"
+            os.environ["_CXX_"] = "/permissive- /Zc:__cplusplus"
+            print("✅ VS2022环境设置完成")
+            return True
+        except RuntimeError as e:
+            print(f"⚠️ vcvars64.bat执行失败，改为手动设置环境: {e}")
+    
     # MSVC版本（使用较新的版本）
     msvc_version = "14.44.35207"  # 使用更新的版本
     vc_tools_path = Path(vs_install_dir) / "VC" / "Tools" / "MSVC" / msvc_version
@@ -138,33 +161,18 @@ def compile_with_vs2022():
     print("🌟 加载Conan环境...")
     conan_env_script = project_root / "conanbuildenv-release-x86_64.bat"
     if conan_env_script.exists():
-        # 使用PowerShell设置环境
-        cmd = f"powershell -Command \"& '{conan_env_script}'; Write-Host 'Conan环境已加载'\""
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-        if result.returncode == 0:
+        # 脚本只在第一次或内容变化时运行，变量直接注入当前进程
+        try:
+            capture_environment(conan_env_script).apply()
             print("✅ Conan环境加载成功")
-        else:
-            print(f"⚠️ Conan环境加载警告: {result.stderr}")
-    
-    # 查找编译器
-    cl_exe = None
-    msvc_versions = ["14.44.35207", "14.29.30133"]
+        except RuntimeError as e:
+            print(f"⚠️ Conan环境加载警告: {e}")
     
-    for version in msvc_versions:
-        compiler_paths = [
-            Path(f"D:/Code/VS2022/Community/VC/Tools/MSVC/{version}/bin/Hostx64/x64/cl.exe"),
-            Path(f"C:/Program Files/Microsoft Visual Studio/2022/Community/VC/Tools/MSVC/{version}/bin/Hostx64/x64/cl.exe")
-        ]
-        
-        for compiler_path in compiler_paths:
-            if compiler_path.exists():
-                cl_exe = str(compiler_path)
-                print(f"✅ 找到编译器: {cl_exe}")
-                break
-        if cl_exe:
-            break
-    
-    if not cl_exe:
+    # 查找编译器（工具链索引中版本最高的MSVC工具集，没有时查PATH）
+    cl_exe = find_cl()
+    if cl_exe:
+        print(f"✅ 找到编译器: {cl_exe}")
+    else:
         print("❌ 未找到Visual Studio编译器!")
         return False
     
@@ -211,37 +219,16 @@ def compile_with_vs2022():
             
             print(f"🔧 编译MOC: {cpp_name} -> {obj_name}")
     
-    # 编译所有源文件
+    # 编译所有源文件：MOC文件和普通源文件一起交给并行编译驱动
+    # （未变化的源文件从编译缓存恢复目标文件，遇到第一个错误即停止）
     obj_files = []
+    jobs = []
+    object_cache = ObjectCache()
     
-    # 编译MOC文件
     for cpp_file, obj_file in zip(moc_cpp_files, moc_obj_files):
-        compile_cmd = [
-            cl_exe,
-            '/c', str(cpp_file),
-            '/Fo' + str(obj_file),
-            '/I' + str(src_dir),
-            '/W3',
-            '/EHsc',
-            '/MD',
-            '/Zi',
-            '/Zc:__cplusplus',
-            '/std:c++17',
-            '/permissive-'
-        ]
-        
-        print(f"🔧 {' '.join(compile_cmd)}")
-        result = subprocess.run(compile_cmd, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            print(f"❌ 编译失败: {cpp_file.name}")
-            print(f"错误: {result.stderr}")
-            return False
-        else:
-            print(f"✅ 编译成功: {cpp_file.name}")
-            obj_files.append(obj_file)
+        jobs.append((cpp_file, obj_file))
+        obj_files.append(obj_file)
     
-    # 编译普通源文件
     for source_file in source_files:
         source_path = project_root / source_file
         if not source_path.exists():
@@ -252,62 +239,56 @@ def compile_with_vs2022():
         rel_path = source_path.relative_to(project_root)
         obj_name = str(rel_path).replace('.cpp', '.obj').replace('/', '_')
         obj_file = obj_dir / obj_name
+        jobs.append((source_path, obj_file))
         obj_files.append(obj_file)
-        
-        compile_cmd = [
-            cl_exe,
-            '/c', str(source_path),
-            '/Fo' + str(obj_file),
-            '/I' + str(src_dir),
-            '/W3',
-            '/EHsc',
-            '/MD',
-            '/Zi',
-            '/Zc:__cplusplus',
-            '/std:c++17',
-            '/permissive-'
-        ]
-        
-        print(f"🔧 {' '.join(compile_cmd)}")
-        result = subprocess.run(compile_cmd, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            print(f"❌ 编译失败: {source_file}")
-            print(f"错误: {result.stderr}")
-            return False
-        else:
-            print(f"✅ 编译成功: {source_file}")
+    
+    compile_flags = [
+        '/I' + str(src_dir),
+        '/W3',
+        '/EHsc',
+        '/MD',
+        '/Zi',
+        '/Zc:__cplusplus',
+        '/std:c++17',
+        '/permissive-'
+    ]
+    
+    if run_compile_batch(cl_exe, jobs, compile_flags, object_cache=object_cache) != 0:
+        print("❌ 编译失败!")
+        return False
+    
+    print(f"📦 {object_cache.summary()}")
     
     # 链接所有对象文件
     print(f"\n🔗 链接对象文件...")
     
-    # 获取Qt6库路径
-    qt_libs = []
-    if os.path.exists("SConscript_conandeps"):
+    # 获取Qt6库和库路径（从Conan配置读取，读不到时使用已知库）
+    qt_libs = [
+        'Qt6Core', 'Qt6Gui', 'Qt6Widgets', 'Qt6Network', 'Qt6Sql',
+        'kernel32', 'user32', 'gdi32', 'comdlg32', 'ole32', 'oleaut32',
+        'uuid', 'winmm', 'imm32', 'wininet', 'wsock32', 'ws2_32'
+    ]
+    qt_libpath = []
+    conandeps_path = project_root / CONANDEPS_FILE
+    if conandeps_path.exists():
         try:
-            # 尝试从Conan配置获取库
-            exec("conandeps = {}")
-            with open("SConscript_conandeps", 'r') as f:
-                content = f.read()
-                if '"LIBS"' in content:
-                    # 简化处理，直接使用已知库
-                    qt_libs = [
-                        'Qt6Core', 'Qt6Gui', 'Qt6Widgets', 'Qt6Network', 'Qt6Sql',
-                        'kernel32', 'user32', 'gdi32', 'comdlg32', 'ole32', 'oleaut32',
-                        'uuid', 'winmm', 'imm32', 'wininet', 'wsock32', 'ws2_32'
-                    ]
-        except:
-            qt_libs = [
-                'Qt6Core', 'Qt6Gui', 'Qt6Widgets', 'Qt6Network', 'Qt6Sql',
-                'kernel32', 'user32', 'gdi32', 'comdlg32', 'ole32', 'oleaut32',
-                'uuid', 'winmm', 'imm32', 'wininet', 'wsock32', 'ws2_32'
-            ]
-    else:
-        qt_libs = [
-            'Qt6Core', 'Qt6Gui', 'Qt6Widgets', 'Qt6Network', 'Qt6Sql',
-            'kernel32', 'user32', 'gdi32', 'comdlg32', 'ole32', 'oleaut32',
-            'uuid', 'winmm', 'imm32', 'wininet', 'wsock32', 'ws2_32'
-        ]
+            conandeps = load_conandeps(conandeps_path)
+            if conandeps.aggregate.libs:
+                qt_libs = conandeps.aggregate.libs
+                qt_libpath = conandeps.aggregate.libpath
+                print(f"✅ 从Conan配置读取 {len(qt_libs)} 个库")
+                
+                # 只链接 src/ 实际包含的Qt模块及其依赖
+                qt_package = conandeps.package('qt')
+                qt_root = os.path.dirname(qt_package.cpppath[0]) if qt_package and qt_package.cpppath else None
+                link_set = plan_link_set(src_dir, conandeps.aggregate.cpppath, qt_root)
+                if link_set.unresolved:
+                    print(f"⚠️ 无法确定所属模块的Qt头文件: {', '.join(sorted(link_set.unresolved))}，链接全部库")
+                else:
+                    qt_libs = link_set.filter_libs(qt_libs, qt_is_static(conandeps.aggregate.binpath))
+                    print(f"✅ {link_set.summary()}, 链接 {len(qt_libs)} 个库")
+        except (OSError, ValueError, SyntaxError) as e:
+            print(f"⚠️ 读取Conan配置失败，使用已知库: {e}")
     
     exe_file = bin_dir / "QtWebViewApp.exe"
     
@@ -327,12 +308,21 @@ def compile_with_vs2022():
     for lib in qt_libs:
         link_cmd.append(lib + '.lib')
     
+    # 库路径交给链接器
+    if qt_libpath:
+        link_cmd.append('/link')
+        link_cmd.extend('/LIBPATH:' + path for path in qt_libpath)
+    
     print(f"🔧 {' '.join(link_cmd)}")
     result = subprocess.run(link_cmd, capture_output=True, text=True)
     
     if result.returncode != 0:
         print(f"❌ 链接失败!")
-        print(f"错误: {result.stderr}")
+        # cl/link 的错误在stdout中，解析成结构化诊断（重复的未解析符号只显示一次）
+        collector = DiagnosticCollector()
+        if not collector.feed_result(result, 'link'):
+            print(f"错误: {result.stdout}{result.stderr}")
+        print(collector.summary())
         return False
     else:
         print(f"✅ 链接成功!")
@@ -3,9 +3,11 @@
 复制Qt DLL到bin目录
 """
 import os
-import shutil
 import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from qt_deploy import QtDeployer, plan_minimal_deployment
+
 def copy_qt_dlls():
     """
     复制Qt所需的DLL到bin目录
@@ -71,114 +73,44 @@ def copy_qt_dlls():
         print(f"[ERROR] 目标bin目录不存在: {target_bin_path}")
         return False
     
-    copied_count = 0
-    for dll_name in required_dlls:
-        src_path = os.path.join(qt_bin_path, dll_name)
-        dst_path = os.path.join(target_bin_path, dll_name)
-        
-        if os.path.exists(src_path):
-            # 如果目标文件已存在，先删除
-            if os.path.exists(dst_path):
-                os.remove(dst_path)
-            
-            # 复制文件
-            shutil.copy2(src_path, dst_path)
-            print(f"[OK] 复制: {dll_name}")
-            copied_count += 1
+    deployer = QtDeployer(target_bin_path, name='qt5_runtime')
+    
+    def plan(src_path, rel_target):
+        """加入部署计划，源文件不存在时给出警告"""
+        if deployer.add_file(src_path, rel_target):
+            print(f"[OK] 计划: {rel_target}")
         else:
-            print(f"[WARN] 未找到: {dll_name}")
+            print(f"[WARN] 未找到: {os.path.basename(src_path)}")
+    
+    for dll_name in required_dlls:
+        plan(os.path.join(qt_bin_path, dll_name), dll_name)
     
     # 复制WebEngine进程文件
     print("\n" + "=" * 60)
     print("复制WebEngine进程文件")
     print("=" * 60)
     for exe_name in required_exe:
-        src_path = os.path.join(qt_bin_path, exe_name)
-        dst_path = os.path.join(target_bin_path, exe_name)
-        
-        if os.path.exists(src_path):
-            if os.path.exists(dst_path):
-                os.remove(dst_path)
-            shutil.copy2(src_path, dst_path)
-            print(f"[OK] 复制: {exe_name}")
-            copied_count += 1
-        else:
-            print(f"[WARN] 未找到: {exe_name}")
+        plan(os.path.join(qt_bin_path, exe_name), exe_name)
     
     # 复制资源文件
     print("\n" + "=" * 60)
     print("复制WebEngine资源文件")
     print("=" * 60)
     for resource_name in required_resources:
-        src_path = os.path.join(qt_resources_path, resource_name)
-        dst_path = os.path.join(target_bin_path, resource_name)
-        
-        if os.path.exists(src_path):
-            if os.path.exists(dst_path):
-                os.remove(dst_path)
-            shutil.copy2(src_path, dst_path)
-            print(f"[OK] 复制: {resource_name}")
-            copied_count += 1
-        else:
-            print(f"[WARN] 未找到: {resource_name}")
-    
-    # 创建QtWebEngine进程目录
-    print("\n" + "=" * 60)
-    print("创建WebEngine进程目录")
-    print("=" * 60)
-    webengine_process_dir = os.path.join(target_bin_path, "QtWebEngineProcess.exe")
-    if os.path.exists(webengine_process_dir):
-        print(f"[OK] WebEngine进程文件已存在")
-    else:
-        print(f"[WARN] WebEngine进程文件不存在")
+        plan(os.path.join(qt_resources_path, resource_name), resource_name)
     
     # 复制平台插件
     print("\n" + "=" * 60)
     print("复制平台插件")
     print("=" * 60)
-    
-    # 创建platforms目录
-    platforms_dir = os.path.join(target_bin_path, "platforms")
-    os.makedirs(platforms_dir, exist_ok=True)
-    
-    # 复制qwindows.dll
-    qwindows_src = os.path.join(qt_plugins_path, "platforms", "qwindows.dll")
-    qwindows_dst = os.path.join(platforms_dir, "qwindows.dll")
-    
-    if os.path.exists(qwindows_src):
-        if os.path.exists(qwindows_dst):
-            os.remove(qwindows_dst)
-        shutil.copy2(qwindows_src, qwindows_dst)
-        print(f"[OK] 复制: qwindows.dll")
-        copied_count += 1
-    else:
-        print(f"[WARN] 未找到: qwindows.dll")
-    
-    # 复制WebEngine相关插件
-    print("\n" + "=" * 60)
-    print("复制WebEngine相关插件")
-    print("=" * 60)
-    
-    # 创建qtwebengine目录
-    qtwebengine_dir = os.path.join(target_bin_path, "qtwebengine")
-    os.makedirs(qtwebengine_dir, exist_ok=True)
-    
-    # 复制qtwebengine_resources_100p.pak（已经在资源文件中复制）
-    # 创建qt.conf配置文件
-    qt_conf_path = os.path.join(target_bin_path, "qt.conf")
-    qt_conf_content = "[Paths]\nPlugins=plugins\n"
-    with open(qt_conf_path, 'w', encoding='utf-8') as f:
-        f.write(qt_conf_content)
-    print(f"[OK] 创建: qt.conf")
+    plan(os.path.join(qt_plugins_path, "platforms", "qwindows.dll"),
+         os.path.join("platforms", "qwindows.dll"))
     
     # 复制imageformats插件
     print("\n" + "=" * 60)
     print("复制图片格式插件")
     print("=" * 60)
     
-    imageformats_dir = os.path.join(target_bin_path, "imageformats")
-    os.makedirs(imageformats_dir, exist_ok=True)
-    
     image_plugins = [
         "qjpeg.dll",
         "qsvg.dll",
@@ -187,46 +119,71 @@ def copy_qt_dlls():
     ]
     
     for plugin in image_plugins:
-        src_path = os.path.join(qt_plugins_path, "imageformats", plugin)
-        dst_path = os.path.join(imageformats_dir, plugin)
-        
-        if os.path.exists(src_path):
-            if os.path.exists(dst_path):
-                os.remove(dst_path)
-            shutil.copy2(src_path, dst_path)
-            print(f"[OK] 复制: {plugin}")
-            copied_count += 1
-        else:
-            print(f"[WARN] 未找到: {plugin}")
+        plan(os.path.join(qt_plugins_path, "imageformats", plugin),
+             os.path.join("imageformats", plugin))
     
     # 复制printsupport插件
     print("\n" + "=" * 60)
     print("复制打印支持插件")
     print("=" * 60)
+    plan(os.path.join(qt_plugins_path, "printsupport", "windowsprintersupport.dll"),
+         os.path.join("printsupport", "windowsprintersupport.dll"))
     
-    printsupport_dir = os.path.join(target_bin_path, "printsupport")
-    os.makedirs(printsupport_dir, exist_ok=True)
+    # 执行部署：只复制有变化的文件，删除上次部署过但已不需要的文件
+    print("\n" + "=" * 60)
+    print("执行增量部署")
+    print("=" * 60)
+    stats = deployer.deploy()
     
-    windowsprint_src = os.path.join(qt_plugins_path, "printsupport", "windowsprintersupport.dll")
-    windowsprint_dst = os.path.join(printsupport_dir, "windowsprintersupport.dll")
+    # 创建qtwebengine目录
+    os.makedirs(os.path.join(target_bin_path, "qtwebengine"), exist_ok=True)
     
-    if os.path.exists(windowsprint_src):
-        if os.path.exists(windowsprint_dst):
-            os.remove(windowsprint_dst)
-        shutil.copy2(windowsprint_src, windowsprint_dst)
-        print(f"[OK] 复制: windowsprintersupport.dll")
-        copied_count += 1
-    else:
-        print(f"[WARN] 未找到: windowsprintersupport.dll")
+    # 创建qt.conf配置文件（内容相同时不重写）
+    qt_conf_path = os.path.join(target_bin_path, "qt.conf")
+    qt_conf_content = "[Paths]\nPlugins=plugins\n"
+    existing_conf = None
+    if os.path.exists(qt_conf_path):
+        with open(qt_conf_path, 'r', encoding='utf-8') as f:
+            existing_conf = f.read()
+    if existing_conf != qt_conf_content:
+        with open(qt_conf_path, 'w', encoding='utf-8') as f:
+            f.write(qt_conf_content)
+        print(f"[OK] 创建: qt.conf")
     
     print("=" * 60)
-    print(f"共复制 {copied_count} 个文件")
+    print(f"共更新 {stats['copied'] + stats['linked'] + stats['reflinked']} 个文件, "
+          f"{stats['unchanged']} 个已是最新")
     print("=" * 60)
     
-    return True
+    return stats['failed'] == 0
+
+def copy_qt_dlls_minimal():
+    """
+    最小部署：按QtWebViewApp.exe的PE导入闭包只复制实际会加载的DLL，
+    再加上闭包中Qt模块需要的插件目录
+    """
+    qt_root = r"D:\Code\Qt\Qt5.14.2\5.14.2\msvc2017_64"
+    exe_path = r"E:\GitHub3\cpp\qt_conan_test\bin\QtWebViewApp.exe"
+    
+    print("=" * 60)
+    print("按依赖闭包最小部署Qt运行时")
+    print("=" * 60)
+    
+    if not os.path.exists(exe_path):
+        print(f"[ERROR] EXE文件不存在，请先编译: {exe_path}")
+        return False
+    
+    deployer = QtDeployer(os.path.dirname(exe_path), name='qt5_runtime')
+    modules = plan_minimal_deployment(deployer, exe_path, qt_root)
+    print(f"[INFO] 程序使用的Qt模块: {', '.join(sorted(modules))}")
+    stats = deployer.deploy()
+    return stats['failed'] == 0
 
 if __name__ == "__main__":
-    success = copy_qt_dlls()
+    if "--minimal" in sys.argv:
+        success = copy_qt_dlls_minimal()
+    else:
+        success = copy_qt_dlls()
     if success:
         print("[OK] DLL复制完成！")
         sys.exit(0)
@@ -5,8 +5,15 @@
 
 import subprocess
 import os
+import sys
 import time
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from toolchain_discovery import find_qt
+
+# 程序基于 Qt 5.14.2 构建，必须使用同一版本的windeployqt（其他版本会部署错误的运行时）
+QT_VERSION = '5.14'
+
 def deploy_qt_app():
     """使用windeployqt部署Qt应用"""
     
@@ -14,8 +21,10 @@ def deploy_qt_app():
     print("使用windeployqt部署Qt应用程序")
     print("=" * 60)
     
-    # windeployqt路径
-    windeployqt_path = r'D:\Code\Qt\Qt5.14.2\5.14.2\msvc2017_64\bin\windeployqt.exe'
+    # windeployqt路径（工具链索引中的Qt 5.14 安装，找不到时使用原来的Qt5.14.2路径）
+    qt = find_qt(version=QT_VERSION)
+    windeployqt_path = (qt and qt['tools'].get('windeployqt')) or \
+        r'D:\Code\Qt\Qt5.14.2\5.14.2\msvc2017_64\bin\windeployqt.exe'
     
     # 目标EXE路径
     exe_path = r'E:\GitHub3\cpp\qt_conan_test\bin\QtWebViewApp.exe'
@@ -5,11 +5,13 @@ Qt安装检测和配置工具
 用于自动检测系统中的Qt安装并配置项目
 """
 
-import os
 import sys
 import platform
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from toolchain_discovery import load_index
+
 def detect_qt_installation():
     """检测系统中的Qt安装"""
     print("=" * 60)
@@ -21,79 +23,38 @@ def detect_qt_installation():
         print(f"当前仅支持Windows系统，检测到: {system}")
         return None
     
-    # 可能的Qt安装路径
-    possible_paths = [
-        r"D:\Qt",
-        r"C:\Qt",
-        r"D:\Qt\6.5.0",
-        r"C:\Qt\6.5.0",
-        r"D:\Qt\6.2.0", 
-        r"C:\Qt\6.2.0",
-        r"D:\Qt\5.15.2",
-        r"C:\Qt\5.15.2",
-    ]
-    
+    # 从工具链索引读取Qt安装（候选根目录只并行扫描一次，目录未变化时直接使用缓存）
+    index = load_index()
     found_qt = []
     
-    for qt_path in possible_paths:
-        if os.path.exists(qt_path):
-            print(f"✓ 发现Qt目录: {qt_path}")
-            
-            # 查找版本目录
-            versions = []
-            for item in os.listdir(qt_path):
-                if os.path.isdir(os.path.join(qt_path, item)):
-                    # 检查是否是版本目录
-                    if any(char.isdigit() for char in item) and 'msvc' in item:
-                        versions.append(item)
-                    elif item.replace('.', '').isdigit():  # 纯数字版本号
-                        versions.append(item)
-            
-            if versions:
-                print(f"  包含版本: {', '.join(versions)}")
-                for version in versions:
-                    version_path = os.path.join(qt_path, version)
-                    include_dir = os.path.join(version_path, 'include')
-                    lib_dir = os.path.join(version_path, 'lib')
-                    bin_dir = os.path.join(version_path, 'bin')
-                    
-                    qt_config = {
-                        'base_path': version_path,
-                        'include_path': include_dir,
-                        'lib_path': lib_dir,
-                        'bin_path': bin_dir,
-                        'version': version
-                    }
-                    
-                    # 检查关键目录
-                    checks = [
-                        ('Qt6Core', include_dir, 'Qt6'),
-                        ('QtWidgets', include_dir, 'QtWidgets'),
-                        ('QtWebEngineWidgets', include_dir, 'QtWebEngineWidgets'),
-                        ('Qt5Core', include_dir, 'Qt5Core')
-                    ]
-                    
-                    available_modules = []
-                    for module, inc_dir, prefix in checks:
-                        module_path = os.path.join(inc_dir, prefix)
-                        if os.path.exists(module_path):
-                            available_modules.append(module)
-                    
-                    if available_modules:
-                        qt_config['available_modules'] = available_modules
-                        qt_config['type'] = 'Qt6' if 'Qt6Core' in available_modules else 'Qt5'
-                        found_qt.append(qt_config)
-                        print(f"    版本 {version}: {qt_config['type']}")
-                        print(f"    可用模块: {', '.join(available_modules)}")
-                        print(f"    头文件路径: {include_dir}")
-                        print(f"    库文件路径: {lib_dir}")
-                        print()
+    for qt in sorted(index.qt_installations, key=lambda qt: qt['base_path']):
+        print(f"✓ 发现Qt安装: {qt['base_path']}")
+        
+        # 检查关键模块
+        checks = ['QtCore', 'QtWidgets', 'QtWebEngineWidgets']
+        available_modules = [module for module in checks if module in qt['modules']]
+        
+        qt_config = {
+            'base_path': qt['base_path'],
+            'include_path': qt['include_path'],
+            'lib_path': qt['lib_path'],
+            'bin_path': qt['bin_path'],
+            'version': qt['version'],
+            'available_modules': available_modules,
+            'type': 'Qt6' if qt['major'] >= 6 else 'Qt5'
+        }
+        found_qt.append(qt_config)
+        print(f"    版本 {qt['version']}: {qt_config['type']}")
+        print(f"    可用模块: {', '.join(available_modules)}")
+        print(f"    头文件路径: {qt['include_path']}")
+        print(f"    库文件路径: {qt['lib_path']}")
+        print()
     
     if not found_qt:
         print("✗ 未找到Qt安装")
         print("\n请确保:")
         print("1. 已安装Qt6或Qt5")
-        print("2. Qt安装路径在D:\\Qt或C:\\Qt目录下")
+        print("2. Qt安装路径在D:\\Qt或C:\\Qt目录下（其它目录可用 QT_ROOTS 环境变量指定）")
         print("3. 安装了Qt WebEngine模块（用于WebView功能）")
         return None
     
@@ -7,20 +7,25 @@
 
 import os
 import sys
-import subprocess
 import shutil
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from moc_cache import MocCache
+from moc_batch import run_moc_batch
+from object_cache import ObjectCache
+from diagnostics import DiagnosticCollector
+from toolchain_env import capture_environment
+from toolchain_discovery import default_index, find_qt_tool, find_cl
+from conandeps_loader import CONANDEPS_FILE, load_conandeps
+import command_runner
+
 def run_cmd(cmd, cwd=None, shell=True):
-    """运行命令并返回结果"""
+    """运行命令并返回结果（输出逐行实时显示）"""
     print(f"🔧 执行命令: {cmd}")
     try:
-        result = subprocess.run(cmd, shell=shell, cwd=cwd, capture_output=True, text=True)
+        result = command_runner.run_command(cmd, cwd=cwd, shell=shell)
         print(f"返回码: {result.returncode}")
-        if result.stdout:
-            print(f"标准输出: {result.stdout}")
-        if result.stderr:
-            print(f"错误输出: {result.stderr}")
         return result
     except Exception as e:
         print(f"❌ 命令执行失败: {e}")
@@ -42,12 +47,8 @@ def main():
     obj_dir.mkdir(exist_ok=True)
     bin_dir.mkdir(exist_ok=True)
     
-    # 清理旧的MOC文件
-    print("\n🧹 清理旧的MOC文件...")
-    for moc_file in obj_dir.glob("*.moc"):
-        print(f"删除: {moc_file}")
-        moc_file.unlink()
-    
+    # 清理残留的 .moc.cpp 文件（.moc 文件交给MOC缓存判断是否需要重新生成）
+    print("\n🧹 清理旧的MOC中间文件...")
     for cpp_file in obj_dir.glob("*.cpp"):
         if cpp_file.name.endswith(".moc.cpp"):
             print(f"删除: {cpp_file}")
@@ -56,46 +57,48 @@ def main():
     # 加载Conan环境
     print("\n🌟 加载Conan环境...")
     if (project_root / "conanbuildenv-release-x86_64.bat").exists():
-        # 在PowerShell中运行批处理文件
-        cmd = f"powershell -Command \"& '{project_root}/conanbuildenv-release-x86_64.bat'\""
-        result = run_cmd(cmd)
+        # 使用环境快照，变量注入当前进程（后续的moc、cl、scons都能继承）
+        try:
+            capture_environment(project_root / "conanbuildenv-release-x86_64.bat").apply()
+            print("✅ Conan环境加载成功")
+        except RuntimeError as e:
+            print(f"⚠️ Conan环境加载警告: {e}")
     
     # 查找moc.exe
     print("\n🔍 查找MOC可执行文件...")
     moc_exe = None
     
-    # 1. 从Conan配置中查找
+    # 1. 从Conan配置的Qt包中查找（moc版本必须与编译、链接用的Qt头文件和库一致）
+    qt_package = None
     try:
-        from SCons.Script import SConscript
-        conandeps_path = project_root / "SConscript_conandeps"
+        conandeps_path = project_root / CONANDEPS_FILE
         if conandeps_path.exists():
             print("加载Conan依赖配置...")
-            exec(f"conandeps = SConscript('{conandeps_path}')", globals())
-            if 'conandeps' in globals() and 'conandeps' in globals()['conandeps']:
-                qt_config = globals()['conandeps']['conandeps']
-                if 'BINPATH' in qt_config:
-                    for bin_path in qt_config['BINPATH']:
-                        moc_path = Path(bin_path) / "moc.exe"
-                        if moc_path.exists():
-                            moc_exe = moc_path
-                            print(f"✅ 从Conan配置找到MOC: {moc_exe}")
-                            break
-    except Exception as e:
+            qt_package = load_conandeps(conandeps_path).package('qt')
+    except (OSError, ValueError, SyntaxError) as e:
         print(f"❌ 加载Conan配置失败: {e}")
     
-    # 2. 从常见路径查找
+    if qt_package:
+        moc_path = qt_package.find_binary('moc')
+        if not moc_path and qt_package.binpath:
+            # BINPATH 中没有moc时，使用工具链索引中同一Qt安装的moc
+            base_path = os.path.normcase(os.path.dirname(qt_package.binpath[0]))
+            for qt in default_index().qt_installations:
+                if os.path.normcase(qt['base_path']) == base_path and 'moc' in qt['tools']:
+                    moc_path = qt['tools']['moc']
+        if moc_path:
+            moc_exe = Path(moc_path)
+            print(f"✅ 从Conan配置的Qt包找到MOC: {moc_exe}")
+        else:
+            print(f"❌ Conan配置的Qt包中没有MOC: {', '.join(qt_package.binpath)}")
+            return False
+    
+    # 2. 没有Conan的Qt包时，从工具链索引查找（版本最高的Qt安装）
     if not moc_exe:
-        common_moc_paths = [
-            r"C:\Users\happyli\.conan2\p\b\qtb73b254637aeb\p\bin\moc.exe",
-            r"D:\Qt\6.7.3\msvc2019_64\bin\moc.exe",
-            r"C:\Qt\6.7.3\msvc2019_64\bin\moc.exe",
-        ]
-        
-        for moc_path in common_moc_paths:
-            if Path(moc_path).exists():
-                moc_exe = Path(moc_path)
-                print(f"✅ 从常见路径找到MOC: {moc_exe}")
-                break
+        moc_path = find_qt_tool('moc')
+        if moc_path:
+            moc_exe = Path(moc_path)
+            print(f"⚠️ 没有Conan的Qt包，使用工具链索引中的MOC: {moc_exe}")
     
     if not moc_exe:
         print("❌ 未找到MOC可执行文件!")
@@ -108,27 +111,22 @@ def main():
         (src_dir / "webviewwidget.h", obj_dir / "webviewwidget.moc")
     ]
     
-    moc_files = []
     for header_file, moc_file in headers:
-        if header_file.exists():
-            cmd = [str(moc_exe), '-o', str(moc_file), str(header_file)]
-            print(f"🔧 生成MOC: {cmd}")
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                moc_files.append(moc_file)
-                print(f"✅ 成功生成 {moc_file.name}")
-            else:
-                print(f"❌ 生成 {moc_file.name} 失败")
-                print(f"错误: {result.stderr}")
-                return False
-        else:
+        if not header_file.exists():
             print(f"❌ 头文件不存在: {header_file}")
             return False
     
+    moc_cache = MocCache(moc_exe, obj_dir)
+    if run_moc_batch(moc_cache, headers) != 0:
+        print("❌ 生成MOC文件失败")
+        return False
+    moc_files = [moc_file for header_file, moc_file in headers]
+    
     # 编译MOC文件
     print(f"\n🔨 编译MOC文件...")
     moc_obj_files = []
+    object_cache = ObjectCache()
+    collector = DiagnosticCollector()
     
     for moc_file in moc_files:
         # 将.moc文件重命名为.cpp文件
@@ -143,23 +141,8 @@ def main():
         obj_file = obj_dir / f"{moc_file.stem}.obj"
         moc_obj_files.append(obj_file)
         
-        # 查找编译器
-        cl_exe = None
-        common_cl_paths = [
-            r"D:\Code\VS2022\Community\VC\Tools\MSVC\14.40.33807\bin\Hostx64\x64\cl.exe",
-            r"C:\Program Files\Microsoft Visual Studio\2022\Community\VC\Tools\MSVC\14.40.33807\bin\Hostx64\x64\cl.exe",
-        ]
-        
-        for cl_path in common_cl_paths:
-            if Path(cl_path).exists():
-                cl_exe = cl_path
-                break
-        
-        if not cl_exe:
-            # 尝试使用系统PATH中的cl
-            result = run_cmd("where cl")
-            if result and result.returncode == 0:
-                cl_exe = result.stdout.strip().split('\n')[0]
+        # 查找编译器（工具链索引中版本最高的MSVC工具集，没有时查PATH）
+        cl_exe = find_cl()
         
         if not cl_exe:
             print("❌ 未找到C++编译器!")
@@ -182,13 +165,16 @@ def main():
         ]
         
         print(f"🔧 编译命令: {' '.join(compile_cmd)}")
-        result = subprocess.run(compile_cmd, capture_output=True, text=True)
+        result = object_cache.compile(compile_cmd)
         
         if result.returncode == 0:
-            print(f"✅ 成功编译 {cpp_file.name} -> {obj_file.name}")
+            print(f"✅ 成功编译 {cpp_file.name} -> {obj_file.name} ({result.cache_status})")
         else:
             print(f"❌ 编译失败 {cpp_file.name}")
-            print(f"错误: {result.stderr}")
+            # cl 的错误在stdout中，解析成结构化诊断输出
+            if not collector.feed_result(result, cpp_file):
+                print(f"错误: {result.stdout}{result.stderr}")
+            print(collector.summary())
             return False
     
     print(f"\n✅ MOC处理完成!")
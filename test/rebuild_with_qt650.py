@@ -6,24 +6,24 @@
 
 import os
 import shutil
-import subprocess
 import time
 import sys
 
-def run_command(cmd, cwd=None, description=""):
-    """运行命令并返回结果"""
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import command_runner
+
+# conan install --build=missing 可能编译几个小时，只在这么长时间没有输出时才认为卡住
+CONAN_IDLE_TIMEOUT = 1800
+
+def run_command(cmd, cwd=None, description="", idle_timeout=None, log_path=None):
+    """运行命令并返回结果（输出逐行实时显示，内存中只保留最后若干行）"""
     print(f"[INFO] {description}")
     print(f"[CMD] {' '.join(cmd)}")
     
     try:
-        result = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True, encoding='utf-8', errors='replace')
-        
-        if result.stdout:
-            print("[STDOUT]", result.stdout)
-        if result.stderr:
-            print("[STDERR]", result.stderr)
-            
-        return result.returncode == 0, result
+        result = command_runner.run_command(cmd, cwd=cwd, encoding='utf-8',
+                                            idle_timeout=idle_timeout, log_path=log_path)
+        return result.ok, result
     except Exception as e:
         print(f"[ERROR] 执行命令失败: {e}")
         return False, None
@@ -107,13 +107,15 @@ SConsDeps"""
     
     success, result = run_command([
         "conan", "install", "conanfile_qt650.txt", "--build=missing", "-pr:b=profile_cpp17"
-    ], cwd=project_root, description="安装Qt 6.5.0依赖")
+    ], cwd=project_root, description="安装Qt 6.5.0依赖", idle_timeout=CONAN_IDLE_TIMEOUT,
+       log_path=os.path.join(project_root, "obj", "logs", "conan_install_qt650.log"))
     
     if not success:
         print("[ERROR] Qt 6.5.0安装失败，尝试重新安装...")
         success, result = run_command([
             "conan", "install", "conanfile_qt650.txt", "--build=missing"
-        ], cwd=project_root, description="重新安装Qt 6.5.0依赖")
+        ], cwd=project_root, description="重新安装Qt 6.5.0依赖", idle_timeout=CONAN_IDLE_TIMEOUT,
+           log_path=os.path.join(project_root, "obj", "logs", "conan_install_qt650.log"))
     
     if success:
         print("[OK] Qt 6.5.0安装成功")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+编译器输出的头文件依赖测试（scons deps=compiler）
+用 g++ 构建一个两个源文件的小项目：第一次构建（还没有依赖记录，回退到C扫描器）必须成功，
+之后修改头文件时依赖它的目标重新编译；也检查 @响应文件中的 -H 能被识别
+没有 g++ 或 SCons 时跳过；直接运行或用 pytest 运行都可以
+"""
+
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+from header_deps import HeaderDeps
+
+SOURCES = {
+    'include/util.h': 'int util();\n',
+    'src/util.cpp': '#include "util.h"\nint util() { return 1; }\n',
+    'src/main.cpp': '#include "util.h"\nint main() { return util() - 1; }\n',
+}
+
+SCONSTRUCT = f'''
+import sys, atexit
+sys.path.insert(0, {REPO_ROOT!r})
+from header_deps import enable_header_deps
+
+env = Environment(CPPPATH=['include'])
+header_deps = enable_header_deps(env, 'obj', Dir('#').abspath, False)
+env['SPAWN'] = header_deps.wrap_spawn(env['SPAWN'])
+atexit.register(header_deps.save)
+env.Program('app', [env.Object('obj/main.o', 'src/main.cpp'), env.Object('obj/util.o', 'src/util.cpp')])
+'''
+
+
+def _skip(reason):
+    if 'pytest' in sys.modules:
+        import pytest
+        pytest.skip(reason)
+    print(f"⚠️ 跳过: {reason}")
+
+
+def _scons_command():
+    scons = shutil.which('scons')
+    if scons:
+        return [scons]
+    try:
+        import SCons  # noqa: F401
+    except ImportError:
+        return None
+    return [sys.executable, '-m', 'SCons']
+
+
+def _write_project(root):
+    for path, text in SOURCES.items():
+        path = os.path.join(root, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+def test_response_file_deps():
+    """@响应文件中的 -H 和源文件：编译输出中的依赖被记录，不回退到C扫描器"""
+    if not shutil.which('g++'):
+        return _skip("没有 g++")
+    with tempfile.TemporaryDirectory() as root:
+        _write_project(root)
+        os.makedirs(os.path.join(root, 'obj'))
+        rsp = os.path.join(root, 'obj', 'main.rsp')
+        with open(rsp, 'w', encoding='utf-8') as f:
+            f.write('-H -Iinclude -c -o obj/main.o src/main.cpp\n')
+        deps = HeaderDeps(os.path.join(root, 'obj'), root)
+        spawned = []
+
+        def spawn(sh, escape, cmd, args, env):
+            spawned.append(args)
+            return 0
+
+        cwd = os.getcwd()
+        os.chdir(root)
+        try:
+            returncode = deps.wrap_spawn(spawn)(None, None, 'g++', ['g++', '@' + rsp], dict(os.environ))
+        finally:
+            os.chdir(cwd)
+        assert returncode == 0
+        assert not spawned, "带 -H 的响应文件命令不应交给原来的 SPAWN"
+        project, _ = deps.dependencies(os.path.join(root, 'src', 'main.cpp'))
+        assert project == [os.path.join(root, 'include', 'util.h')]
+
+
+def test_scons_cold_build():
+    """第一次 deps=compiler 构建（没有依赖记录）和修改头文件后的增量构建"""
+    scons = _scons_command()
+    if scons is None or not shutil.which('g++'):
+        return _skip("没有 SCons 或 g++")
+    with tempfile.TemporaryDirectory() as root:
+        _write_project(root)
+        with open(os.path.join(root, 'SConstruct'), 'w', encoding='utf-8') as f:
+            f.write(SCONSTRUCT)
+
+        def build():
+            result = subprocess.run(scons + ['-Q'], cwd=root, capture_output=True, text=True)
+            assert result.returncode == 0, result.stdout + result.stderr
+            return result.stdout
+
+        build()
+        deps = HeaderDeps(os.path.join(root, 'obj'), root)
+        for source in ('main.cpp', 'util.cpp'):
+            project, _ = deps.dependencies(os.path.join(root, 'src', source))
+            assert project == [os.path.join(root, 'include', 'util.h')]
+
+        # 有记录后由依赖扫描器返回头文件：修改头文件两个目标都重新编译
+        with open(os.path.join(root, 'include', 'util.h'), 'a', encoding='utf-8') as f:
+            f.write('// changed\n')
+        output = build()
+        assert 'obj/main.o' in output and 'obj/util.o' in output, output
+
+
+def main():
+    tests = [value for name, value in sorted(globals().items()) if name.startswith('test_')]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
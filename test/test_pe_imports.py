@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PE导入表解析测试
+在内存中生成最小的 PE32 / PE32+ 文件（一个节，包含导入表和延迟导入表），
+检查 pe_imports 读取的导入、延迟导入和DLL传递闭包；也检查截断、损坏的文件
+直接运行或用 pytest 运行都可以
+"""
+
+import os
+import sys
+import struct
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pe_imports import PEFile, PEFormatError, dependency_closure
+
+SECTION_RVA = 0x1000
+SECTION_RAW = 0x200
+PE_OFFSET = 0x40
+
+
+def build_pe(imports, delay_imports=None, pe32_plus=True, old_style_delay=False):
+    """生成PE文件内容
+
+    imports / delay_imports: {DLL名: [函数名或 '#序号', ...]}
+    old_style_delay: 延迟导入描述符使用VA（VC6格式，attributes=0）
+    """
+    image_base = 0x140000000 if pe32_plus else 0x400000
+    section = bytearray()
+
+    def alloc(data, align=8):
+        while len(section) % align:
+            section.append(0)
+        rva = SECTION_RVA + len(section)
+        section.extend(data)
+        return rva
+
+    def thunk_table(functions):
+        fmt, flag = ('<Q', 1 << 63) if pe32_plus else ('<I', 1 << 31)
+        entries = []
+        for name in functions:
+            if name.startswith('#'):
+                entries.append(flag | int(name[1:]))
+            else:
+                entries.append(alloc(struct.pack('<H', 0) + name.encode('ascii') + b'\0', 2))
+        return alloc(b''.join(struct.pack(fmt, value) for value in entries + [0]))
+
+    descriptors = []
+    for dll, functions in imports.items():
+        name_rva = alloc(dll.encode('ascii') + b'\0', 2)
+        descriptors.append(struct.pack('<IIIII', thunk_table(functions), 0, 0, name_rva, thunk_table(functions)))
+    import_rva = alloc(b''.join(descriptors) + b'\0' * 20)
+
+    delay_rva = 0
+    if delay_imports:
+        delay_descriptors = []
+        for dll, functions in delay_imports.items():
+            name_rva = alloc(dll.encode('ascii') + b'\0', 2)
+            int_rva = thunk_table(functions)
+            iat_rva = thunk_table(functions)
+            if old_style_delay:
+                delay_descriptors.append(struct.pack('<IIIIIIII', 0, image_base + name_rva, 0,
+                                                     image_base + iat_rva, image_base + int_rva, 0, 0, 0))
+            else:
+                delay_descriptors.append(struct.pack('<IIIIIIII', 1, name_rva, 0, iat_rva, int_rva, 0, 0, 0))
+        delay_rva = alloc(b''.join(delay_descriptors) + b'\0' * 32)
+
+    directories = [(0, 0)] * 16
+    directories[1] = (import_rva, 20 * (len(imports) + 1))
+    if delay_rva:
+        directories[13] = (delay_rva, 32 * (len(delay_imports) + 1))
+
+    if pe32_plus:
+        optional = struct.pack('<H', 0x20b) + b'\0' * 22 + struct.pack('<Q', image_base)
+        optional += b'\0' * (60 - len(optional)) + struct.pack('<I', SECTION_RAW)
+        optional += b'\0' * (108 - len(optional)) + struct.pack('<I', 16)
+    else:
+        optional = struct.pack('<H', 0x10b) + b'\0' * 26 + struct.pack('<I', image_base)
+        optional += b'\0' * (60 - len(optional)) + struct.pack('<I', SECTION_RAW)
+        optional += b'\0' * (92 - len(optional)) + struct.pack('<I', 16)
+    optional += b''.join(struct.pack('<II', rva, size) for rva, size in directories)
+
+    machine = 0x8664 if pe32_plus else 0x014c
+    header = bytearray(b'MZ' + b'\0' * (PE_OFFSET - 2))
+    struct.pack_into('<I', header, 0x3c, PE_OFFSET)
+    header += b'PE\0\0' + struct.pack('<HHIIIHH', machine, 1, 0, 0, 0, len(optional), 0x22)
+    header += optional
+    header += struct.pack('<8sIIIIIIHHI', b'.idata', len(section), SECTION_RVA, len(section), SECTION_RAW,
+                          0, 0, 0, 0, 0xc0000040)
+    assert len(header) <= SECTION_RAW
+    return bytes(header) + b'\0' * (SECTION_RAW - len(header)) + bytes(section)
+
+
+APP_IMPORTS = {'KERNEL32.dll': ['CreateFileW', '#12'], 'Qt6Core.dll': ['qVersion']}
+APP_DELAY_IMPORTS = {'Qt6Network.dll': ['#7', 'QTcpSocket']}
+
+
+def test_pe32_plus_imports():
+    pe = PEFile(build_pe(APP_IMPORTS, APP_DELAY_IMPORTS, pe32_plus=True))
+    assert pe.is_64bit and pe.machine == 0x8664
+    assert pe.imports(with_functions=True) == APP_IMPORTS
+    assert pe.delay_imports(with_functions=True) == APP_DELAY_IMPORTS
+    assert pe.dependencies() == ['KERNEL32.dll', 'Qt6Core.dll', 'Qt6Network.dll']
+    assert pe.dependencies(include_delay=False) == ['KERNEL32.dll', 'Qt6Core.dll']
+
+
+def test_pe32_imports():
+    for old_style in (False, True):
+        pe = PEFile(build_pe(APP_IMPORTS, APP_DELAY_IMPORTS, pe32_plus=False, old_style_delay=old_style))
+        assert not pe.is_64bit and pe.machine == 0x014c
+        assert pe.imports(with_functions=True) == APP_IMPORTS
+        assert pe.delay_imports(with_functions=True) == APP_DELAY_IMPORTS
+
+
+def test_no_delay_imports():
+    pe = PEFile(build_pe({'KERNEL32.dll': ['ExitProcess']}))
+    assert pe.delay_imports() == {}
+    assert pe.dependencies() == ['KERNEL32.dll']
+
+
+def test_corrupt_headers():
+    data = build_pe(APP_IMPORTS, APP_DELAY_IMPORTS)
+    cases = {
+        '空数据': b'',
+        '缺少MZ头': b'XX' + data[2:],
+        '缺少PE签名': data[:PE_OFFSET] + b'NE\0\0' + data[PE_OFFSET + 4:],
+        'PE头被截断': data[:PE_OFFSET + 30],
+        '未知的可选头类型': data[:PE_OFFSET + 24] + b'\x07\x01' + data[PE_OFFSET + 26:],
+    }
+    for name, corrupt in cases.items():
+        try:
+            PEFile(corrupt)
+        except PEFormatError:
+            continue
+        raise AssertionError(f"{name}: 没有抛出 PEFormatError")
+
+
+def test_truncated_import_table():
+    # 头完整，但节数据被截掉：读取导入表时报错而不是返回错误的结果
+    data = build_pe(APP_IMPORTS, APP_DELAY_IMPORTS)
+    pe = PEFile(data[:SECTION_RAW + 16])
+    for read in (pe.imports, pe.delay_imports):
+        try:
+            read()
+        except PEFormatError:
+            continue
+        raise AssertionError(f"{read.__name__}: 没有抛出 PEFormatError")
+
+
+def test_dependency_closure():
+    with tempfile.TemporaryDirectory() as root:
+        app_dir = os.path.join(root, 'bin')
+        lib_dir = os.path.join(root, 'lib')
+        os.makedirs(app_dir)
+        os.makedirs(lib_dir)
+        files = {
+            os.path.join(app_dir, 'app.exe'): build_pe({'KERNEL32.dll': ['ExitProcess'], 'A.dll': ['a']},
+                                                       {'B.dll': ['b']}),
+            os.path.join(app_dir, 'A.dll'): build_pe({'b.DLL': ['b'], 'api-ms-win-core-file-l1-1-0.dll': ['f']}),
+            os.path.join(lib_dir, 'B.dll'): build_pe({'C.dll': ['c']}, pe32_plus=False),
+            # 损坏的DLL：闭包继续计算，只是这个文件没有依赖
+            os.path.join(lib_dir, 'C.dll'): b'MZ' + b'\0' * 10,
+        }
+        for path, data in files.items():
+            with open(path, 'wb') as f:
+                f.write(data)
+
+        app = os.path.join(app_dir, 'app.exe')
+        resolved, unresolved, graph = dependency_closure(app, [lib_dir])
+        assert set(resolved) == {'a.dll', 'b.dll', 'c.dll'}
+        assert resolved['b.dll'] == os.path.join(lib_dir, 'B.dll')
+        assert unresolved == {'KERNEL32.dll'}
+        assert graph[os.path.abspath(app)] == ['KERNEL32.dll', 'A.dll', 'B.dll']
+        assert graph[os.path.join(lib_dir, 'C.dll')] == []
+
+        # 不包含延迟导入时 B.dll 只能通过 A.dll 找到
+        resolved, _, graph = dependency_closure(app, [lib_dir], include_delay=False)
+        assert graph[os.path.abspath(app)] == ['KERNEL32.dll', 'A.dll']
+        assert 'b.dll' in resolved
+
+
+def main():
+    tests = [value for name, value in sorted(globals().items()) if name.startswith('test_')]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ {test.__name__}: {e}")
+    return failed == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -4,23 +4,21 @@
 Qt6 WebView项目功能测试脚本
 """
 
-import subprocess
 import sys
 import os
 import time
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import command_runner
+
 def run_command(cmd, description):
-    """运行命令并显示结果"""
+    """运行命令并显示结果（输出逐行实时显示）"""
     print(f"\n=== {description} ===")
     try:
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
         print(f"命令: {cmd}")
+        result = command_runner.run_command(cmd)
         print(f"返回码: {result.returncode}")
-        if result.stdout:
-            print(f"输出:\n{result.stdout}")
-        if result.stderr:
-            print(f"错误:\n{result.stderr}")
-        return result.returncode == 0
+        return result.ok
     except Exception as e:
         print(f"执行命令失败: {e}")
         return False
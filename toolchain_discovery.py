@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+工具链发现索引
+并行扫描一次候选根目录（Qt 安装目录、Conan 包目录、Visual Studio 安装目录），
+记录每个 Qt 安装的版本、可用模块和工具（moc、rcc、uic、windeployqt），
+以及每个 MSVC 工具集的 cl.exe 和 vcvars64.bat；结果保存到 ~/.cache/qt_build_toolchains，
+扫描时列出过的目录的修改时间都记录下来，任何一个变化（例如安装了新的Qt版本或MSVC工具集）时重新扫描
+
+之后各脚本直接查询索引，不再逐个探测硬编码的路径:
+    from toolchain_discovery import find_qt, find_qt_tool, find_cl
+    qt = find_qt(modules=['QtWebEngineWidgets'], major=6)
+    moc_exe = find_qt_tool('moc', qt)
+
+额外的候选根目录可以用 QT_ROOTS / VS_ROOTS 环境变量指定（用 os.pathsep 分隔）
+"""
+
+import os
+import re
+import sys
+import json
+import shutil
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+INDEX_VERSION = 1
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'qt_build_toolchains')
+
+DEFAULT_QT_ROOTS = [
+    r"C:\Qt",
+    r"D:\Qt",
+    r"D:\Code\Qt",
+    # 本地安装的 Qt6.x.x\6.x.x\msvc2019_64
+    r"D:\Code\VS2022\Community",
+    os.path.join(os.environ.get('CONAN_HOME') or os.path.join(os.path.expanduser('~'), '.conan2'), 'p'),
+]
+DEFAULT_VS_ROOTS = [
+    r"D:\Code\VS2022\Community",
+    r"C:\Program Files\Microsoft Visual Studio\2022\Community",
+    r"C:\Program Files\Microsoft Visual Studio\2022\Professional",
+    r"C:\Program Files\Microsoft Visual Studio\2022\Enterprise",
+    r"C:\Program Files\Microsoft Visual Studio\2022\BuildTools",
+]
+
+# 查找Qt安装时最多向下扫描的层数（Qt6.5.3\6.5.3\msvc2019_64、p\b\qtb73b254637aeb\p）
+QT_SCAN_DEPTH = 3
+# 只进入名字像Qt安装路径的子目录，跳过VS安装目录下的 Common7、Conan包的源码目录等
+QT_DIR_PATTERN = re.compile(r'^(qt.*|\d.*|msvc.*|mingw.*|gcc.*|clang.*|b|p)$', re.IGNORECASE)
+QT_TOOLS = ('moc', 'rcc', 'uic', 'windeployqt', 'qmake')
+VERSION_PATTERN = re.compile(r'(\d+)\.(\d+)\.(\d+)')
+
+
+def _exe(directory, name):
+    for candidate in (name + '.exe', name):
+        path = os.path.join(directory, candidate)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _list_dirs(path, stamps):
+    """列出子目录，同时记录该目录的修改时间（新增、删除子目录都会改变它）"""
+    stamps[path] = _mtime(path)
+    try:
+        with os.scandir(path) as entries:
+            return sorted(entry.path for entry in entries if entry.is_dir())
+    except OSError:
+        return []
+
+
+def _version_key(version):
+    match = VERSION_PATTERN.search(version or '')
+    return tuple(int(part) for part in match.groups()) if match else (0, 0, 0)
+
+
+def _qt_version(prefix):
+    """从 qtcoreversion.h 读取版本号，读不到时从路径中猜测"""
+    header = os.path.join(prefix, 'include', 'QtCore', 'qtcoreversion.h')
+    try:
+        with open(header, 'r', encoding='utf-8', errors='replace') as f:
+            match = re.search(r'QTCORE_VERSION_STR\s+"([^"]+)"', f.read())
+        if match:
+            return match.group(1)
+    except OSError:
+        pass
+    match = VERSION_PATTERN.search(prefix)
+    return '.'.join(match.groups()) if match else ''
+
+
+def _describe_qt(prefix, stamps):
+    include_dir = os.path.join(prefix, 'include')
+    bin_dir = os.path.join(prefix, 'bin')
+    # 工具是否存在取决于 bin 目录的内容
+    stamps[bin_dir] = _mtime(bin_dir)
+    modules = sorted(os.path.basename(path) for path in _list_dirs(include_dir, stamps)
+                     if os.path.basename(path).startswith('Qt'))
+    tools = {}
+    for name in QT_TOOLS:
+        # Qt6 在非Windows平台把 moc/rcc/uic 放在 libexec
+        path = _exe(bin_dir, name) or _exe(os.path.join(prefix, 'libexec'), name)
+        if path:
+            tools[name] = path
+    version = _qt_version(prefix)
+    return {
+        'base_path': prefix,
+        'include_path': include_dir,
+        'lib_path': os.path.join(prefix, 'lib'),
+        'bin_path': bin_dir,
+        'plugins_path': os.path.join(prefix, 'plugins'),
+        'version': version,
+        'major': _version_key(version)[0],
+        'modules': modules,
+        'tools': tools,
+    }
+
+
+def _is_qt_prefix(path):
+    return (os.path.isdir(os.path.join(path, 'include', 'QtCore'))
+            and (_exe(os.path.join(path, 'bin'), 'moc') or _exe(os.path.join(path, 'libexec'), 'moc')))
+
+
+def scan_qt_root(root, max_depth=QT_SCAN_DEPTH):
+    """扫描一个候选根目录下的Qt安装，返回 (安装列表, 目录修改时间)"""
+    stamps = {}
+    found = []
+    pending = [(root, 0)]
+    while pending:
+        path, depth = pending.pop()
+        if _is_qt_prefix(path):
+            found.append(_describe_qt(path, stamps))
+            continue
+        if depth >= max_depth:
+            continue
+        for child in _list_dirs(path, stamps):
+            if QT_DIR_PATTERN.match(os.path.basename(child)):
+                pending.append((child, depth + 1))
+    return found, stamps
+
+
+def scan_vs_root(root):
+    """扫描一个Visual Studio安装目录下的MSVC工具集，返回 (工具集列表, 目录修改时间)"""
+    stamps = {root: _mtime(root)}
+    found = []
+    vcvars = os.path.join(root, 'VC', 'Auxiliary', 'Build', 'vcvars64.bat')
+    for tools_dir in _list_dirs(os.path.join(root, 'VC', 'Tools', 'MSVC'), stamps):
+        cl_exe = os.path.join(tools_dir, 'bin', 'Hostx64', 'x64', 'cl.exe')
+        if os.path.isfile(cl_exe):
+            found.append({
+                'version': os.path.basename(tools_dir),
+                'install_dir': root,
+                'tools_dir': tools_dir,
+                'cl': cl_exe,
+                'vcvars': vcvars if os.path.isfile(vcvars) else None,
+            })
+    return found, stamps
+
+
+def _roots(defaults, env_var):
+    extra = [path for path in os.environ.get(env_var, '').split(os.pathsep) if path]
+    roots = []
+    for path in extra + list(defaults):
+        path = os.path.normpath(path)
+        if path not in roots:
+            roots.append(path)
+    return roots
+
+
+class ToolchainIndex:
+    """扫描结果：Qt安装和MSVC工具集"""
+
+    def __init__(self, qt_installations, msvc_toolsets, stamps, path=None):
+        self.qt_installations = qt_installations
+        self.msvc_toolsets = msvc_toolsets
+        self.stamps = stamps
+        self.path = path
+
+    def is_valid(self):
+        return all(_mtime(path) == stamp for path, stamp in self.stamps.items())
+
+    def find_qt(self, modules=(), major=None, version=None):
+        """版本最高的、包含全部指定模块的Qt安装（version 为版本号前缀）"""
+        candidates = [qt for qt in self.qt_installations
+                      if all(module in qt['modules'] for module in modules)
+                      and (major is None or qt['major'] == major)
+                      and (version is None or qt['version'].startswith(version))]
+        return max(candidates, key=lambda qt: _version_key(qt['version']), default=None)
+
+    def find_qt_tool(self, name, qt=None):
+        """Qt工具路径：优先指定的Qt安装，否则取版本最高的包含该工具的安装，最后查PATH"""
+        if qt is not None and name in qt['tools']:
+            return qt['tools'][name]
+        candidates = [qt for qt in self.qt_installations if name in qt['tools']]
+        if candidates:
+            return max(candidates, key=lambda qt: _version_key(qt['version']))['tools'][name]
+        return shutil.which(name)
+
+    def find_msvc(self, version=None):
+        """版本最高的MSVC工具集（version 为版本号前缀，例如 '14.29'）"""
+        candidates = [toolset for toolset in self.msvc_toolsets
+                      if version is None or toolset['version'].startswith(version)]
+        return max(candidates, key=lambda toolset: _version_key(toolset['version']), default=None)
+
+    def find_cl(self, version=None):
+        toolset = self.find_msvc(version)
+        return toolset['cl'] if toolset else shutil.which('cl')
+
+    def to_dict(self):
+        return {'version': INDEX_VERSION, 'qt': self.qt_installations,
+                'msvc': self.msvc_toolsets, 'stamps': self.stamps}
+
+
+def build_index(qt_roots, vs_roots, max_workers=None):
+    """并行扫描所有候选根目录"""
+    qt_installations, msvc_toolsets, stamps = [], [], {}
+    tasks = [(scan_qt_root, root) for root in qt_roots] + [(scan_vs_root, root) for root in vs_roots]
+    with ThreadPoolExecutor(max_workers=max_workers or len(tasks) or 1) as executor:
+        futures = [(scan, executor.submit(scan, root)) for scan, root in tasks]
+        for scan, future in futures:
+            found, root_stamps = future.result()
+            (qt_installations if scan is scan_qt_root else msvc_toolsets).extend(found)
+            stamps.update(root_stamps)
+    # 同一目录可能同时在多个根目录下被扫描到
+    unique_qt = {qt['base_path']: qt for qt in qt_installations}
+    unique_msvc = {toolset['cl']: toolset for toolset in msvc_toolsets}
+    return ToolchainIndex(list(unique_qt.values()), list(unique_msvc.values()), stamps)
+
+
+def index_path(qt_roots, vs_roots, cache_dir=None):
+    cache_dir = cache_dir or os.environ.get('TOOLCHAIN_DISCOVERY_CACHE_DIR') or DEFAULT_CACHE_DIR
+    key = hashlib.sha256(json.dumps([INDEX_VERSION, qt_roots, vs_roots]).encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, key[:16] + '.json')
+
+
+def load_index(qt_roots=None, vs_roots=None, refresh=False, cache_dir=None):
+    """读取索引（目录都未变化时直接使用缓存，否则重新扫描并保存）"""
+    qt_roots = _roots(DEFAULT_QT_ROOTS if qt_roots is None else qt_roots, 'QT_ROOTS')
+    vs_roots = _roots(DEFAULT_VS_ROOTS if vs_roots is None else vs_roots, 'VS_ROOTS')
+    path = index_path(qt_roots, vs_roots, cache_dir)
+
+    if not refresh:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == INDEX_VERSION:
+                index = ToolchainIndex(data['qt'], data['msvc'], data['stamps'], path)
+                if index.is_valid():
+                    return index
+        except (OSError, ValueError, KeyError):
+            pass
+
+    index = build_index(qt_roots, vs_roots)
+    index.path = path
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index.to_dict(), f, indent=1)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[WARN] 无法保存工具链索引: {e}")
+    return index
+
+
+_default_index = None
+
+
+def default_index():
+    """进程内只读取一次的默认索引"""
+    global _default_index
+    if _default_index is None:
+        _default_index = load_index()
+    return _default_index
+
+
+def find_qt(modules=(), major=None, version=None):
+    return default_index().find_qt(modules, major, version)
+
+
+def find_qt_tool(name, qt=None):
+    return default_index().find_qt_tool(name, qt)
+
+
+def find_cl(version=None):
+    return default_index().find_cl(version)
+
+
+def find_msvc(version=None):
+    return default_index().find_msvc(version)
+
+
+if __name__ == "__main__":
+    # 用法: python toolchain_discovery.py [--refresh]  —— 打印发现的Qt安装和MSVC工具集
+    index = load_index(refresh='--refresh' in sys.argv[1:])
+    print(f"[INFO] 工具链索引: {index.path}")
+    for qt in sorted(index.qt_installations, key=lambda qt: _version_key(qt['version'])):
+        print(f"[OK] Qt {qt['version'] or '?'}: {qt['base_path']}")
+        print(f"     模块: {', '.join(qt['modules'])}")
+        print(f"     工具: {', '.join(sorted(qt['tools']))}")
+    for toolset in sorted(index.msvc_toolsets, key=lambda toolset: _version_key(toolset['version'])):
+        print(f"[OK] MSVC {toolset['version']}: {toolset['cl']}")
+    if not index.qt_installations and not index.msvc_toolsets:
+        print("[WARN] 未发现Qt安装或MSVC工具集")
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+工具链环境快照
+vcvars64.bat、conanbuildenv-*.bat 等环境脚本只运行一次，把它们修改的环境变量序列化保存，
+以 脚本内容哈希 + 参数 + 基础PATH 为键；之后的构建直接把变量注入 os.environ 或 SCons 环境，
+省掉每次构建启动vcvars的数秒时间
+
+快照保存在 ~/.cache/qt_build_env（obj目录会被清理），快照中新增的PATH目录不存在时
+（例如升级了MSVC工具集）自动重新运行脚本
+"""
+
+import os
+import sys
+import json
+import hashlib
+import subprocess
+
+from moc_cache import file_sha256
+
+SNAPSHOT_VERSION = 1
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'qt_build_env')
+# compile.py 启动scons时通过这个环境变量传递快照文件路径
+SNAPSHOT_ENV_VAR = 'TOOLCHAIN_ENV_SNAPSHOT'
+# 基础环境中影响脚本输出的变量
+BASE_VARIABLES = ('PATH', 'INCLUDE', 'LIB', 'LIBPATH')
+# shell自身会修改的变量，不属于脚本的输出
+IGNORED_VARIABLES = ('_', 'SHLVL', 'PWD', 'OLDPWD', 'PROMPT', SNAPSHOT_ENV_VAR)
+
+
+def _normalize_scripts(scripts):
+    """脚本列表统一为 [(绝对路径, [参数...]), ...]"""
+    if isinstance(scripts, (str, os.PathLike)):
+        scripts = [scripts]
+    normalized = []
+    for item in scripts:
+        if isinstance(item, (str, os.PathLike)):
+            path, args = item, []
+        else:
+            path, args = item[0], list(item[1:])
+        normalized.append((os.path.abspath(str(path)), [str(arg) for arg in args]))
+    return normalized
+
+
+def _env_key(name):
+    # Windows 环境变量名不区分大小写
+    return name.upper() if os.name == 'nt' else name
+
+
+def _capture_command(scripts):
+    if os.name == 'nt':
+        steps = [f'call "{path}" {" ".join(args)} >nul' for path, args in scripts]
+        return ' && '.join(steps + ['set']), '\n'
+    steps = [f'. "{path}" {" ".join(args)} >/dev/null' for path, args in scripts]
+    return ['bash', '-c', ' && '.join(steps + ['env -0'])], '\0'
+
+
+def _run_scripts(scripts):
+    """在一个shell中依次运行环境脚本，返回运行后的完整环境变量"""
+    command, separator = _capture_command(scripts)
+    result = subprocess.run(command, shell=isinstance(command, str), capture_output=True,
+                            text=True, errors='replace')
+    if result.returncode != 0:
+        raise RuntimeError(f"环境脚本执行失败 (返回码 {result.returncode}): {result.stderr.strip()}")
+    environ = {}
+    for line in result.stdout.split(separator):
+        name, sep, value = line.rstrip('\r\n').partition('=')
+        # cmd 的 set 会输出 =C:=C:\ 这类隐藏变量
+        if sep and name:
+            environ[name] = value
+    return environ
+
+
+def _environment_delta(before, after):
+    """脚本新增或修改的变量"""
+    base = {_env_key(name): value for name, value in before.items()}
+    ignored = {_env_key(name) for name in IGNORED_VARIABLES}
+    return {name: value for name, value in after.items()
+            if _env_key(name) not in ignored and base.get(_env_key(name)) != value}
+
+
+class EnvironmentSnapshot:
+    """一组环境脚本运行后的环境变量（只保存被修改的变量）"""
+
+    def __init__(self, path, scripts, variables):
+        self.path = path
+        self.scripts = scripts
+        self.variables = variables
+
+    def environ(self, base=None):
+        """返回合并后的完整环境（用于 subprocess 的 env 参数）"""
+        merged = dict(os.environ if base is None else base)
+        existing = {_env_key(name): name for name in merged}
+        for name, value in self.variables.items():
+            merged.pop(existing.get(_env_key(name), name), None)
+            merged[name] = value
+        merged[SNAPSHOT_ENV_VAR] = self.path
+        return merged
+
+    def apply(self):
+        """注入当前进程的 os.environ"""
+        os.environ.update(self.variables)
+
+    def apply_to_scons(self, env):
+        """注入 SCons 环境的 ENV（执行编译命令时使用）"""
+        for name, value in self.variables.items():
+            env['ENV'][name] = value
+
+    def is_valid(self, base_path=''):
+        """快照新增的PATH目录都还存在"""
+        base_dirs = set(base_path.lower().split(os.pathsep))
+        for name, value in self.variables.items():
+            if _env_key(name) != _env_key('PATH'):
+                continue
+            for directory in value.split(os.pathsep):
+                if directory and directory.lower() not in base_dirs and not os.path.isdir(directory):
+                    return False
+        return True
+
+
+def snapshot_key(scripts, base=None):
+    base = os.environ if base is None else base
+    digest = hashlib.sha256(f"v{SNAPSHOT_VERSION}".encode())
+    for path, args in scripts:
+        digest.update(b'\0' + path.encode('utf-8') + b'\0' + file_sha256(path).encode('ascii'))
+        digest.update(b'\0' + '\0'.join(args).encode('utf-8'))
+    lookup = {_env_key(name): value for name, value in base.items()}
+    for name in BASE_VARIABLES:
+        digest.update(b'\0' + lookup.get(_env_key(name), '').encode('utf-8'))
+    return digest.hexdigest()
+
+
+def load_snapshot(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != SNAPSHOT_VERSION:
+            return None
+        return EnvironmentSnapshot(path, data['scripts'], data['variables'])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def capture_environment(scripts, cache_dir=None, refresh=False):
+    """运行环境脚本（有有效快照时直接读取），返回 EnvironmentSnapshot
+
+    scripts: 脚本路径，或 [路径 / (路径, 参数...), ...]，按顺序在同一个shell中运行
+    """
+    scripts = _normalize_scripts(scripts)
+    cache_dir = cache_dir or os.environ.get('TOOLCHAIN_ENV_CACHE_DIR') or DEFAULT_CACHE_DIR
+    path = os.path.join(cache_dir, snapshot_key(scripts) + '.json')
+    base_path = next((value for name, value in os.environ.items()
+                      if _env_key(name) == _env_key('PATH')), '')
+
+    if not refresh:
+        snapshot = load_snapshot(path)
+        if snapshot is not None and snapshot.is_valid(base_path):
+            return snapshot
+
+    names = ', '.join(os.path.basename(script) for script, _ in scripts)
+    print(f"[INFO] 运行环境脚本并保存快照: {names}")
+    variables = _environment_delta(os.environ, _run_scripts(scripts))
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': SNAPSHOT_VERSION,
+                   'scripts': [[script] + args for script, args in scripts],
+                   'variables': variables}, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+    return EnvironmentSnapshot(path, [[script] + args for script, args in scripts], variables)
+
+
+def scons_msvc_settings():
+    """SConstruct 使用：由 compile.py 启动时返回快照中的变量，用作 MSVC_USE_SETTINGS
+
+    这样 SCons 不会再自己运行一次 vcvars
+    """
+    path = os.environ.get(SNAPSHOT_ENV_VAR)
+    snapshot = load_snapshot(path) if path else None
+    return dict(snapshot.variables) if snapshot else None
+
+
+if __name__ == "__main__":
+    # 用法: python toolchain_env.py [--refresh] <环境脚本>...  —— 打印脚本修改的环境变量
+    args = sys.argv[1:]
+    refresh = '--refresh' in args
+    args = [arg for arg in args if arg != '--refresh']
+    if not args:
+        print("用法: python toolchain_env.py [--refresh] <环境脚本>...")
+        sys.exit(1)
+    snapshot = capture_environment(args, refresh=refresh)
+    print(f"[INFO] 快照: {snapshot.path}")
+    for name, value in sorted(snapshot.variables.items()):
+        print(f"{name}={value}")
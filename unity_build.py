@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unity（jumbo）构建
+把源文件合并成 N 个大小均衡的编译单元（N 默认等于CPU核数），
+每个MOC输出直接 #include 到它所属源文件所在的编译单元中，减少重复解析Qt头文件的次数
+
+某个合并单元编译失败时，先不经过 SPAWN 包装重新编译一次取得诊断信息，
+把第一个错误所在的源文件单独编译：单独编译也失败是源文件本身的错误，不再查找；
+单独编译正常时才二分查找最短的失败前缀，找出"单独编译正常、合并后才出错"的源文件，
+只把这些源文件记录到 obj/.unity_fallback.json，下次构建改为单独编译。
+错误不在成员源文件中（例如在头文件中）时，同一个合并单元以相同的错误再次失败才查找。
+回退的源文件或与它冲突的源文件内容变化后会重新尝试合并，
+合并单元再次编译成功时清理已失效的记录；python unity_build.py --clear 清空回退列表
+用法: scons unity=1（自动按核数分组）或 scons unity=4
+"""
+
+import os
+import sys
+import json
+import threading
+import subprocess
+
+from moc_cache import file_sha256
+from diagnostics import DiagnosticParser
+from qt_pch import write_if_changed
+
+UNITY_DIR_NAME = 'unity'
+FALLBACK_FILE_NAME = '.unity_fallback.json'
+
+_fallback_lock = threading.Lock()
+
+
+def unity_batch_count(value):
+    """解析 unity= 参数：0/空 表示关闭，1 表示按CPU核数，其他数字为合并单元个数"""
+    try:
+        count = int(value or 0)
+    except ValueError:
+        print(f"[WARN] 无效的unity参数: {value}，不使用unity构建")
+        return 0
+    if count == 1:
+        return os.cpu_count() or 1
+    return max(count, 0)
+
+
+def load_fallback(obj_dir):
+    """读取回退列表：{源文件路径: {'hash': 内容哈希, 'conflicts': {冲突的源文件: 内容哈希}}}"""
+    try:
+        with open(os.path.join(obj_dir, FALLBACK_FILE_NAME), 'r', encoding='utf-8') as f:
+            fallback = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    # 旧格式只有内容哈希
+    return {source: entry if isinstance(entry, dict) else {'hash': entry, 'conflicts': {}}
+            for source, entry in fallback.items()}
+
+
+def _save_fallback(obj_dir, fallback):
+    path = os.path.join(obj_dir, FALLBACK_FILE_NAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(fallback, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _hashes(paths):
+    hashes = {}
+    for path in paths:
+        try:
+            hashes[path] = file_sha256(path)
+        except OSError:
+            continue
+    return hashes
+
+
+def add_fallback(obj_dir, sources, conflicts=()):
+    """把合并后才编译失败的源文件加入回退列表
+
+    conflicts: 与它们合并时出错的其他源文件（其中任何一个变化后重新尝试合并）
+    """
+    conflict_hashes = _hashes(conflicts)
+    with _fallback_lock:
+        fallback = load_fallback(obj_dir)
+        for source, digest in _hashes(sources).items():
+            fallback[source] = {'hash': digest, 'conflicts': conflict_hashes}
+        _save_fallback(obj_dir, fallback)
+
+
+def prune_fallback(obj_dir):
+    """删除已失效的记录（源文件或与它冲突的源文件已变化），返回删除的个数"""
+    with _fallback_lock:
+        fallback = load_fallback(obj_dir)
+        valid = {source: entry for source, entry in fallback.items() if _is_excluded(source, fallback)}
+        if len(valid) != len(fallback):
+            _save_fallback(obj_dir, valid)
+        return len(fallback) - len(valid)
+
+
+def clear_fallback(obj_dir):
+    """清空回退列表（下次构建全部重新尝试合并）"""
+    with _fallback_lock:
+        try:
+            os.remove(os.path.join(obj_dir, FALLBACK_FILE_NAME))
+        except OSError:
+            pass
+
+
+def _is_excluded(source, fallback):
+    entry = fallback.get(source)
+    if entry is None:
+        return False
+    recorded = dict(entry['conflicts'], **{source: entry['hash']})
+    return _hashes(recorded) == recorded
+
+
+def _weight(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+class UnityPlan:
+    """合并计划
+
+    batches: [(合并单元路径, [成员源文件...]), ...]，成员包括源文件和MOC输出
+    groups:  {合并单元路径: [[源文件, 它的MOC输出...], ...]}（查找合并冲突时按组处理）
+    standalone: 需要单独编译的文件（回退的源文件及其MOC输出）
+    generated: 所有MOC输出（构建时才生成）
+    """
+
+    def __init__(self, obj_dir, batches, groups, standalone, generated):
+        self.obj_dir = obj_dir
+        self.batches = batches
+        self.groups = groups
+        self.standalone = standalone
+        self.generated = generated
+
+
+def write_unity_source(unity_path, members):
+    lines = ['// 自动生成的unity编译单元（unity_build.py），请勿手动修改']
+    lines += ['#include "{}"'.format(member.replace('\\', '/')) for member in members]
+    write_if_changed(unity_path, '\n'.join(lines) + '\n')
+
+
+def _probe_spawn(output):
+    """探测编译使用的SPAWN：不经过编译缓存、依赖记录和计时的包装，输出收集到 output 而不显示"""
+    def spawn(sh, escape, cmd, args, env):
+        args = [str(arg).strip('"') for arg in args]
+        env = {str(k): str(v) for k, v in (env or os.environ).items()}
+        result = subprocess.run(args, env=env, capture_output=True, text=True, errors='replace')
+        output.append(result.stdout + result.stderr)
+        return result.returncode
+    return spawn
+
+
+def _error_group(groups, errors):
+    """第一个错误所在的成员组，错误不在成员文件中时返回 None"""
+    owners = {os.path.normcase(os.path.abspath(member)): group for group in groups for member in group}
+    for error in errors:
+        if error.file:
+            group = owners.get(os.path.normcase(os.path.abspath(error.file)))
+            if group is not None:
+                return group
+    return None
+
+
+def _same_errors_as_last_time(unity_path, errors):
+    """记录合并单元这次的错误，返回上次失败时是否是相同的错误"""
+    path = os.path.splitext(unity_path)[0] + '.errors'
+    signature = '\n'.join(sorted({repr(error.key) for error in errors})) + '\n'
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            previous = f.read()
+    except OSError:
+        previous = None
+    write_if_changed(path, signature)
+    return previous == signature
+
+
+def find_unity_conflicts(groups, compiles):
+    """找出合并后才编译失败的成员组
+
+    groups:   [[源文件, 它的MOC输出...], ...]
+    compiles: compiles(组列表) -> 这些组合并后能否编译
+    返回 [(冲突的组, 与它合并时出错的前面的组列表), ...]；
+    遇到单独编译也失败的组（源文件本身的错误）时停止，这样的组不返回
+    """
+    conflicts = []
+    remaining = list(groups)
+    while len(remaining) > 1 and not compiles(remaining):
+        # 二分查找最短的失败前缀（remaining 整体失败）
+        low, high = 1, len(remaining)
+        while low < high:
+            middle = (low + high) // 2
+            if compiles(remaining[:middle]):
+                low = middle + 1
+            else:
+                high = middle
+        culprit = remaining[low - 1]
+        if low == 1 or not compiles([culprit]):
+            break
+        conflicts.append((culprit, remaining[:low - 1]))
+        remaining.pop(low - 1)
+    return conflicts
+
+
+def plan_unity_build(obj_dir, sources, moc_outputs, batch_count):
+    """生成合并计划
+
+    moc_outputs: {头文件: MOC输出文件}；MOC输出跟随同名源文件（mainwindow.h -> mainwindow.cpp），
+    找不到同名源文件的MOC输出作为独立成员参与分组
+    """
+    obj_dir = os.path.abspath(str(obj_dir))
+    sources = [os.path.abspath(str(source)) for source in sources]
+    generated = set()
+    fallback = load_fallback(obj_dir)
+    by_stem = {os.path.splitext(os.path.basename(source))[0]: source for source in sources}
+
+    # 每个成员组是一个文件列表；源文件和它的MOC输出总在同一组
+    groups = {source: [source] for source in sources}
+    weights = {source: _weight(source) for source in sources}
+    for header, output in moc_outputs.items():
+        output = os.path.abspath(str(output))
+        generated.add(output)
+        owner = by_stem.get(os.path.splitext(os.path.basename(str(header)))[0])
+        if owner is None:
+            groups[output] = [output]
+            weights[output] = _weight(header)
+        else:
+            groups[owner].append(output)
+            weights[owner] += _weight(header)
+
+    standalone = []
+    units = []
+    for key, members in groups.items():
+        if key in sources and _is_excluded(key, fallback):
+            standalone.extend(members)
+        else:
+            units.append(key)
+
+    batch_count = max(1, min(batch_count, len(units)))
+    # 最长处理时间优先：按权重从大到小放入当前最轻的组
+    buckets = [[0, []] for _ in range(batch_count)]
+    for key in sorted(units, key=lambda k: (-weights[k], k)):
+        bucket = min(buckets, key=lambda b: b[0])
+        bucket[0] += weights[key]
+        bucket[1].append(groups[key])
+
+    unity_dir = os.path.join(obj_dir, UNITY_DIR_NAME)
+    os.makedirs(unity_dir, exist_ok=True)
+    batches = []
+    unit_groups = {}
+    for index, (_, member_groups) in enumerate(b for b in buckets if b[1]):
+        unity_path = os.path.join(unity_dir, f'unity_{index}.cpp')
+        members = [member for group in member_groups for member in group]
+        write_unity_source(unity_path, members)
+        batches.append((unity_path, members))
+        unit_groups[unity_path] = member_groups
+
+    # 删除上次多出来的合并单元
+    current = {unity_path for unity_path, _ in batches}
+    for name in os.listdir(unity_dir):
+        path = os.path.join(unity_dir, name)
+        # 探测用的错误记录（.errors）跟随它的合并单元
+        if name.endswith(('.cpp', '.errors')) and os.path.splitext(path)[0] + '.cpp' not in current:
+            os.remove(path)
+    return UnityPlan(obj_dir, batches, unit_groups, standalone, generated)
+
+
+def add_unity_objects(env, plan):
+    """为合并单元添加编译规则，返回目标文件节点列表
+
+    编译失败时查找合并后才出错的源文件并加入回退列表（下次构建单独编译）
+    """
+    from SCons.Action import Action
+    from SCons.Builder import Builder
+    from SCons.Tool import SourceFileScanner
+
+    compile_action = Action('$CXXCOM', '$CXXCOMSTR')
+
+    def sources_of(groups):
+        return [m for group in groups for m in group if m not in plan.generated]
+
+    def compile_unity(target, source, env):
+        status = compile_action(target, source, env)
+        unity_path = os.path.abspath(str(source[0]))
+        errors_path = os.path.splitext(unity_path)[0] + '.errors'
+        if not status:
+            if os.path.exists(errors_path):
+                os.remove(errors_path)
+            removed = prune_fallback(plan.obj_dir)
+            if removed:
+                print(f"[INFO] 已清理 {removed} 条失效的unity回退记录")
+            return status
+        groups = plan.groups.get(unity_path, [])
+        if len(groups) < 2:
+            return status
+
+        # 用临时合并单元重新编译部分成员（结果按成员列表缓存），找出合并后才出错的源文件
+        probe_base = os.path.splitext(unity_path)[0] + '_probe'
+        probe_obj = env.File(probe_base + env['OBJSUFFIX'])
+        results = {}
+
+        def probe(groups):
+            members = tuple(m for group in groups for m in group)
+            if members not in results:
+                output = []
+                write_unity_source(probe_base + '.cpp', members)
+                probe_env = env.Override({'SPAWN': _probe_spawn(output)})
+                ok = compile_action([probe_obj], [env.File(probe_base + '.cpp')], probe_env, show=False) == 0
+                parser = DiagnosticParser()
+                parser.feed(''.join(output))
+                parser.close()
+                results[members] = (ok, [d for d in parser.records if d.is_error])
+            return results[members]
+
+        def compiles(groups):
+            return probe(groups)[0]
+
+        name = os.path.basename(unity_path)
+        try:
+            ok, errors = probe(groups)
+            if ok:
+                return status
+            culprit = _error_group(groups, errors)
+            if culprit is not None:
+                if not compiles([culprit]):
+                    print(f"[ERROR] {os.path.basename(culprit[0])} 单独编译也失败，不是合并引起的错误")
+                    return status
+            elif not _same_errors_as_last_time(unity_path, errors):
+                print(f"[INFO] {name} 的错误不在成员源文件中，再次出现相同的错误时查找合并冲突")
+                return status
+            print(f"[INFO] unity编译单元失败: {name}，查找合并后才出错的源文件...")
+            conflicts = find_unity_conflicts(groups, compiles)
+        finally:
+            for path in (probe_base + '.cpp', probe_base + env['OBJSUFFIX']):
+                if os.path.exists(path):
+                    os.remove(path)
+        if not conflicts:
+            print(f"[ERROR] {name} 中的源文件单独编译也失败，不回退")
+            return status
+        for group, others in conflicts:
+            members = sources_of([group])
+            add_fallback(plan.obj_dir, members, sources_of(others))
+            print(f"[WARN] {', '.join(os.path.basename(m) for m in members)} 与同一合并单元中的源文件冲突，"
+                  f"下次构建将单独编译")
+        return status
+
+    env.Append(BUILDERS={'UnityObject': Builder(
+        action=Action(compile_unity, None),
+        suffix='$OBJSUFFIX',
+        src_suffix='.cpp',
+        source_scanner=SourceFileScanner)})
+
+    objects = []
+    for unity_path, members in plan.batches:
+        obj = env.UnityObject(os.path.splitext(unity_path)[0] + env['OBJSUFFIX'], unity_path)
+        # MOC输出由MOC构建器生成，需要在编译合并单元之前完成
+        env.Depends(obj, [m for m in members if m in plan.generated])
+        objects += obj
+    print(f"[INFO] unity构建: {sum(len(m) for _, m in plan.batches)} 个文件合并为 "
+          f"{len(plan.batches)} 个编译单元，{len(plan.standalone)} 个文件单独编译")
+    return objects
+
+
+if __name__ == "__main__":
+    # 用法: python unity_build.py [合并单元个数]  —— 打印 src 目录的合并计划
+    #       python unity_build.py --clear          —— 清空回退列表
+    if sys.argv[1:] == ['--clear']:
+        clear_fallback('obj')
+        print(f"[OK] 已清空 obj/{FALLBACK_FILE_NAME}")
+        sys.exit(0)
+    from source_discovery import discover_sources
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 1)
+    tree = discover_sources('src', 'obj')
+    moc = {h: os.path.join('obj', f"moc_{os.path.splitext(os.path.basename(h))[0]}.cpp")
+           for h in tree.moc_headers}
+    plan = plan_unity_build('obj', tree.sources, moc, count)
+    for unity_path, members in plan.batches:
+        print(f"{unity_path}:")
+        for member in members:
+            print(f"  {member}")
+    if plan.standalone:
+        print(f"单独编译: {plan.standalone}")
@@ -6,22 +6,30 @@ Qt WebEngine智能集成系统
 """
 
 import os
-import time
 import shutil
 import subprocess
 import threading
 from datetime import datetime
 
+from conan_watch import ConanCompletionDetector, ConanPackageIndex, find_process_ids
+
+# Conan缓存目录
+CONAN_HOME = os.environ.get("CONAN_HOME", "C:/Users/happyli/.conan2")
+
 class WebEngineIntegrationManager:
-    def __init__(self):
+    def __init__(self, conan_process=None):
         self.monitoring = False
         self.conan_completed = False
         self.integrated = False
+        # 由本程序启动的conan进程（可选），有它时直接等待其进程句柄
+        self.conan_process = conan_process
+        self.stop_event = threading.Event()
         
     def start_monitoring(self):
         """启动监控服务"""
         print("🚀 启动WebEngine智能监控系统...")
         self.monitoring = True
+        self.stop_event.clear()
         
         # 启动后台监控线程
         monitor_thread = threading.Thread(target=self._monitor_loop)
@@ -32,44 +40,36 @@ class WebEngineIntegrationManager:
         return monitor_thread
     
     def _monitor_loop(self):
-        """监控循环"""
-        check_count = 0
-        while self.monitoring and not self.conan_completed:
-            check_count += 1
-            
-            # 每30秒检查一次Conan状态
-            if self._check_conan_status():
-                print("🎉 Conan依赖下载完成！")
-                self.conan_completed = True
-                self._integrate_webengine()
-                break
-            else:
-                print(f"⏳ 第{check_count}次检查: 等待Conan完成... ({datetime.now().strftime('%H:%M:%S')})")
-                time.sleep(30)
+        """监控循环：等待conan进程退出或包索引变化，不再定时轮询"""
+        print(f"⏳ 等待Conan完成... ({datetime.now().strftime('%H:%M:%S')})")
+        detector = ConanCompletionDetector(CONAN_HOME, process=self.conan_process)
+        try:
+            reason = detector.wait(stop_event=self.stop_event)
+        except Exception as e:
+            print(f"⚠️ 检查Conan状态时出错: {e}")
+            return
+        
+        if reason is None:
+            return
+        if reason == 'package_found':
+            print(f"🎯 发现WebEngine包: {detector.package_folder}")
+        else:
+            print("✅ Conan进程已结束")
+        print("🎉 Conan依赖下载完成！")
+        self.conan_completed = True
+        self._integrate_webengine()
     
     def _check_conan_status(self):
-        """检查Conan是否完成"""
+        """检查Conan是否完成（一次性查询：进程列表 + 包索引）"""
         try:
-            # 检查Conan进程是否还在运行
-            result = subprocess.run(
-                ["tasklist", "/FI", "IMAGENAME eq conan.exe"], 
-                capture_output=True, 
-                text=True
-            )
-            
-            if "conan.exe" not in result.stdout:
+            if not find_process_ids("conan.exe"):
                 print("✅ Conan进程已结束")
                 return True
-            else:
-                # 检查是否有WebEngine相关的包
-                cache_dir = "C:/Users/happyli/.conan2"
-                if os.path.exists(cache_dir):
-                    for root, dirs, files in os.walk(cache_dir):
-                        for dir_name in dirs:
-                            if "qt" in dir_name.lower() and "webengine" in dir_name.lower():
-                                print(f"🎯 发现WebEngine包: {dir_name}")
-                                return True
-                return False
+            package_folder = ConanPackageIndex(CONAN_HOME).find_webengine_package()
+            if package_folder:
+                print(f"🎯 发现WebEngine包: {package_folder}")
+                return True
+            return False
                 
         except Exception as e:
             print(f"⚠️ 检查Conan状态时出错: {e}")
@@ -436,6 +436,7 @@ QString WebViewWidget::generateWelcomePage()
     def stop_monitoring(self):
         """停止监控"""
         self.monitoring = False
+        self.stop_event.set()
         print("🛑 监控系统已停止")
 
 def main():
@@ -468,7 +469,8 @@ def main():
                     break
                     
             elif choice == "2":
-                if manager.conan_completed:
+                if manager.conan_completed or manager._check_conan_status():
+                    manager.conan_completed = True
                     print("✅ Conan已完成，可以手动集成")
                     manager._integrate_webengine()
                 else: